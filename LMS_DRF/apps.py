@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class LMSConfig(AppConfig):
+    name = "LMS_DRF"
+    verbose_name = "LMS"
+
+    def ready(self):
+        from LMS_DRF import checks  # noqa: F401
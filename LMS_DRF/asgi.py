@@ -2,6 +2,9 @@
 ASGI config for LMS_DRF project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests resolve through ``settings.ASGI_URLCONF``, which serves the read
+endpoints with async views (see ``LMS_DRF.async_views``), and database
+connections are not kept between requests (see ``LMS_DRF.database``).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -9,8 +12,13 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LMS_DRF.settings")
+# Each request's sync code runs in a new thread, so connections can't be reused
+os.environ.setdefault("LMS_PERSISTENT_CONNECTIONS", "0")
+django.setup(set_prefix=False)
 
-application = get_asgi_application()
+from LMS_DRF.async_views import AsyncReadASGIHandler  # noqa: E402
+
+application = AsyncReadASGIHandler()
@@ -0,0 +1,226 @@
+"""
+Async-native list and retrieve for read-heavy viewsets under ASGI.
+
+DRF views are synchronous, so under ASGI each request holds a thread for
+its whole duration. ``AsyncReadMixin.as_async_view`` serves GET list and
+retrieve on the event loop instead. DRF's own ``initialize_request()``
+and ``initial()`` (authentication, permissions, throttling, conditional
+GET and the response cache) and the filtering run in one
+``sync_to_async`` hop, rows are read with the async ORM (``aiterator``,
+``aget``), ``finalize_response()`` and rendering run on the loop, and the
+total of page-number pagination is counted on a second connection while
+the page itself loads. The JSON is the same as from the sync view, which
+still serves every other method and the reads this path does not cover:
+the browsable API, streaming renderers and ``API_VALUES_SERIALIZERS`` off.
+
+``asgi.py`` resolves through ``ASGI_URLCONF``, a copy of the URLconf with
+these views swapped in; WSGI keeps the sync views.
+
+This is not a throughput win. With ``benchmarks/concurrency.py`` on a
+20k-book SQLite file, 64 requests in flight and in-process, the ASGI stack
+served 0.45-0.8x the requests per second of WSGI, because each
+``MiddlewareMixin`` of the default stack costs two thread hops per
+request; these views were on par with the sync views behind ASGI. What
+they buy is holding many slow connections without a thread each.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse
+from django.urls import URLPattern, URLResolver
+from django.utils.decorators import classonlymethod
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.response import Response
+
+from LMS_DRF.cache import ResponseCacheMixin
+from LMS_DRF.profiling import timed_render
+from LMS_DRF.renderers import JSONRenderer, StreamingJSONRenderer
+
+
+class Fallback(Exception):
+    """The request is outside the async path; the sync view serves it."""
+
+
+def run_isolated(func):
+    """Run blocking ``func`` on a pool thread, on that thread's own connection."""
+    def call():
+        try:
+            return func()
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False)()
+
+
+async def load(queryset, chunk_size):
+    return [row async for row in queryset.aiterator(chunk_size=chunk_size)]
+
+
+def plain_response(response):
+    """
+    Copy a rendered DRF response into an ``HttpResponse``, which the
+    handler sends as is instead of rendering it again in a thread.
+    """
+    return HttpResponse(response.content, status=response.status_code, headers=dict(response.items()))
+
+
+class AsyncReadMixin:
+    """
+    Serve GET ``async_actions`` of a ``ValuesReadMixin`` viewset natively
+    async. Route through ``as_async_view`` (see ``async_urlpatterns``).
+    """
+    async_actions = ('list', 'retrieve')
+
+    @classonlymethod
+    def as_async_view(cls, actions, **initkwargs):
+        sync_view = sync_to_async(cls.as_view(actions, **initkwargs))
+
+        async def view(request, *args, **kwargs):
+            if actions.get(request.method.lower()) not in cls.async_actions or request.method != 'GET':
+                return await sync_view(request, *args, **kwargs)
+
+            # What ViewSetMixin.as_view does before dispatching
+            self = cls(**initkwargs)
+            self.action_map = actions
+            for method, action in actions.items():
+                setattr(self, method, getattr(self, action))
+            self.setup(request, *args, **kwargs)
+            try:
+                return await self.async_dispatch(request, *args, **kwargs)
+            except Fallback:
+                return await sync_view(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.actions = actions
+        return csrf_exempt(view)
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        """``APIView.dispatch`` with the rows of the handler loaded on the loop."""
+        response = await sync_to_async(self.prepare_async_read)(request, *args, **kwargs)
+        request = self.request
+        if response is None:
+            try:
+                if self.action == 'retrieve':
+                    response = await self.async_retrieve(request)
+                else:
+                    response = await self.async_list(request)
+            except Exception as exc:
+                response = self.handle_exception(exc)
+        return self.finish_async_read(request, response, *args, **kwargs)
+
+    def prepare_async_read(self, request, *args, **kwargs):
+        """
+        Everything ``APIView.dispatch`` does before the handler, in one
+        thread hop: ``initialize_request()``, ``initial()`` (which also
+        evaluates the validators and looks up the response cache) and the
+        queryset to load into ``self.rows``. Returns a response when the
+        request is already answered, None to go on; raises ``Fallback``
+        for requests the sync view serves.
+        """
+        if not self.use_values_serializer():
+            raise Fallback
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        # Decided before initial(), so a request falling back is throttled once
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        try:
+            renderer, _ = self.perform_content_negotiation(request)
+        except NotAcceptable:
+            raise Fallback
+        if not isinstance(renderer, JSONRenderer) or isinstance(renderer, StreamingJSONRenderer):
+            raise Fallback
+
+        try:
+            self.initial(request, *args, **kwargs)
+            self.rows_serializer_class = self.get_values_serializer_class()
+            rows = self.rows_serializer_class.get_values(self.filter_queryset(self.get_queryset()))
+            if self.action == 'retrieve':
+                lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+                try:
+                    rows = rows.filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                except (TypeError, ValueError, ValidationError):
+                    raise Http404
+                self.rows = rows
+            else:
+                page = None if self.paginator is None else self.paginator.get_page_queryset(rows, request, self)
+                self.paginated = page is not None
+                self.rows = rows if page is None else page
+        except Exception as exc:
+            return self.handle_exception(exc)
+        return None
+
+    async def async_list(self, request):
+        if not self.paginated:
+            rows = await load(self.rows, chunk_size=2000)
+            return Response(await self.rows_serializer_class(rows, many=True).adata())
+
+        # The page and the total are independent: count on another connection meanwhile
+        chunk_size = self.paginator.get_page_size(request) + 2
+        count = None
+        if self.paginator.needs_count():
+            rows, count = await asyncio.gather(
+                load(self.rows, chunk_size), run_isolated(self.paginator.django_paginator.object_list.count)
+            )
+        else:
+            rows = await load(self.rows, chunk_size)
+        page = self.paginator.set_page(rows, count)
+        data = await self.rows_serializer_class(page, many=True).adata()
+        return self.get_paginated_response(data)
+
+    async def async_retrieve(self, request):
+        try:
+            row = await self.rows.aget()
+        except ObjectDoesNotExist:
+            raise Http404(f'No {self.rows.model._meta.object_name} matches the given query.')
+        self.check_object_permissions(request, row)
+        return Response(await self.rows_serializer_class(row).adata())
+
+    def finish_async_read(self, request, response, *args, **kwargs):
+        """Finalize and render on the loop, and cache what the sync ``dispatch`` would."""
+        response = self.finalize_response(request, response, *args, **kwargs)
+        if not hasattr(response, 'render'):
+            # Answered by the validators or the cache
+            return response
+
+        with timed_render(request._request):
+            response.render()
+        if isinstance(self, ResponseCacheMixin) and self.cache_key is not None:
+            response = self.store_response(self.cache_key, response)
+        return plain_response(response)
+
+
+def async_urlpatterns(patterns):
+    """Copy ``patterns``, routing ``AsyncReadMixin`` viewsets to their async views."""
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(pattern.pattern, async_urlpatterns(pattern.url_patterns),
+                                  pattern.default_kwargs, pattern.app_name, pattern.namespace)
+        else:
+            cls = getattr(pattern.callback, 'cls', None)
+            actions = getattr(pattern.callback, 'actions', None) or {}
+            if (isinstance(cls, type) and issubclass(cls, AsyncReadMixin)
+                    and set(actions.values()) & set(cls.async_actions)):
+                callback = cls.as_async_view(actions, **pattern.callback.initkwargs)
+                pattern = URLPattern(pattern.pattern, callback, pattern.default_args, pattern.name)
+        result.append(pattern)
+    return result
+
+
+class AsyncReadASGIHandler(ASGIHandler):
+    """``ASGIHandler`` resolving requests through ``settings.ASGI_URLCONF``."""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.ASGI_URLCONF
+        return request, error_response
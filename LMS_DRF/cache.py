@@ -0,0 +1,184 @@
+"""
+Server-side cache for read-only API responses.
+
+Rendered GET responses are stored in the ``API_CACHE_ALIAS`` cache under a
+key built from the path, the normalized query string, the Accept header,
+the requesting user and the current version stamp of every namespace the
+view depends on. Writes bump the stamps instead of deleting keys, so
+invalidation costs one cache write and stale entries simply age out of
+the bounded LRU backend. Only JSON is cached: the browsable API renders
+the user's name and CSRF token into its pages.
+
+The stamps live in the cache too, so every process serving the API must
+share the backend: with the default per-process ``LocMemCache`` a write
+only invalidates the process that made it. Set ``LMS_CACHE_URL`` to a
+Redis URL to share it (see settings.py); ``manage.py check --deploy``
+warns while it is not shared.
+"""
+import datetime
+import hashlib
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+from LMS_DRF.routers import pinned_to_default
+
+VERSION_KEY = 'api:version:{}'
+
+stats = Counter()
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def new_stamp():
+    """A unique stamp that also records when it was issued, in microseconds."""
+    return f'{time.time_ns() // 1000:x}.{uuid.uuid4().hex[:8]}'
+
+
+def stamp_time(stamp):
+    """Return when ``stamp`` was issued as an aware UTC datetime."""
+    micros, separator, _ = stamp.partition('.')
+    if not separator:
+        return None
+    try:
+        return datetime.datetime.fromtimestamp(int(micros, 16) / 1e6, tz=datetime.timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def get_versions(namespaces):
+    """Return the current stamp of each namespace, creating missing ones."""
+    cache = get_cache()
+    keys = {namespace: VERSION_KEY.format(namespace) for namespace in namespaces}
+    found = cache.get_many(keys.values())
+    versions = []
+    for namespace, key in keys.items():
+        stamp = found.get(key)
+        if stamp is None:
+            # A stamp evicted by the LRU must never come back as a previous value
+            cache.add(key, new_stamp(), timeout=None)
+            stamp = cache.get(key)
+        versions.append(stamp)
+    return versions
+
+
+def bump(*namespaces):
+    """
+    Invalidate every cached response of the given namespaces.
+
+    Bumped right away so the writer's own transaction stops seeing cached
+    data, and again after commit so responses cached from the old data by
+    concurrent requests in between are dropped too.
+    """
+    def apply():
+        get_cache().set_many({VERSION_KEY.format(namespace): new_stamp() for namespace in namespaces}, timeout=None)
+
+    apply()
+    transaction.on_commit(apply)
+
+
+class Answered(Exception):
+    """Raised from ``initial()`` to answer a request without running its handler."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def request_fingerprint(request, *parts):
+    """Digest of everything a GET response varies on, plus the given validators."""
+    query = sorted((key, value) for key, values in request.GET.lists() for value in values)
+    user = getattr(request, 'user', None)
+    parts = [
+        request.get_host(),
+        request.path,
+        repr(query),
+        request.headers.get('Accept', ''),
+        # Responses may show what only their user can see
+        str(user.pk) if user is not None and user.is_authenticated else '',
+        *parts,
+    ]
+    return hashlib.md5('\n'.join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+class ResponseCacheMixin:
+    """
+    Cache rendered GET responses of a viewset.
+
+    ``cache_namespaces`` lists the namespaces whose version stamps the
+    cached payloads depend on. The lookup happens at the end of
+    ``initial()``, so authentication, permissions and throttling apply to
+    cached responses as well. The stamps in the key are read before the
+    view's queries, so an entry filled from a lagging read replica lives
+    until the next bump at most; clients pinned to ``default`` skip the
+    cache (see ``LMS_DRF.routers``).
+    """
+    cache_namespaces = ()
+    cache_key = None
+
+    def get_cache_key(self, request):
+        digest = request_fingerprint(request, *get_versions(self.cache_namespaces))
+        return f"api:response:{self.__class__.__name__}:{digest}"
+
+    def use_response_cache(self, request):
+        # Clients pinned after a write must read it, not an entry filled from a lagging replica
+        return (request.method == 'GET' and settings.API_CACHE_ENABLED
+                and request.accepted_renderer.format == 'json' and not pinned_to_default(request))
+
+    def get_cached_response(self, request):
+        """Return ``(key, response)``; the response is None on a miss."""
+        key = self.get_cache_key(request)
+        cached = get_cache().get(key)
+        if cached is None:
+            stats['misses'] += 1
+            return key, None
+
+        stats['hits'] += 1
+        content, headers = cached
+        response = HttpResponse(content, headers=headers)
+        response['X-Cache'] = 'HIT'
+        if 'ETag' in response:
+            # The validators stored along answer conditional requests without a query
+            response = get_conditional_response(
+                request, etag=response['ETag'], last_modified=parse_http_date_safe(response.get('Last-Modified')),
+                response=response
+            )
+        return key, response
+
+    def store_response(self, key, response):
+        patch_vary_headers(response, ['Cookie', 'Authorization'])
+        if (response.status_code == 200 and not response.streaming
+                and getattr(response, 'accepted_renderer', None) is not None
+                and response.accepted_renderer.format == 'json'):
+            response.render()
+            get_cache().set(key, (response.content, dict(response.items())))
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.use_response_cache(request):
+            key, response = self.get_cached_response(request)
+            if response is not None:
+                raise Answered(response)
+            self.cache_key = key
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Answered):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if self.cache_key is not None:
+            response = self.store_response(self.cache_key, response)
+        return response
@@ -0,0 +1,27 @@
+"""Deployment checks for the project-wide API machinery."""
+from django.conf import settings
+from django.core.checks import Warning, register
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+@register(deploy=True)
+def check_shared_api_cache(app_configs, **kwargs):
+    """The response cache is only invalidated in processes sharing its backend."""
+    if not isinstance(caches[settings.API_CACHE_ALIAS], LocMemCache):
+        return []
+    if settings.API_CACHE_SHARED:
+        return [Warning(
+            "API_CACHE_SHARED is set but the API cache is a per-process LocMemCache.",
+            hint="Collection ETags come from version stamps each process keeps to itself, so other "
+                 "processes can answer 304 after a write. Set LMS_CACHE_URL to share the cache.",
+            id='LMS_DRF.W002',
+        )]
+    if not settings.API_CACHE_ENABLED:
+        return []
+    return [Warning(
+        "The API response cache uses a per-process LocMemCache.",
+        hint="Writes only invalidate the process that made them. Run a single server process, "
+             "set LMS_CACHE_URL to share the cache, or set API_CACHE_ENABLED = False.",
+        id='LMS_DRF.W001',
+    )]
@@ -0,0 +1,132 @@
+"""
+Conditional GET for read-only API endpoints.
+
+Single objects are validated by their ``updated_at`` column. Collections
+are validated by the version stamps of the view's ``cache_namespaces``
+when every process shares the API cache (``API_CACHE_SHARED``), at no
+query. Otherwise each process would see its own stamps, so they are
+validated by the newest ``updated_at`` and the row count of the filtered
+queryset, plus the querysets of related data the view renders. Those
+aggregates scan the whole collection, which a cursor page never does, so
+they are only read for requests carrying preconditions, and plain
+collection responses go without validators. A matching ``If-None-Match``
+or ``If-Modified-Since`` is answered with 304 at the end of
+``initial()``, once the request is authenticated and permitted.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from LMS_DRF.cache import Answered, get_versions, request_fingerprint, stamp_time
+
+PRECONDITIONS = ('If-Match', 'If-None-Match', 'If-Modified-Since', 'If-Unmodified-Since')
+
+
+class ConditionalGetMixin:
+    """
+    Send ``ETag`` and ``Last-Modified`` with GET responses of a viewset and
+    answer conditional requests with 304 Not Modified.
+
+    ``updated_field`` validates the object on retrieve, and the filtered
+    queryset of list and other collection routes unless they are validated
+    by the stamps of ``cache_namespaces``. Listed before
+    ``ResponseCacheMixin``, a cache hit is answered with the validators
+    stored with it instead.
+    """
+    updated_field = 'updated_at'
+    cache_namespaces = ()
+    validator_headers = None
+
+    def get_validators(self, request, **kwargs):
+        """Return ``(etag, last_modified)``, or None to skip conditional handling."""
+        if self.action_map.get('get') == 'retrieve':
+            return self.get_object_validators(request, **kwargs)
+        return self.get_collection_validators(request)
+
+    def get_validator_dependencies(self):
+        """``(queryset, timestamp field)`` of related data the responses render, validated alongside."""
+        return []
+
+    def get_state(self, dependencies):
+        """Validator parts and the newest timestamp of ``(queryset, field)`` pairs."""
+        parts, newest = [], []
+        for queryset, field in dependencies:
+            state = queryset.order_by().aggregate(updated=Max(field), count=Count('pk'))
+            parts.extend([state['updated'].isoformat() if state['updated'] else '', str(state['count'])])
+            if state['updated'] is not None:
+                newest.append(state['updated'])
+        return parts, max(newest, default=None)
+
+    def get_collection_validators(self, request):
+        if settings.API_CACHE_SHARED:
+            stamps = get_versions(self.cache_namespaces)
+            issued = [issued for issued in map(stamp_time, stamps) if issued is not None]
+            return request_fingerprint(request, *stamps), max(issued, default=None)
+        if not any(header in request.headers for header in PRECONDITIONS):
+            return None
+        queryset = self.filter_queryset(self.get_queryset())
+        parts, last_modified = self.get_state([(queryset, self.updated_field), *self.get_validator_dependencies()])
+        return request_fingerprint(request, *parts), last_modified
+
+    def get_object_validators(self, request, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        lookup = {self.lookup_field: kwargs[lookup_url_kwarg]}
+        try:
+            updated = self.queryset.filter(**lookup).order_by().values_list(self.updated_field, flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if updated is None:
+            # Missing object: let the view answer with its usual 404
+            return None
+        parts, newest = self.get_state(self.get_validator_dependencies())
+        return request_fingerprint(request, updated.isoformat(), *parts), max(updated, newest or updated)
+
+    def evaluate_conditions(self, request, **kwargs):
+        """
+        Return ``(headers, response)``: a holder of the validator headers to
+        send with a 200, and the 304/412 answer when the preconditions of
+        the request call for one. ``headers`` is None for unvalidated views.
+        """
+        validators = self.get_validators(request, **kwargs)
+        if validators is None:
+            return None, None
+
+        # Validators are read before the data, so a concurrent write can only
+        # make them older than the body and never wrongly produce a 304 later
+        etag, last_modified = validators
+        headers = HttpResponse()
+        headers['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            last_modified = int(last_modified.timestamp())
+            headers['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(headers, ['Accept'])
+
+        response = get_conditional_response(request, etag=headers['ETag'], last_modified=last_modified,
+                                            response=headers)
+        return headers, None if response is headers else response
+
+    def apply_validators(self, response, headers):
+        if headers is not None and response.status_code == 200:
+            for header in ('ETag', 'Last-Modified'):
+                if header in headers:
+                    response[header] = headers[header]
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            self.validator_headers, response = self.evaluate_conditions(request, **kwargs)
+            if response is not None:
+                raise Answered(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Answered):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        return self.apply_validators(response, self.validator_headers)
@@ -0,0 +1,83 @@
+"""
+SQLite profiles for ``DATABASES``.
+
+``sqlite_database`` builds a database entry from one of ``SQLITE_PROFILES``:
+
+``tuned``
+    WAL journal, so readers and the writer no longer block each other;
+    ``synchronous=NORMAL``, which in WAL mode survives application crashes
+    and may only lose the last commits on power loss; a 256 MiB memory map
+    and a 64 MiB page cache per connection; temporary tables in memory and
+    a 20 s busy timeout. ``atomic()`` blocks start with ``BEGIN IMMEDIATE``
+    and take the write lock up front: a deferred transaction that reads
+    first and writes later cannot wait for the lock, SQLite fails it at once
+    with "database is locked". Connections persist with health checks.
+``default``
+    Django's defaults: rollback journal and a connection per request.
+
+The pragmas run on every new connection through the backend's
+``init_command`` hook.
+"""
+SQLITE_PROFILES = {
+    'default': {
+        'pragmas': {},
+        'options': {},
+        'conn_max_age': 0,
+        'health_checks': False,
+    },
+    'tuned': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            # Negative sizes are in KiB
+            'cache_size': -64 * 1024,
+            'temp_store': 'MEMORY',
+        },
+        'options': {
+            # Seconds; sqlite3 turns it into the busy timeout
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+        'conn_max_age': 600,
+        'health_checks': True,
+    },
+}
+
+
+def init_command(pragmas):
+    if not pragmas:
+        return {}
+    return {'init_command': ';'.join(f'PRAGMA {key} = {value}' for key, value in pragmas.items())}
+
+
+def sqlite_database(name, profile='tuned', persistent=True):
+    """
+    A ``DATABASES`` entry for the SQLite file ``name``. ``persistent=False``
+    keeps the profile but opens a connection per request, as ASGI needs:
+    it runs each request's sync code in a new thread and Django's
+    connections are per thread.
+    """
+    config = SQLITE_PROFILES[profile]
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': {**config['options'], **init_command(config['pragmas'])},
+        'CONN_MAX_AGE': config['conn_max_age'] if persistent else 0,
+        'CONN_HEALTH_CHECKS': config['health_checks'],
+    }
+
+
+def sqlite_replica(name, profile='tuned', persistent=True):
+    """
+    A read-only ``DATABASES`` entry for ``name``, a copy of the primary kept
+    up to date by e.g. Litestream or LiteFS, for ``DATABASE_REPLICAS``.
+    The file is opened with ``mode=ro``, so a missing one fails to connect
+    instead of being created empty. The journal mode is left as the primary
+    set it; changing it would need write access. Tests read ``default``.
+    """
+    entry = sqlite_database(f'file:{name}?mode=ro', profile, persistent)
+    pragmas = {key: value for key, value in SQLITE_PROFILES[profile]['pragmas'].items() if key != 'journal_mode'}
+    entry['OPTIONS'] = {'uri': True, 'timeout': entry['OPTIONS'].get('timeout', 5), **init_command(pragmas)}
+    entry['TEST'] = {'MIRROR': 'default'}
+    return entry
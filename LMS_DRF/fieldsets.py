@@ -0,0 +1,138 @@
+"""
+Sparse fieldsets and embedded related objects for read endpoints.
+
+``?fields=id,title`` limits each object to the listed fields, and the
+query to the columns they are built from (``.only()`` for model
+serializers, ``values()`` columns for ``ValuesSerializer``).
+``?expand=book,user`` replaces related ids with the related objects; the
+viewset loads them with ``select_related``/``prefetch_related`` and the
+values serializers in a query per relation and page, so the number of
+queries stays fixed. Expanding a field left out by ``fields`` does
+nothing. Both only apply to safe requests: writes take and return the
+full representation.
+"""
+from drf_yasg import openapi
+from rest_framework import serializers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def fields_parameter(example):
+    """OpenAPI description of ``?fields=``; ``example`` lists a few fields."""
+    return openapi.Parameter(
+        FieldsetMixin.fields_param, openapi.IN_QUERY,
+        description=f"Comma-separated fields to return, e.g. {example}",
+        type=openapi.TYPE_STRING
+    )
+
+
+def expand_parameter(*names):
+    """OpenAPI description of ``?expand=`` for the expandable fields ``names``."""
+    return openapi.Parameter(
+        FieldsetMixin.expand_param, openapi.IN_QUERY,
+        description=f"Embed related objects instead of ids: {', '.join(names)}",
+        type=openapi.TYPE_STRING
+    )
+
+
+def parse_list(value):
+    """Comma-separated names, without blanks and repeats."""
+    return list(dict.fromkeys(name for name in (part.strip() for part in value.split(',')) if name))
+
+
+class FieldsetSerializerMixin:
+    """
+    Apply the ``fields`` and ``expand`` of the serializer context to a
+    ``ModelSerializer``. ``expandable_fields`` maps a field to the
+    serializer class embedding it and that class's arguments.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.context.get('expand', ()):
+            serializer_class, options = self.expandable_fields[name]
+            self.fields[name] = serializer_class(read_only=True, **options)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in [name for name in self.fields if name not in fields]:
+                self.fields.pop(name)
+
+
+class FieldsetMixin:
+    """
+    ``?fields=`` and ``?expand=`` for a viewset whose serializer uses
+    ``FieldsetSerializerMixin`` and whose values serializer, if any,
+    supports the same expansions. The columns an output field needs come
+    from the ``field_sources`` of the values serializer, or of the viewset
+    without one; names that are not model fields, such as annotations,
+    are left to the viewset. Expanded relations are the viewset's
+    ``get_queryset`` to load.
+    """
+    fields_param = 'fields'
+    expand_param = 'expand'
+    field_sources = {}
+
+    def get_fieldset(self):
+        """``(fields, expand)`` of the request; ``fields`` is None for all of them."""
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = self.parse_fieldset()
+        return self._fieldset
+
+    def parse_fieldset(self):
+        # No request while the API schema is generated
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None, ()
+        params = self.request.query_params
+        serializer_class = self.get_serializer_class()
+        fields = expand = None
+        if self.fields_param in params:
+            fields = parse_list(params[self.fields_param])
+            unknown = [name for name in fields if name not in serializer_class.Meta.fields]
+            if unknown or not fields:
+                raise serializers.ValidationError({
+                    self.fields_param: f"Unknown fields: {', '.join(unknown)}." if unknown else "No fields given."
+                })
+        if self.expand_param in params:
+            expand = parse_list(params[self.expand_param])
+            unknown = [name for name in expand if name not in getattr(serializer_class, 'expandable_fields', {})]
+            if unknown:
+                raise serializers.ValidationError({
+                    self.expand_param: f"Cannot expand: {', '.join(unknown)}."
+                })
+        expand = tuple(name for name in expand or () if fields is None or name in fields)
+        return fields, expand
+
+    def get_field_sources(self):
+        values_serializer_class = getattr(self, 'values_serializer_class', None)
+        return values_serializer_class.field_sources if values_serializer_class else self.field_sources
+
+    def get_columns(self, fields, model):
+        model_fields = {name for field in model._meta.concrete_fields
+                        for name in (field.name, field.attname)}
+        columns = ['pk']
+        for name in fields:
+            columns.extend(column for column in self.get_field_sources().get(name, (name,))
+                           if column in model_fields)
+        return columns
+
+    def get_queryset(self):
+        """Load only the columns of ``?fields=``; related rows are left to the viewset."""
+        queryset = super().get_queryset()
+        fields, _ = self.get_fieldset()
+        if fields is None:
+            return queryset
+        # A relation cannot be both deferred and joined; expansions join again
+        return queryset.select_related(None).only(*self.get_columns(fields, queryset.model))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields, expand = self.get_fieldset()
+        if fields is not None:
+            context['fields'] = fields
+        if expand:
+            context['expand'] = expand
+        return context
+
+    def get_values_serializer_class(self):
+        return super().get_values_serializer_class().narrow(*self.get_fieldset())
@@ -0,0 +1,102 @@
+"""
+Check the query plans behind the API endpoints of every app.
+
+Each representative request in ``ENDPOINTS`` is replayed and the SQL it
+issues run through ``EXPLAIN QUERY PLAN``. A filtered query fails when it
+scans a whole table. An unfiltered one has to visit every row anyway (or
+stops at its LIMIT), so it only fails when it also sorts the whole table in
+a temporary B-tree instead of reading an index in order.
+"""
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+# Representative request per query shape served by the API
+ENDPOINTS = [
+    '/api/books/',
+    '/api/books/?author=Tolkien',
+    '/api/books/?year=1954',
+    '/api/books/?year_min=1900&year_max=2000',
+    '/api/books/?availability=true',
+    '/api/books/?categories__id=1',
+    '/api/books/?categories__name=Fantasy',
+    '/api/books/?search=hobbit',
+    '/api/books/?pagination=cursor',
+    '/api/books/1/',
+    '/api/books/available/',
+    '/api/books/category/1/',
+    '/api/books/year/1954/',
+    '/api/books/sync/?modified_since=2000-01-01T00:00:00Z',
+    '/api/categories/',
+    '/api/categories/1/',
+    '/api/categories/sync/?modified_since=2000-01-01T00:00:00Z',
+    '/api/reviews/',
+    '/api/reviews/?pagination=cursor',
+    '/api/reviews/1/',
+    '/api/reviews/sync/?modified_since=2000-01-01T00:00:00Z',
+    '/api/reservations/',
+    '/api/reservations/?overdue=true',
+    '/api/reservations/?pagination=cursor',
+    '/api/reservations/1/',
+    '/api/holds/',
+]
+
+FULL_SCAN_RE = re.compile(r'^SCAN (?!CONSTANT ROW)(\S+)$')
+FULL_SORT_RE = re.compile(r'^USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN QUERY PLAN over the SQL issued by each API endpoint "
+        "and fail if a filtered query does a full table scan or an unfiltered one sorts a whole table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Print the plan of every query, not only the failing ones.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN checks are only implemented for SQLite.')
+
+        client = APIClient()
+        client.force_authenticate(user=User(username='query-plan-check', is_staff=True))
+
+        failures = []
+        with override_settings(ALLOWED_HOSTS=['testserver'], API_CACHE_ENABLED=False):
+            for url in ENDPOINTS:
+                with CaptureQueriesContext(connection) as captured:
+                    client.get(url)
+                for query in captured.captured_queries:
+                    failures.extend(self.check_query(url, query['sql'], options['verbose_plans']))
+
+        if failures:
+            for url, sql, problem in failures:
+                self.stderr.write(f'{url}: {problem}\n    {sql}')
+            raise CommandError(f'{len(failures)} full table scan(s) or sort(s) found.')
+        self.stdout.write(self.style.SUCCESS(f'Checked {len(ENDPOINTS)} endpoints, no full table scans or sorts.'))
+
+    def check_query(self, url, sql, verbose):
+        """Return ``(url, sql, problem)`` for every full scan or sort the plan of a SELECT should not do."""
+        if not sql.startswith('SELECT'):
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+
+        if verbose:
+            self.stdout.write(f'{url}\n    {sql}\n' + ''.join(f'      {step}\n' for step in plan))
+
+        if ' WHERE ' not in sql:
+            return [(url, sql, 'sort of the whole table') for step in plan if FULL_SORT_RE.match(step)][:1]
+        return [
+            (url, sql, f'full scan of {match.group(1)}')
+            for match in map(FULL_SCAN_RE.match, plan) if match
+        ]
@@ -0,0 +1,209 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination without OFFSET or COUNT(*).
+
+    The view declares ``keyset_ordering``, e.g. ``('title', 'id')`` or
+    ``('-created_at', 'id')``. The last field must be unique. The cursor
+    holds the ordering values of the last row of the previous page and
+    the next page is fetched with ``WHERE (a, b) > (x, y)``, so page N
+    costs the same as page 1 when an index covers the ordering.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering, page_size):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    def get_page_queryset(self, queryset, request):
+        """The rows to load for the page, one more than fits to detect a next page."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def seek_filter(self, position):
+        """Build the lexicographic ``(a, b, ...) > (x, y, ...)`` condition."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position(self, item):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = item[name] if isinstance(item, dict) else getattr(item, name)
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            values.append(value)
+        return values
+
+    def encode_cursor(self, position):
+        data = json.dumps(position, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.encode_cursor(self.get_position(self.page[-1]))
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class LibraryPagination(PageNumberPagination):
+    """
+    Page-number pagination with a per-request keyset mode.
+
+    Clients opt in with ``?pagination=cursor`` (or by following a ``cursor``
+    link) on views that declare ``keyset_ordering``; everything else keeps
+    the regular page-number behaviour. Keyset pages are always in
+    ``keyset_ordering``, so any other ``?ordering=`` is rejected with 400
+    rather than ignored.
+    """
+    mode_query_param = 'pagination'
+    keyset = None
+
+    def use_keyset(self, request, view):
+        if not getattr(view, 'keyset_ordering', None):
+            return False
+        mode = request.query_params.get(self.mode_query_param, '')
+        if mode.lower() != 'cursor' and KeysetPagination.cursor_query_param not in request.query_params:
+            return False
+        self.check_ordering(request, view.keyset_ordering)
+        return True
+
+    def check_ordering(self, request, keyset_ordering):
+        """Accept ``?ordering=`` naming the keyset ordering, with or without its unique last field."""
+        param = api_settings.ORDERING_PARAM
+        requested = [name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()]
+        ordering = list(keyset_ordering)
+        if requested and requested not in (ordering, ordering[:-1]):
+            raise ValidationError({
+                param: f"Cursor pagination is ordered by {','.join(ordering)}; use page numbers for other orderings."
+            })
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request, view):
+            page_size = self.get_page_size(request)
+            if not page_size:
+                return None
+            self.keyset = KeysetPagination(view.keyset_ordering, page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        First half of ``paginate_queryset`` for callers that load the rows
+        themselves, e.g. with the async ORM. Returns the queryset of the
+        page, or None when the request is not paginated. If ``needs_count``
+        is true the total must be counted too; pass both to ``set_page``.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        if self.use_keyset(request, view):
+            self.keyset = KeysetPagination(view.keyset_ordering, page_size)
+            return self.keyset.get_page_queryset(queryset, request)
+
+        self.keyset = None
+        paginator = self.django_paginator = self.django_paginator_class(queryset, page_size)
+        # Counts right away for ?page=last
+        self.page_number = self.get_page_number(request, paginator)
+        try:
+            number = int(self.page_number)
+        except (TypeError, ValueError):
+            number = 0
+        if number < 1:
+            # Rejected before counting, with the same error as paginate_queryset
+            self.validate_page_number()
+        bottom = (number - 1) * page_size
+        return queryset[bottom:bottom + page_size]
+
+    def needs_count(self):
+        return self.keyset is None and 'count' not in self.django_paginator.__dict__
+
+    def set_page(self, rows, count=None):
+        """Second half of ``paginate_queryset``: make ``rows`` the current page."""
+        if self.keyset is not None:
+            return self.keyset.set_page(rows)
+
+        paginator = self.django_paginator
+        if count is not None:
+            # Paginator.count is a cached_property; prime it with the known total
+            paginator.__dict__['count'] = count
+        self.page = Page(rows, self.validate_page_number(), paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    def validate_page_number(self):
+        try:
+            return self.django_paginator.validate_number(self.page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=self.page_number, message=str(exc))
+            raise NotFound(msg)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
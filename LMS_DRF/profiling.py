@@ -0,0 +1,376 @@
+"""
+Per-request profiling of API views.
+
+With ``API_PROFILING`` enabled, ``ProfilingMiddleware`` times every SQL
+query, the view and the rendering of each request, reports them in a
+``Server-Timing`` header and aggregates them per view action (e.g.
+``BookViewSet.by_author``) into histograms that ``/api/_metrics/`` serves
+in the Prometheus text format to staff users and to scrapers sending
+``Authorization: Bearer <API_METRICS_TOKEN>``. A query template executed
+``API_PROFILING_DUPLICATE_THRESHOLD`` times within one request is logged
+as a likely N+1 together with the line of project code that issued it.
+
+Serialization is measured as the time spent in the view outside SQL, and
+streamed bodies are produced after the middleware returns, so their
+rendering time and size are not observed. When profiling is disabled the
+middleware only reads the setting.
+
+The middleware works in sync and async stacks. Queries are attributed
+through a context variable, so those issued from ``sync_to_async`` threads
+of an async view count too; queries run concurrently add up their times.
+"""
+import hmac
+import logging
+import os
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+
+from LMS_DRF import cache as response_cache
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Histogram name -> (help text, bucket upper bounds)
+HISTOGRAMS = {
+    'lms_api_request_seconds': ('Wall time of the request.', SECONDS_BUCKETS),
+    'lms_api_sql_queries': ('SQL queries executed per request.', QUERY_BUCKETS),
+    'lms_api_sql_seconds': ('Time spent in SQL per request.', SECONDS_BUCKETS),
+    'lms_api_serialize_seconds': ('Time spent in the view outside SQL, mostly serialization.', SECONDS_BUCKETS),
+    'lms_api_render_seconds': ('Time spent rendering the response body.', SECONDS_BUCKETS),
+    'lms_api_response_bytes': ('Size of the response body.', BYTES_BUCKETS),
+}
+
+UNRESOLVED = '<unresolved>'
+
+current_profile = ContextVar('current_profile', default=None)
+
+
+def view_name(view_func, request):
+    """``ViewSet.action`` for DRF views, the dotted path of anything else."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__qualname__}'
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method, method)}'
+
+
+def call_site():
+    """The innermost frame of project code on the current stack."""
+    root = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename.startswith(root) and 'site-packages' not in filename and filename != __file__:
+            return f'{os.path.relpath(filename, root)}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def samples(self):
+        """Yield ``(le, cumulative count)`` pairs, ending with ``+Inf``."""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield str(bound), total
+        yield '+Inf', self.count
+
+
+def format_labels(**labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Metrics:
+    """Process-wide aggregates of the profiled requests."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.histograms = {}
+        self.responses = Counter()
+        self.duplicates = Counter()
+
+    def observe(self, name, view, value):
+        histogram = self.histograms.get((name, view))
+        if histogram is None:
+            histogram = self.histograms[(name, view)] = Histogram(HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def record(self, profile, response):
+        with self.lock:
+            view = profile.view or UNRESOLVED
+            self.responses[(view, response.status_code)] += 1
+            self.observe('lms_api_request_seconds', view, profile.total_seconds)
+            self.observe('lms_api_sql_queries', view, profile.queries)
+            self.observe('lms_api_sql_seconds', view, profile.sql_seconds)
+            self.observe('lms_api_serialize_seconds', view, profile.serialize_seconds)
+            self.observe('lms_api_render_seconds', view, profile.render_seconds)
+            if not response.streaming:
+                self.observe('lms_api_response_bytes', view, len(response.content))
+            for site in profile.duplicates.values():
+                self.duplicates[(view, site)] += 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (help_text, _) in HISTOGRAMS.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (histogram_name, view), histogram in sorted(self.histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    for le, count in histogram.samples():
+                        lines.append(f'{name}_bucket{format_labels(view=view, le=le)} {count}')
+                    lines.append(f'{name}_sum{format_labels(view=view)} {histogram.sum}')
+                    lines.append(f'{name}_count{format_labels(view=view)} {histogram.count}')
+
+            lines += ['# HELP lms_api_responses_total Profiled responses by status code.',
+                      '# TYPE lms_api_responses_total counter']
+            for (view, status), count in sorted(self.responses.items()):
+                lines.append(f'lms_api_responses_total{format_labels(view=view, status=status)} {count}')
+
+            lines += ['# HELP lms_api_duplicate_queries_total Requests repeating one query template '
+                      '(likely N+1), by the code that issued it.',
+                      '# TYPE lms_api_duplicate_queries_total counter']
+            for (view, site), count in sorted(self.duplicates.items()):
+                lines.append(f'lms_api_duplicate_queries_total{format_labels(view=view, site=site)} {count}')
+
+        lines += ['# HELP lms_api_response_cache_total Response cache lookups.',
+                  '# TYPE lms_api_response_cache_total counter']
+        for result in ('hits', 'misses'):
+            lines.append(f'lms_api_response_cache_total{format_labels(result=result)} {response_cache.stats[result]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def profile_queries(execute, sql, params, many, context):
+    """``execute_wrapper`` handing queries to the profile of the current request."""
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def install_profiler():
+    """Wrap the connections of the current thread that predate profiling."""
+    for alias in connections:
+        wrappers = connections[alias].execute_wrappers
+        if profile_queries not in wrappers:
+            wrappers.append(profile_queries)
+
+
+@receiver(connection_created)
+def wrap_new_connection(sender, connection, **kwargs):
+    if settings.API_PROFILING and profile_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profile_queries)
+
+
+@contextmanager
+def timed_render(request):
+    """Time rendering done by the view itself, e.g. by async views."""
+    profile = getattr(request, '_profile', None)
+    if profile is None:
+        yield
+        return
+    profile.finish_view()
+    started = time.perf_counter()
+    yield
+    profile.render_seconds = time.perf_counter() - started
+
+
+class RequestProfile:
+    """Timings of one request; also the ``execute_wrapper`` timing its queries."""
+
+    def __init__(self, duplicate_threshold):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.duplicate_threshold = duplicate_threshold
+        self.view = None
+        self.view_started = None
+        self.view_finished = None
+        self.sql_before_view = 0.0
+        self.sql_in_view = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+        self.total_seconds = 0.0
+        self.templates = Counter()
+        self.duplicates = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - started
+            with self.lock:
+                self.sql_seconds += seconds
+                self.queries += 1
+                self.templates[sql] += 1
+                repeated = self.templates[sql] == self.duplicate_threshold
+            if repeated:
+                self.duplicates[sql] = call_site()
+
+    def start_view(self, name):
+        self.view = name
+        self.view_started = time.perf_counter()
+        self.sql_before_view = self.sql_seconds
+
+    def finish_view(self):
+        if self.view_started is not None and self.view_finished is None:
+            self.view_finished = time.perf_counter()
+            self.sql_in_view = self.sql_seconds - self.sql_before_view
+
+    def finish(self):
+        self.finish_view()
+        self.total_seconds = time.perf_counter() - self.started
+
+    @property
+    def serialize_seconds(self):
+        if self.view_started is None:
+            return 0.0
+        return max(self.view_finished - self.view_started - self.sql_in_view, 0.0)
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.sql_seconds * 1000:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_seconds * 1000:.2f}',
+            f'render;dur={self.render_seconds * 1000:.2f}',
+            f'total;dur={self.total_seconds * 1000:.2f}',
+        ])
+
+
+class ProfilingMiddleware:
+    """Place first in ``MIDDLEWARE`` so the totals cover the whole stack."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Sync hooks would cost async requests a thread hop each
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.API_PROFILING:
+            return self.get_response(request)
+
+        install_profiler()
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        if not settings.API_PROFILING:
+            return await self.get_response(request)
+
+        await sync_to_async(install_profiler)()
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.finish(request, response)
+
+    def start(self, request):
+        request._profile = RequestProfile(settings.API_PROFILING_DUPLICATE_THRESHOLD)
+        return current_profile.set(request._profile)
+
+    def finish(self, request, response):
+        profile = request._profile
+        profile.finish()
+
+        response['Server-Timing'] = profile.server_timing()
+        if profile.view != view_name(metrics_view, request):
+            metrics.record(profile, response)
+        for sql, site in profile.duplicates.items():
+            logger.warning(
+                'Possible N+1 in %s: query repeated %d times from %s: %s',
+                profile.view or UNRESOLVED, profile.templates[sql], site, sql
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            profile.start_view(view_name(view_func, request))
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        ProfilingMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+    def process_template_response(self, request, response):
+        # Runs right before the handler renders the response, so time it here
+        if getattr(request, '_profile', None) is not None:
+            with timed_render(request):
+                response.render()
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        if getattr(request, '_profile', None) is None:
+            return response
+        with timed_render(request):
+            await sync_to_async(response.render)()
+        return response
+
+
+def can_read_metrics(request):
+    """Staff users, or clients presenting the configured metrics token."""
+    if request.user.is_staff:
+        return True
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(settings.API_METRICS_TOKEN) and scheme.lower() == 'bearer' and hmac.compare_digest(
+        token.encode(), settings.API_METRICS_TOKEN.encode()
+    )
+
+
+def metrics_view(request):
+    """Aggregated profiling data in the Prometheus text exposition format."""
+    if not settings.API_PROFILING:
+        raise Http404
+    if not can_read_metrics(request):
+        raise PermissionDenied
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,115 @@
+"""
+JSON renderers backed by orjson when it is installed.
+
+``JSONRenderer`` is a drop-in replacement for DRF's renderer: the same
+compact UTF-8 output, the same handling of datetimes, Decimals, lazy
+strings and querysets (through DRF's encoder as orjson's ``default``), and
+the stdlib fallback whenever orjson is missing or cannot encode a value.
+``StreamingJSONRenderer`` (``?format=json-stream``) writes list responses
+item by item together with ``StreamingRenderMixin``.
+"""
+from django.http import StreamingHttpResponse
+from rest_framework import renderers
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_encoder = JSONEncoder()
+
+
+def escape_js_separators(content):
+    # DRF escapes U+2028/U+2029 so the output stays a strict JavaScript subset
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class JSONRenderer(renderers.JSONRenderer):
+
+    def use_orjson(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None and self.compact and not self.ensure_ascii and
+            self.get_indent(accepted_media_type, renderer_context or {}) is None
+        )
+
+    def dumps(self, data):
+        """Encode one value with orjson, or return None if orjson can't."""
+        try:
+            return escape_js_separators(orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS))
+        except (orjson.JSONEncodeError, TypeError):
+            return None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.use_orjson(accepted_media_type, renderer_context):
+            content = self.dumps(data)
+            if content is not None:
+                return content
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """
+    Renders the same JSON as ``JSONRenderer`` but as a sequence of chunks:
+    the envelope first, then one chunk per list item. Lazily produced
+    ``results`` are consumed as they are written.
+    """
+    format = 'json-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.iter_render(data, accepted_media_type, renderer_context))
+
+    def encode(self, data, accepted_media_type, renderer_context):
+        return super().render(data, accepted_media_type, renderer_context)
+
+    def iter_render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'results' in data:
+            envelope = {key: value for key, value in data.items() if key != 'results'}
+            head = self.encode(envelope, accepted_media_type, renderer_context)
+            yield head[:-1] + (b',"results":' if envelope else b'"results":')
+            yield from self.iter_items(data['results'], accepted_media_type, renderer_context)
+            yield b'}'
+        elif isinstance(data, (list, tuple)) or hasattr(data, '__next__'):
+            yield from self.iter_items(data, accepted_media_type, renderer_context)
+        else:
+            yield self.encode(data, accepted_media_type, renderer_context)
+
+    def iter_items(self, items, accepted_media_type, renderer_context):
+        yield b'['
+        for index, item in enumerate(items):
+            chunk = self.encode(item, accepted_media_type, renderer_context)
+            yield chunk if index == 0 else b',' + chunk
+        yield b']'
+
+
+class StreamingRenderMixin:
+    """
+    Turn successful responses into ``StreamingHttpResponse`` when the
+    client negotiated ``StreamingJSONRenderer``.
+    """
+
+    def streams_response(self):
+        return isinstance(getattr(self.request, 'accepted_renderer', None), StreamingJSONRenderer)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if not (isinstance(response, Response) and response.status_code == 200 and self.streams_response()):
+            return response
+
+        renderer = request.accepted_renderer
+        streaming = StreamingHttpResponse(
+            renderer.iter_render(response.data, request.accepted_media_type, self.get_renderer_context()),
+            content_type=renderer.media_type,
+            status=response.status_code,
+        )
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                streaming[header] = value
+        return streaming
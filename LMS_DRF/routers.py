@@ -0,0 +1,183 @@
+"""
+Read replica routing.
+
+Safe-method requests (GET, HEAD, OPTIONS) to views declaring
+``replica_reads = True`` read from one of ``DATABASE_REPLICAS``; every
+other request, and every write, uses ``default``.
+``ReplicaRoutingMiddleware`` decides per request and ``ReadReplicaRouter``
+applies the decision to each query through a context variable, so queries
+issued from ``sync_to_async`` threads of async views follow it too.
+
+Read-your-writes: a write request pins its client, identified by the
+``Authorization`` header or the session cookie, to ``default`` for
+``DATABASE_REPLICA_PIN_SECONDS``. Pins live in the default cache, which
+must be shared between processes (e.g. Redis) to hold across them.
+
+Pinned clients bypass the response cache (see ``pinned_to_default``), so
+their reads stay on ``default``. Others fill it from a replica, under the
+version stamps read before the query; an entry read from a lagging
+replica is dropped by the next bump of its namespaces.
+
+A replica is picked at random at the first read of a request. One that
+fails to connect is skipped for ``DATABASE_REPLICA_RETRY_SECONDS``; with
+no replica left, reads fall back to ``default``.
+"""
+import hashlib
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_KEY = 'replica:pin:{}'
+
+read_routing = ContextVar('read_routing', default=None)
+
+
+class ReplicaHealth:
+    """Replicas that recently failed to connect, shared by all threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.down_until = {}
+
+    def is_up(self, alias):
+        with self.lock:
+            return self.down_until.get(alias, 0) <= time.monotonic()
+
+    def mark_down(self, alias):
+        with self.lock:
+            self.down_until[alias] = time.monotonic() + settings.DATABASE_REPLICA_RETRY_SECONDS
+
+    def reset(self):
+        with self.lock:
+            self.down_until.clear()
+
+
+health = ReplicaHealth()
+
+
+def choose_replica():
+    """An alias of a replica that accepts connections, or None."""
+    candidates = [alias for alias in settings.DATABASE_REPLICAS if health.is_up(alias)]
+    random.shuffle(candidates)
+    for alias in candidates:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            health.mark_down(alias)
+            continue
+        return alias
+    return None
+
+
+class ReadRouting:
+    """The read database of one request, chosen at its first read."""
+
+    def __init__(self):
+        self.alias = None
+
+    def database(self):
+        if self.alias is None:
+            self.alias = choose_replica() or DEFAULT_DB_ALIAS
+        return self.alias
+
+
+def client_key(request):
+    credentials = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return PIN_KEY.format(hashlib.md5(credentials.encode(), usedforsecurity=False).hexdigest())
+
+
+def is_pinned(request):
+    key = client_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+def pinned_to_default(request):
+    """Whether the middleware kept the reads of ``request`` on ``default`` because its client is pinned."""
+    return getattr(request, '_pinned_to_default', False)
+
+
+def pin(request):
+    key = client_key(request)
+    if key is not None:
+        cache.set(key, True, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+class ReadReplicaRouter:
+    """Send the reads of routed requests to their replica and all writes to ``default``."""
+
+    def db_for_read(self, model, **hints):
+        routing = read_routing.get()
+        return None if routing is None else routing.database()
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or saving an instance read from a replica would write there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of default
+        return False if db in settings.DATABASE_REPLICAS else None
+
+
+class ReplicaRoutingMiddleware:
+    """Route the reads of safe requests to ``replica_reads`` views; pin writers to ``default``."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.finish(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.finish(request, await self.get_response(request))
+
+    def finish(self, request, response):
+        token = getattr(request, '_read_routing_token', None)
+        if token is not None:
+            read_routing.reset(token)
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS:
+            pin(request)
+        return response
+
+    def route(self, request, view_func):
+        """Start routing the request's reads when it qualifies; returns its ``ReadRouting``."""
+        if not (settings.DATABASE_REPLICAS and request.method in SAFE_METHODS
+                and getattr(getattr(view_func, 'cls', None), 'replica_reads', False)):
+            return None
+        request._pinned_to_default = is_pinned(request)
+        if request._pinned_to_default:
+            return None
+        routing = ReadRouting()
+        request._read_routing_token = read_routing.set(routing)
+        return routing
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.route(request, view_func)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        routing = self.route(request, view_func)
+        if routing is not None:
+            # The async ORM routes on the loop, where probing a replica cannot connect
+            await sync_to_async(routing.database)()
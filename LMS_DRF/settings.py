@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from LMS_DRF.database import sqlite_database, sqlite_replica
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,13 +47,17 @@ INSTALLED_APPS = [
     'drf_yasg',
 
     # Project apps
+    'LMS_DRF',
     'apps.books',
     'apps.category',
     'apps.review',
     'apps.reservation',
+    'apps.changes',
 ]
 
 MIDDLEWARE = [
+    "LMS_DRF.profiling.ProfilingMiddleware",
+    "LMS_DRF.routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -62,6 +69,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "LMS_DRF.urls"
 
+# Under ASGI the read endpoints are served by async views (see LMS_DRF/async_views.py)
+ASGI_URLCONF = "LMS_DRF.urls_asgi"
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -83,13 +93,105 @@ WSGI_APPLICATION = "LMS_DRF.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+#
+# LMS_SQLITE_PROFILE picks the pragmas, transaction mode and connection reuse
+# (see LMS_DRF/database.py); asgi.py turns persistent connections off.
+
 DATABASES = {
+    "default": sqlite_database(
+        BASE_DIR / "db.sqlite3",
+        profile=os.environ.get("LMS_SQLITE_PROFILE", "tuned"),
+        persistent=os.environ.get("LMS_PERSISTENT_CONNECTIONS", "1") == "1",
+    ),
+}
+
+# Read replicas: aliases of DATABASES serving the safe requests of views with
+# replica_reads = True (see LMS_DRF/routers.py). LMS_SQLITE_REPLICAS lists
+# read-only copies of db.sqlite3, comma-separated; add PostgreSQL replicas to
+# DATABASES and their aliases here.
+DATABASE_REPLICAS = []
+for index, path in enumerate(filter(None, os.environ.get("LMS_SQLITE_REPLICAS", "").split(",")), start=1):
+    DATABASES[f"replica{index}"] = sqlite_replica(
+        path.strip(),
+        profile=os.environ.get("LMS_SQLITE_PROFILE", "tuned"),
+        persistent=os.environ.get("LMS_PERSISTENT_CONNECTIONS", "1") == "1",
+    )
+    DATABASE_REPLICAS.append(f"replica{index}")
+
+DATABASE_ROUTERS = ["LMS_DRF.routers.ReadReplicaRouter"]
+# Seconds a client reads from default after a write, and a failed replica is skipped
+DATABASE_REPLICA_PIN_SECONDS = 5
+DATABASE_REPLICA_RETRY_SECONDS = 30
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# "api" holds rendered responses of the read-only catalogue endpoints and
+# their invalidation stamps (see LMS_DRF/cache.py), "default" the replica
+# pins (see LMS_DRF/routers.py). LocMemCache is a bounded LRU private to each
+# process, so it only suits a single server process. With more, set
+# LMS_CACHE_URL to a Redis URL (e.g. redis://localhost:6379/0; needs the
+# redis package) to share both between processes.
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "api": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "lms-api",
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "MAX_ENTRIES": 5000,
+            "CULL_FREQUENCY": 10,
+        },
+    },
 }
 
+if os.environ.get("LMS_CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["LMS_CACHE_URL"],
+        },
+        "api": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["LMS_CACHE_URL"],
+            "KEY_PREFIX": "lms-api",
+            "TIMEOUT": 300,
+        },
+    }
+
+API_CACHE_ALIAS = "api"
+API_CACHE_ENABLED = True
+# Every process shares the "api" cache, so its version stamps also validate
+# collection responses (see LMS_DRF/conditional.py)
+API_CACHE_SHARED = bool(os.environ.get("LMS_CACHE_URL"))
+
+# Serve list/retrieve from values() rows (see LMS_DRF/values.py)
+API_VALUES_SERIALIZERS = True
+
+# Per-view SQL, serialization and render timings, Server-Timing headers and
+# /api/_metrics/ (see LMS_DRF/profiling.py). The metrics are served to staff
+# users and to scrapers sending "Authorization: Bearer $LMS_METRICS_TOKEN".
+API_PROFILING = False
+API_PROFILING_DUPLICATE_THRESHOLD = 3
+API_METRICS_TOKEN = os.environ.get("LMS_METRICS_TOKEN", "")
+
+# Change feed (see apps/changes): how long /api/changes/ waits for a change
+# by default and at most, how often waiting readers look for changes written
+# by other processes, and the keep-alive interval of the SSE stream.
+CHANGES_LONG_POLL_SECONDS = 25
+CHANGES_MAX_LONG_POLL_SECONDS = 60
+CHANGES_POLL_SECONDS = 1.0
+CHANGES_HEARTBEAT_SECONDS = 15
+
+# Delta sync of the catalogue (see LMS_DRF/sync.py): rows and deletions per
+# response, and how long changes settle before they are handed out
+SYNC_PAGE_SIZE = 500
+SYNC_SETTLE_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,7 +235,17 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'LMS_DRF.pagination.LibraryPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'LMS_DRF.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'LMS_DRF.renderers.StreamingJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'LMS_DRF.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
@@ -0,0 +1,143 @@
+"""
+Delta sync for mirrors of the catalogue.
+
+``SyncMixin`` adds ``GET <collection>/sync/`` to a viewset. It returns the
+rows created or updated since ``?modified_since=`` (an ISO 8601 datetime)
+or since the ``sync_token`` of the previous response, rendered as the
+list endpoint renders them, and the ids of the rows deleted since, read
+from ``apps.changes.models.Tombstone``. Without either parameter it starts
+from the beginning. Both are read in ``(timestamp, id)`` order through an
+index, so a sync costs what changed rather than the whole table. A
+response holds at most ``SYNC_PAGE_SIZE`` rows and as many deletions;
+while ``more`` is true, call again with the new token.
+
+Timestamps are taken before a write commits, so a row may become visible
+with a timestamp older than a token already handed out. Changes of the
+last ``SYNC_SETTLE_SECONDS`` are therefore left for the next sync. The
+filters of the list endpoint do not apply: a mirror could not tell a row
+leaving the filter from one left alone.
+"""
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from LMS_DRF.pagination import KeysetPagination
+
+
+class SyncParamsSerializer(serializers.Serializer):
+    """Query parameters of the ``sync/`` endpoints; ``position`` holds the parsed start."""
+    modified_since = serializers.DateTimeField(required=False)
+    sync_token = serializers.CharField(required=False)
+
+    def validate_sync_token(self, value):
+        try:
+            position = json.loads(base64.urlsafe_b64decode(value.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise serializers.ValidationError("Invalid sync token.")
+        if not (isinstance(position, dict) and position.keys() == {'rows', 'deleted'}
+                and all(isinstance(value, list) and len(value) == 2 for value in position.values())):
+            raise serializers.ValidationError("Invalid sync token.")
+        return position
+
+    def validate(self, attrs):
+        if 'sync_token' in attrs:
+            attrs['position'] = attrs['sync_token']
+        elif 'modified_since' in attrs:
+            since = [attrs['modified_since'].isoformat(), 0]
+            attrs['position'] = {'rows': since, 'deleted': since}
+        else:
+            attrs['position'] = {'rows': None, 'deleted': None}
+        return attrs
+
+
+def encode_token(position):
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode()
+
+
+class SyncMixin:
+    """
+    Add the ``sync/`` endpoint to a viewset. ``sync_topic`` names its
+    tombstones and ``sync_field`` is the indexed modification timestamp.
+    """
+    sync_topic = None
+    sync_field = 'updated_at'
+
+    def is_sync_request(self):
+        return self.action_map.get('get') == 'sync'
+
+    def get_validators(self, request, **kwargs):
+        # Responses depend on the clock, not only on the data
+        if self.is_sync_request():
+            return None
+        return super().get_validators(request, **kwargs)
+
+    def get_validator_dependencies(self):
+        dependencies = super().get_validator_dependencies()
+        if self.action != 'retrieve':
+            # A deletion only moves the Last-Modified of a collection through its tombstone
+            from apps.changes.models import Tombstone
+            dependencies.append((Tombstone.objects.filter(topic=self.sync_topic), 'deleted_at'))
+        return dependencies
+
+    def use_response_cache(self, request):
+        return not self.is_sync_request() and super().use_response_cache(request)
+
+    def seek(self, queryset, ordering, position, cutoff, fields=()):
+        """
+        The keys (and ``fields``) of the next page after ``position``, the
+        position to continue from and whether more pages follow.
+        """
+        keyset = KeysetPagination(ordering, settings.SYNC_PAGE_SIZE)
+        queryset = queryset.filter(**{f'{ordering[0]}__lt': cutoff}).order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(keyset.seek_filter(position))
+        keys = keyset.set_page(list(queryset.values(*ordering, 'pk', *fields)[:keyset.page_size + 1]))
+        if keyset.has_next:
+            return keys, keyset.get_position(keys[-1]), True
+        # Everything before the cutoff has been seen
+        return keys, [cutoff.isoformat(), 0], False
+
+    def get_sync_data(self, pks):
+        queryset = self.get_queryset().filter(pk__in=pks).order_by(self.sync_field, 'pk')
+        if self.use_values_serializer():
+            serializer_class = self.get_values_serializer_class()
+            return serializer_class(serializer_class.get_values(queryset), many=True).data
+        return self.get_serializer(queryset, many=True).data
+
+    @swagger_auto_schema(
+        query_serializer=SyncParamsSerializer,
+        responses={200: "Rows changed and ids deleted since the token, the next `sync_token` and `more`"},
+        operation_description="Rows created, updated or deleted since `modified_since` or `sync_token`"
+    )
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """Delta of the collection since a point in time or an earlier sync."""
+        from apps.changes.models import Tombstone
+
+        params = SyncParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        position = params.validated_data['position']
+        cutoff = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+        rows, rows_position, more_rows = self.seek(
+            self.get_queryset().prefetch_related(None), (self.sync_field, 'id'), position['rows'], cutoff
+        )
+        deleted, deleted_position, more_deleted = self.seek(
+            Tombstone.objects.filter(topic=self.sync_topic), ('deleted_at', 'id'), position['deleted'], cutoff,
+            fields=('object_id',)
+        )
+
+        return Response({
+            'results': self.get_sync_data([key['pk'] for key in rows]) if rows else [],
+            'deleted': [key['object_id'] for key in deleted],
+            'sync_token': encode_token({'rows': rows_position, 'deleted': deleted_position}),
+            'more': more_rows or more_deleted,
+        })
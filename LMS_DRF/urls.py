@@ -23,6 +23,8 @@ from django.urls import path, include
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from LMS_DRF.profiling import metrics_view
+
 if TYPE_CHECKING:
     from drf_yasg.views import SchemaView
 
@@ -36,10 +38,12 @@ schema_view: SchemaView = get_schema_view(
 
 urlpatterns: list[path] = [
     path("admin/", admin.site.urls),
+    path("api/_metrics/", metrics_view, name='metrics'),
     path("api/", include('apps.books.api.urls')),
     path("api/", include('apps.category.api.urls')),
     path("api/", include('apps.review.api.urls')),
     path("api/", include('apps.reservation.api.urls')),
+    path("api/", include('apps.changes.api.urls')),
 
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
@@ -0,0 +1,19 @@
+"""
+URL configuration used under ASGI (``settings.ASGI_URLCONF``).
+
+The same routes as ``LMS_DRF.urls``, with the list and retrieve routes of
+``AsyncReadMixin`` viewsets served by their async views, the change feed
+waiting on the event loop and its server-sent events stream, which only
+exists here.
+"""
+from django.urls import path
+
+from LMS_DRF.async_views import async_urlpatterns
+from LMS_DRF.urls import urlpatterns as sync_urlpatterns
+from apps.changes.api.views import ChangeFeedView
+
+urlpatterns = [
+    path("api/changes/", ChangeFeedView.as_async_view(), name='changes'),
+    path("api/changes/stream/", ChangeFeedView.as_async_view(stream=True), name='changes-stream'),
+    *async_urlpatterns(sync_urlpatterns),
+]
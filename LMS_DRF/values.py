@@ -0,0 +1,150 @@
+"""
+Read-optimized serialization for list and retrieve endpoints.
+
+``ValuesSerializer`` builds the response straight from ``QuerySet.values()``
+rows instead of model instances and DRF field objects, and must produce
+exactly the same JSON as the ``ModelSerializer`` it stands in for.
+``ValuesReadMixin`` switches a viewset's list/retrieve to it while
+``API_VALUES_SERIALIZERS`` is enabled; writes keep the model serializers.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from LMS_DRF.renderers import StreamingJSONRenderer
+
+
+def format_datetime(value):
+    """Same output as ``rest_framework.fields.DateTimeField`` with default settings."""
+    if value is None:
+        return None
+    if settings.USE_TZ and timezone.is_aware(value):
+        value = value.astimezone(timezone.get_current_timezone())
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def format_str(value):
+    return None if value is None else str(value)
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer over ``values()`` rows.
+
+    Subclasses list the columns to select in ``values_fields`` and build
+    each output dict in ``to_representation``. ``prepare`` runs once per
+    page, e.g. to fetch related ids for all rows in one query.
+    """
+    values_fields = ()
+    # Output fields not built from the column of the same name: the columns they need.
+    # FieldsetMixin defers the other model columns by them too
+    field_sources = {}
+    # Set by ``narrow``
+    fields = None
+    expand = ()
+    missing = {}
+
+    def __init__(self, instance=None, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def get_values(cls, queryset):
+        return queryset.prefetch_related(None).values(*cls.values_fields)
+
+    @classmethod
+    def narrow(cls, fields=None, expand=()):
+        """
+        A subclass for ``?fields=`` and ``?expand=`` (see ``LMS_DRF.fieldsets``).
+        It only selects the columns ``fields`` need; the others reach
+        ``to_representation`` as None and their fields are dropped.
+        """
+        if fields is None and not expand:
+            return cls
+        attrs = {'expand': tuple(expand)}
+        if fields is not None:
+            needed = {'id', *(column for name in fields for column in cls.field_sources.get(name, (name,)))}
+            attrs.update(
+                fields=frozenset(fields),
+                values_fields=tuple(column for column in cls.values_fields if column in needed),
+                missing=dict.fromkeys(column for column in cls.values_fields if column not in needed),
+            )
+        return type(cls.__name__, (cls,), attrs)
+
+    def prepare(self, rows):
+        pass
+
+    def to_representation(self, row):
+        raise NotImplementedError
+
+    def represent(self, row):
+        """``to_representation`` limited to ``fields``."""
+        if self.fields is None:
+            return self.to_representation(row)
+        data = self.to_representation({**self.missing, **row})
+        return {name: value for name, value in data.items() if name in self.fields}
+
+    @property
+    def data(self):
+        if not self.many:
+            self.prepare([self.instance])
+            return self.represent(self.instance)
+        return list(self.iter_data())
+
+    async def adata(self):
+        """``data`` for async views; ``prepare`` may query, so it runs in a thread."""
+        rows = list(self.instance) if self.many else [self.instance]
+        if type(self).prepare is not ValuesSerializer.prepare:
+            await sync_to_async(self.prepare)(rows)
+        data = [self.represent(row) for row in rows]
+        return data if self.many else data[0]
+
+    def iter_data(self):
+        """Yield output dicts one at a time, for streaming renderers."""
+        rows = list(self.instance)
+        self.prepare(rows)
+        return map(self.represent, rows)
+
+
+class ValuesReadMixin:
+    """Serve list and retrieve through ``values_serializer_class``."""
+    values_serializer_class = None
+
+    def use_values_serializer(self):
+        return settings.API_VALUES_SERIALIZERS and self.values_serializer_class is not None
+
+    def get_values_serializer_class(self):
+        return self.values_serializer_class
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values_serializer():
+            return super().list(request, *args, **kwargs)
+
+        serializer_class = self.get_values_serializer_class()
+        rows = serializer_class.get_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        serializer = serializer_class(rows if page is None else page, many=True)
+        if isinstance(request.accepted_renderer, StreamingJSONRenderer):
+            data = serializer.iter_data()
+        else:
+            data = serializer.data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_values_serializer():
+            return super().retrieve(request, *args, **kwargs)
+
+        serializer_class = self.get_values_serializer_class()
+        rows = serializer_class.get_values(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(rows, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        return Response(serializer_class(row).data)
@@ -1,10 +1,14 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+from apps.books import search
 from apps.books.models import Book
 
 
 class BookFilter(filters.FilterSet):
     year_min = filters.NumberFilter(field_name="year", lookup_expr='gte')
     year_max = filters.NumberFilter(field_name="year", lookup_expr='lte')
+    availability = filters.BooleanFilter(method='filter_availability')
 
     class Meta:
         model = Book
@@ -12,7 +16,33 @@ class BookFilter(filters.FilterSet):
             'author': ['exact', 'icontains'],
             'title': ['exact', 'icontains'],
             'year': ['exact'],
-            'availability': ['exact'],
             'categories__id': ['exact'],
             'categories__name': ['exact', 'icontains'],
         }
+
+    def filter_availability(self, queryset, name, value):
+        """A copy on the shelf; ``true`` uses the partial index on ``available_count > 0``."""
+        return queryset.available() if value else queryset.filter(available_count=0)
+
+
+class BookSearchFilter(SearchFilter):
+    """
+    ``?search=`` backed by the full-text index in ``apps.books.search``.
+
+    Words are AND-ed and prefix-matched. Results are ordered by relevance
+    unless the client passes an explicit ``?ordering=``, so this backend
+    must come after ``OrderingFilter``. Falls back to DRF's ``icontains``
+    search on backends without a full-text index.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+
+        matched = search.search(queryset, term)
+        if matched is None:
+            return super().filter_queryset(request, queryset, view)
+        if 'search_rank' in matched.query.annotations and api_settings.ORDERING_PARAM not in request.query_params:
+            matched = matched.order_by('search_rank', 'id')
+        return matched
@@ -0,0 +1,53 @@
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class StreamingListMixin:
+    """
+    Paginated list responses with an opt-in NDJSON streaming mode.
+
+    By default the queryset goes through the configured paginator.
+    With ``?stream=true`` rows are read with ``QuerySet.iterator()`` and
+    written one JSON object per line, so memory stays flat for bulk exports.
+    """
+    stream_param = 'stream'
+    stream_chunk_size = 2000
+
+    def wants_stream(self):
+        value = self.request.query_params.get(self.stream_param, '')
+        return value.lower() in ('true', '1', 'ndjson')
+
+    def list_response(self, queryset):
+        """Return a paginated (or streamed) response for the given queryset."""
+        if self.wants_stream():
+            return self.stream_response(queryset)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def stream_response(self, queryset):
+        """Stream the queryset as newline-delimited JSON."""
+        response = StreamingHttpResponse(
+            self.iter_ndjson(queryset),
+            content_type='application/x-ndjson'
+        )
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def iter_ndjson(self, queryset):
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        encoder = JSONEncoder(ensure_ascii=False)
+        while True:
+            chunk = list(islice(rows, self.stream_chunk_size))
+            if not chunk:
+                break
+            serializer = self.get_serializer(chunk, many=True)
+            yield ''.join(encoder.encode(item) + '\n' for item in serializer.data)
@@ -1,11 +1,17 @@
+from collections import defaultdict
+
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.serializers import CharField, BooleanField, IntegerField
 
 from apps.books.models import Book
+from apps.category.api.serializers import CategorySerializer
 from apps.category.models import Category
+from LMS_DRF.fieldsets import FieldsetSerializerMixin
+from LMS_DRF.values import ValuesSerializer, format_str
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
 
     title: CharField = CharField(
         min_length=3,
@@ -34,9 +40,14 @@ class BookSerializer(serializers.ModelSerializer):
         max_value=2100,
         help_text='Release year'
     )
+    copies: IntegerField = IntegerField(
+        min_value=0,
+        default=1,
+        help_text='Copies the library owns'
+    )
     availability: BooleanField = BooleanField(
-        default=True,
-        help_text='Availability status'
+        read_only=True,
+        help_text='Whether a copy is on the shelf'
     )
     categories = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -47,5 +58,59 @@ class BookSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ['id', 'title', 'author', 'ISBN', 'description',
-                  'year', 'availability', 'categories']
-        read_only_fields = ['id']
+                  'year', 'availability', 'copies', 'available_count', 'categories', 'rating_count', 'rating_avg']
+        read_only_fields = ['id', 'available_count', 'rating_count', 'rating_avg']
+
+    expandable_fields = {
+        'categories': (CategorySerializer, {'many': True}),
+    }
+
+    def update(self, instance, validated_data):
+        """Save the book, then change its copies with a conditional UPDATE; added copies serve holds first."""
+        copies = validated_data.pop('copies', instance.copies)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if copies != instance.copies:
+                if not Book.objects.filter(pk=instance.pk).set_copies(copies):
+                    raise serializers.ValidationError({
+                        'copies': "More copies of this book are checked out."
+                    })
+                instance.refresh_from_db(fields=['copies', 'available_count', 'updated_at'])
+        return instance
+
+
+class BookValuesSerializer(ValuesSerializer):
+    """Read-only twin of BookSerializer built from ``values()`` rows."""
+    values_fields = ('id', 'title', 'author', 'ISBN', 'description', 'year',
+                     'copies', 'available_count', 'rating_count', 'rating_avg')
+    field_sources = {'availability': ('available_count',), 'categories': ('id',)}
+
+    def prepare(self, rows):
+        """Fetch the category ids, or expanded categories, of the whole page with one query."""
+        self.categories = defaultdict(list)
+        if self.fields is not None and 'categories' not in self.fields:
+            return
+        through = Book.categories.through.objects.filter(book_id__in=[row['id'] for row in rows])
+        through = through.order_by('book_id', 'category_id')
+        if 'categories' in self.expand:
+            for book_id, category_id, name in through.values_list('book_id', 'category_id', 'category__name'):
+                self.categories[book_id].append({'id': category_id, 'name': format_str(name)})
+            return
+        for book_id, category_id in through.values_list('book_id', 'category_id'):
+            self.categories[book_id].append(category_id)
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'title': format_str(row['title']),
+            'author': format_str(row['author']),
+            'ISBN': format_str(row['ISBN']),
+            'description': format_str(row['description']),
+            'year': row['year'],
+            'availability': bool(row['available_count']),
+            'copies': row['copies'],
+            'available_count': row['available_count'],
+            'categories': self.categories[row['id']],
+            'rating_count': row['rating_count'],
+            'rating_avg': row['rating_avg'],
+        }
@@ -4,27 +4,71 @@ from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django_filters.rest_framework import DjangoFilterBackend
+from LMS_DRF.async_views import AsyncReadMixin
+from LMS_DRF.cache import ResponseCacheMixin
+from LMS_DRF.conditional import ConditionalGetMixin
+from LMS_DRF.fieldsets import FieldsetMixin, expand_parameter, fields_parameter
+from LMS_DRF.renderers import StreamingRenderMixin
+from LMS_DRF.sync import SyncMixin
+from LMS_DRF.values import ValuesReadMixin
 from apps.books.models import Book
 from apps.category.models import Category
-from apps.books.api.serializers import BookSerializer
+from apps.books.api.serializers import BookSerializer, BookValuesSerializer
 from apps.books.api.permissions import IsAdminOrReadOnly
-from apps.books.api.filters import BookFilter
+from apps.books.api.filters import BookFilter, BookSearchFilter
+from apps.books.api.mixins import StreamingListMixin
+from apps.books.importer import BookImporter
 
 
-class BookViewSet(viewsets.ModelViewSet):
+stream_parameter = openapi.Parameter(
+    'stream', openapi.IN_QUERY,
+    description="Stream all matching books as NDJSON instead of a paginated page",
+    type=openapi.TYPE_BOOLEAN
+)
+fieldset_parameters = [fields_parameter('id,title,author'), expand_parameter('categories')]
+
+
+class BookViewSet(SyncMixin, FieldsetMixin, AsyncReadMixin, ConditionalGetMixin, ResponseCacheMixin,
+                  StreamingRenderMixin, ValuesReadMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all().order_by('title')
     serializer_class = BookSerializer
+    values_serializer_class = BookValuesSerializer
     permission_classes = [IsAdminOrReadOnly]
     filterset_class = BookFilter
 
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
-        filters.OrderingFilter
+        filters.OrderingFilter,
+        BookSearchFilter
     ]
     search_fields = ['title', 'author', 'description', 'ISBN']
-    ordering_fields = ['title', 'author', 'year']
+    ordering_fields = ['title', 'author', 'year', 'rating_avg', 'rating_count']
     ordering = ['title']
+    keyset_ordering = ('title', 'id')
+    cache_namespaces = ('books', 'categories')
+    sync_topic = 'book'
+    replica_reads = True
+
+    def get_queryset(self):
+        """
+        Single entry point for every book query in this viewset.
+        Prefetches category ids, or whole categories for ``?expand=categories``,
+        so serialization costs a fixed number of queries.
+        """
+        queryset = super().get_queryset()
+        fields, expand = self.get_fieldset()
+        if 'categories' in expand:
+            return queryset.with_categories()
+        if fields is None or 'categories' in fields:
+            return queryset.with_category_ids()
+        return queryset
+
+    def get_validator_dependencies(self):
+        """Expanded categories render their names, which change without touching the books."""
+        dependencies = super().get_validator_dependencies()
+        if 'categories' in self.get_fieldset()[1]:
+            dependencies.append((Category.objects.all(), 'updated_at'))
+        return dependencies
 
     @swagger_auto_schema(
         operation_description="Get a list of books with pagination and filtering",
@@ -54,6 +98,7 @@ class BookViewSet(viewsets.ModelViewSet):
                 description="Filter by publication year",
                 type=openapi.TYPE_INTEGER
             ),
+            *fieldset_parameters,
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -68,7 +113,8 @@ class BookViewSet(viewsets.ModelViewSet):
         return super().create(request, *args, **kwargs)
 
     @swagger_auto_schema(
-        operation_description="Get detailed information about a specific book"
+        operation_description="Get detailed information about a specific book",
+        manual_parameters=fieldset_parameters
     )
     def retrieve(self, request, *args, **kwargs):
         """Get details of a specific book."""
@@ -97,58 +143,73 @@ class BookViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_description="Get all available books",
+        manual_parameters=[stream_parameter],
         responses={200: BookSerializer(many=True)}
     )
     @action(detail=False, methods=['get'])
     def available(self, request):
         """Get all books that are available for reservation."""
-        books = self.queryset.filter(availability=True)
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        books = self.get_queryset().available()
+        return self.list_response(books)
 
     @swagger_auto_schema(
         operation_description="Get books by specific category",
+        manual_parameters=[stream_parameter],
         responses={200: BookSerializer(many=True)}
     )
     @action(detail=False, methods=['get'], url_path='category/(?P<category_id>\d+)')
     def by_category(self, request, category_id):
         """Get all books in a specific category."""
-        books = self.queryset.filter(categories__id=category_id)
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        books = self.get_queryset().filter(categories__id=category_id)
+        return self.list_response(books)
 
     @swagger_auto_schema(
         operation_description="Get books by author name",
+        manual_parameters=[stream_parameter],
         responses={200: BookSerializer(many=True)}
     )
     @action(detail=False, methods=['get'], url_path='author/(?P<author_name>[\w\s]+)')
     def by_author(self, request, author_name):
         """Get all books by a specific author."""
-        books = self.queryset.filter(author__icontains=author_name)
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        books = self.get_queryset().filter(author__icontains=author_name)
+        return self.list_response(books)
 
     @swagger_auto_schema(
         operation_description="Get books by title",
+        manual_parameters=[stream_parameter],
         responses={200: BookSerializer(many=True)}
     )
     @action(detail=False, methods=['get'], url_path='title/(?P<title>[\w\s]+)')
     def by_title(self, request, title):
         """Get all books with a specific title."""
-        books = self.queryset.filter(title__icontains=title)
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        books = self.get_queryset().filter(title__icontains=title)
+        return self.list_response(books)
 
     @swagger_auto_schema(
         operation_description="Get books by publication year",
+        manual_parameters=[stream_parameter],
         responses={200: BookSerializer(many=True)}
     )
     @action(detail=False, methods=['get'], url_path='year/(?P<year>\d+)')
     def by_year(self, request, year):
         """Get all books published in a specific year."""
-        books = self.queryset.filter(year=year)
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        books = self.get_queryset().filter(year=year)
+        return self.list_response(books)
+
+    @swagger_auto_schema(
+        operation_description="Import many books at once, upserting by ISBN (admin only)",
+        responses={200: "Import summary", 400: "Request body is not a list of books"}
+    )
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Import a JSON list of books (admin only).
+        Categories are given by name and created when missing.
+        """
+        rows = request.data.get('books') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({"detail": "Expected a list of books"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(BookImporter().run(rows))
 
     @swagger_auto_schema(
         operation_description="Add a category to a book (admin only)",
@@ -169,7 +230,7 @@ class BookViewSet(viewsets.ModelViewSet):
         operation_description="Remove a category from a book (admin only)",
         responses={204: "Category removed successfully", 400: "Invalid request or category not found"}
     )
-    @action(detail=True, methods=['delete'], url_path='categories/(?P<category_name>[\w\s]+)')
+    @add_category.mapping.delete
     def remove_category(self, request, pk, category_name):
         """Remove a category from a book (admin only)."""
         book = self.get_object()
@@ -0,0 +1,172 @@
+"""
+Bulk catalogue ingestion.
+
+Rows are validated a batch at a time, upserted by ISBN with a single
+``bulk_create(update_conflicts=True)`` and linked to their categories with
+one bulk insert into the through table. Category names are resolved with
+one lookup per batch. Used by ``manage.py import_books`` and
+``POST /api/books/bulk/``.
+"""
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from LMS_DRF import cache as response_cache
+from apps.books import search
+from apps.books.api.serializers import BookSerializer
+from apps.books.models import Book
+from apps.category.models import Category
+
+# Fields refreshed when an incoming row matches an existing ISBN.
+# Inventory (``copies``) is set when a book is first imported and then
+# changed through the API, which keeps checked-out copies consistent.
+UPSERT_FIELDS = ['title', 'author', 'description', 'year']
+
+
+class BookImportSerializer(BookSerializer):
+    """Validates one feed row; categories are given by name."""
+    categories = serializers.ListField(
+        child=serializers.CharField(max_length=50),
+        required=False
+    )
+
+
+class BookImporter:
+
+    def __init__(self, batch_size=1000, max_errors=100):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.processed = 0
+        self.imported = 0
+        self.invalid = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    def run(self, rows, on_batch=None):
+        """Import an iterable of row dicts; returns the summary."""
+        rows = iter(rows)
+        started = time.perf_counter()
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+            self.elapsed = time.perf_counter() - started
+            if on_batch is not None:
+                on_batch(self)
+        self.elapsed = time.perf_counter() - started
+        return self.summary()
+
+    def import_batch(self, batch):
+        serializer = BookImportSerializer(data=batch, many=True)
+        if not serializer.is_valid():
+            # A failing row discards the whole batch's validated data, so
+            # record the errors and validate the remaining rows again.
+            errors_by_row = serializer.errors
+            if isinstance(errors_by_row, dict):
+                # Newer DRF versions key list errors by index and omit valid rows
+                errors_by_row = [errors_by_row.get(offset, {}) for offset in range(len(batch))]
+
+            good = []
+            for offset, (row, errors) in enumerate(zip(batch, errors_by_row)):
+                if not errors:
+                    good.append(row)
+                    continue
+                self.invalid += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append({'row': self.processed + offset + 1, 'errors': errors})
+            serializer = BookImportSerializer(data=good, many=True)
+            serializer.is_valid(raise_exception=True)
+
+        self.processed += len(batch)
+        if serializer.validated_data:
+            self.save(serializer.validated_data)
+            self.imported += len(serializer.validated_data)
+
+    @transaction.atomic
+    def save(self, rows):
+        # The same ISBN twice in one upsert statement is an error; the last row wins
+        by_isbn = {}
+        for index, row in enumerate(rows):
+            by_isbn[row.get('ISBN') or index] = row
+        rows = list(by_isbn.values())
+
+        books = [
+            Book(**{field: row.get(field) for field in UPSERT_FIELDS}, ISBN=row.get('ISBN'),
+                 copies=row.get('copies', 1), available_count=row.get('copies', 1))
+            for row in rows
+        ]
+        Book.objects.bulk_create(
+            books,
+            update_conflicts=True,
+            unique_fields=['ISBN'],
+            update_fields=UPSERT_FIELDS + ['updated_at'],
+        )
+
+        missing_pk = [book.ISBN for book in books if book.pk is None]
+        if missing_pk:
+            ids = dict(Book.objects.filter(ISBN__in=missing_pk).values_list('ISBN', 'pk'))
+            for book in books:
+                if book.pk is None:
+                    book.pk = ids[book.ISBN]
+
+        self.link_categories(books, rows)
+        search.index_books([book.pk for book in books])
+        response_cache.bump('books', 'categories')
+
+    def link_categories(self, books, rows):
+        """Replace the category sets of the batch with two bulk statements."""
+        names = {name for row in rows for name in row.get('categories', [])}
+        categories = self.resolve_categories(names)
+
+        Through = Book.categories.through
+        with_categories = [book.pk for book, row in zip(books, rows) if 'categories' in row]
+        Through.objects.filter(book_id__in=with_categories).delete()
+        Through.objects.bulk_create([
+            Through(book_id=book.pk, category_id=categories[name])
+            for book, row in zip(books, rows)
+            for name in set(row.get('categories', []))
+        ], ignore_conflicts=True)
+
+    def resolve_categories(self, names):
+        """Map category names to ids, creating the ones not seen before."""
+        if not names:
+            return {}
+        categories = dict(Category.objects.filter(name__in=names).values_list('name', 'pk'))
+        missing = names - categories.keys()
+        if missing:
+            Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+            categories.update(Category.objects.filter(name__in=missing).values_list('name', 'pk'))
+        return categories
+
+    def summary(self):
+        return {
+            'processed': self.processed,
+            'imported': self.imported,
+            'invalid': self.invalid,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.processed / self.elapsed, 1) if self.elapsed else None,
+            'errors': self.errors,
+        }
+
+
+def read_rows(stream, fmt, category_separator=';'):
+    """Yield row dicts from a CSV or JSON Lines stream without loading it whole."""
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            row = {key: value for key, value in row.items() if value not in ('', None)}
+            if 'categories' in row:
+                row['categories'] = [
+                    name.strip() for name in row['categories'].split(category_separator) if name.strip()
+                ]
+            yield row
+    elif fmt == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.books.importer import BookImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = "Stream books from a CSV or JSON Lines file and upsert them by ISBN in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input.")
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help="Input format (defaults to the file extension)."
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--category-separator', default=';',
+            help="Separator between category names in the CSV 'categories' column."
+        )
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or self.guess_format(options['path'])
+        importer = BookImporter(batch_size=options['batch_size'])
+
+        def report(progress):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f"{progress.processed} rows, {progress.invalid} invalid, "
+                    f"{progress.processed / progress.elapsed:.0f} rows/s"
+                )
+
+        if options['path'] == '-':
+            summary = importer.run(read_rows(sys.stdin, fmt, options['category_separator']), report)
+        else:
+            with open(options['path'], newline='', encoding='utf-8') as stream:
+                summary = importer.run(read_rows(stream, fmt, options['category_separator']), report)
+
+        for error in summary['errors']:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['imported']} of {summary['processed']} rows "
+            f"({summary['invalid']} invalid) in {summary['seconds']}s, "
+            f"{summary['rows_per_second'] or 0} rows/s"
+        ))
+
+    def guess_format(self, path):
+        suffix = Path(path).suffix.lower()
+        if suffix == '.csv':
+            return 'csv'
+        if suffix in ('.jsonl', '.ndjson'):
+            return 'jsonl'
+        raise CommandError("Cannot guess the input format, pass --format.")
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# The SQL is spelled out here rather than imported from apps.books.search, so
+# later changes to the live module cannot change what this migration does.
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_book_fts USING fts5("
+    "title, author, description, isbn, categories, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "INSERT INTO books_book_fts (rowid, title, author, description, isbn, categories) "
+    "SELECT b.id, b.title, b.author, COALESCE(b.description, ''), COALESCE(b.\"ISBN\", ''), "
+    "COALESCE((SELECT group_concat(c.name, ' ') FROM books_book_categories bc "
+    "JOIN category_category c ON c.id = bc.category_id WHERE bc.book_id = b.id), '') "
+    "FROM books_book b",
+]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS books_book_search ("
+    "book_id bigint PRIMARY KEY REFERENCES books_book (id) "
+    "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS books_book_search_document_idx "
+    "ON books_book_search USING GIN (document)",
+    "INSERT INTO books_book_search (book_id, document) "
+    "SELECT b.id, "
+    "setweight(to_tsvector('simple', b.title), 'A') || "
+    "setweight(to_tsvector('simple', b.author), 'B') || "
+    "setweight(to_tsvector('simple', COALESCE((SELECT string_agg(c.name, ' ') FROM books_book_categories bc "
+    "JOIN category_category c ON c.id = bc.category_id WHERE bc.book_id = b.id), '')), 'B') || "
+    "setweight(to_tsvector('simple', COALESCE(b.\"ISBN\", '')), 'C') || "
+    "setweight(to_tsvector('simple', COALESCE(b.description, '')), 'D') "
+    "FROM books_book b "
+    "ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document",
+]
+
+CREATE = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}
+DROP = {'sqlite': "DROP TABLE IF EXISTS books_book_fts", 'postgresql': "DROP TABLE IF EXISTS books_book_search"}
+
+
+def create_search_index(apps, schema_editor):
+    for statement in CREATE.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in DROP:
+        schema_editor.execute(DROP[schema_editor.connection.vendor])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0003_book_book_title_id_idx"),
+        ("category", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:15
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfill_ratings(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    Review = apps.get_model('review', 'Review')
+
+    reviews = Review.objects.filter(book=models.OuterRef('pk')).order_by().values('book')
+    Book.objects.update(
+        rating_count=Coalesce(models.Subquery(reviews.annotate(n=models.Count('id')).values('n')), 0),
+        rating_sum=Coalesce(models.Subquery(reviews.annotate(s=models.Sum('rating')).values('s')), 0),
+    )
+    Book.objects.filter(rating_count__gt=0).update(
+        rating_avg=Cast(models.F('rating_sum'), models.FloatField()) / Cast(models.F('rating_count'), models.FloatField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_filter_indexes'),
+        ('category', '0001_initial'),
+        ('review', '0003_alter_review_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_avg',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-rating_avg', 'id'], name='book_rating_avg_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+def shelve_available_books(apps, schema_editor):
+    """Every book owns one copy, on the shelf unless it is reserved."""
+    Book = apps.get_model('books', 'Book')
+    Book.objects.filter(availability=False).update(available_count=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='copies',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='available_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(shelve_available_books, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='book_available_title_idx',
+        ),
+        migrations.RemoveField(
+            model_name='book',
+            name='availability',
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('available_count__gt', 0)), fields=['title', 'id'], name='book_available_title_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('available_count__lte', models.F('copies'))), name='book_available_lte_copies'),
+        ),
+    ]
@@ -1,4 +1,136 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Cast, Coalesce, Least
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from LMS_DRF import cache as response_cache
+
+
+class BookQuerySet(models.QuerySet):
+
+    def update(self, **kwargs) -> int:
+        """
+        Set-based updates skip model signals and ``auto_now``, so stamp
+        ``updated_at`` and invalidate cached book responses here.
+        """
+        kwargs.setdefault('updated_at', timezone.now())
+        updated = super().update(**kwargs)
+        if updated:
+            response_cache.bump('books')
+        return updated
+
+    def available(self) -> 'BookQuerySet':
+        """Books with at least one copy on the shelf, served by a partial index."""
+        return self.filter(available_count__gt=0)
+
+    def check_out(self) -> int:
+        """
+        Take one copy of each book off the shelf with a single conditional
+        UPDATE. Returns how many books had a copy left; concurrent callers
+        can never take more copies than there are.
+        """
+        from apps.changes.models import record_availability
+
+        with transaction.atomic(savepoint=False):
+            updated = self.filter(available_count__gt=0).update(available_count=models.F('available_count') - 1)
+            if updated:
+                # Our UPDATE holds these rows: a book at 0 now had a copy before
+                record_availability(self.filter(available_count=0).values_list('pk', 'available_count'))
+        return updated
+
+    def check_in(self, copies: int = 1) -> int:
+        """Put ``copies`` copies of each book back, never more than it owns."""
+        from apps.changes.models import record_availability
+
+        with transaction.atomic(savepoint=False):
+            updated = self.update(available_count=Least(models.F('available_count') + copies, models.F('copies')))
+            if updated:
+                # Every book that was empty is at most ``copies`` now
+                record_availability(self.filter(available_count__gt=0, available_count__lte=copies)
+                                    .values_list('pk', 'available_count'))
+        return updated
+
+    def set_copies(self, copies: int) -> int:
+        """
+        Change the number of copies owned. Removed copies come off the
+        shelf; added ones go to the holds waiting for the book first, see
+        ``HoldQuerySet.hand_over``. Skips books with more than ``copies``
+        checked out; returns how many books changed.
+        """
+        from apps.changes.models import record_availability
+        from apps.reservation.models import Hold
+
+        with transaction.atomic(savepoint=False):
+            changed = self.filter(available_count__gte=models.F('copies') - copies)
+            owned = dict(changed.select_for_update().values_list('pk', 'copies'))
+            updated = Book.objects.filter(pk__in=owned).update(
+                available_count=Least(models.F('available_count') + copies - models.F('copies'),
+                                      models.F('available_count')),
+                copies=copies,
+            )
+            removed = [pk for pk, old in owned.items() if old > copies]
+            record_availability(Book.objects.filter(pk__in=removed).values_list('pk', 'available_count'))
+            Hold.objects.hand_over({pk: copies - old for pk, old in owned.items() if old < copies})
+        return updated
+
+    def touch(self) -> int:
+        """Mark the books as modified, e.g. after changes to related rows."""
+        return self.update()
+
+    def with_category_ids(self) -> 'BookQuerySet':
+        """Prefetch category ids in a single query instead of one per book."""
+        from apps.category.models import Category
+
+        return self.prefetch_related(
+            models.Prefetch('categories', queryset=Category.objects.only('id').order_by('id'))
+        )
+
+    def with_categories(self) -> 'BookQuerySet':
+        """Prefetch whole categories, e.g. to embed them, in a single query."""
+        from apps.category.models import Category
+
+        return self.prefetch_related(models.Prefetch('categories', queryset=Category.objects.order_by('id')))
+
+    def add_ratings(self, count: int, total: int) -> int:
+        """
+        Adjust the rating aggregates in place with a single UPDATE.
+        ``count`` and ``total`` may be negative when reviews are removed.
+        """
+        new_count = models.F('rating_count') + count
+        new_sum = models.F('rating_sum') + total
+        return self.update(
+            rating_count=new_count,
+            rating_sum=new_sum,
+            rating_avg=rating_average(new_count, new_sum),
+        )
+
+    def rebuild_ratings(self) -> int:
+        """Recompute the rating aggregates from the review table, set-wise."""
+        from apps.review.models import Review
+
+        reviews = Review.objects.filter(book=models.OuterRef('pk')).order_by().values('book')
+        with transaction.atomic(savepoint=False):
+            updated = self.update(
+                rating_count=Coalesce(models.Subquery(reviews.annotate(n=models.Count('id')).values('n')), 0),
+                rating_sum=Coalesce(models.Subquery(reviews.annotate(s=models.Sum('rating')).values('s')), 0),
+            )
+            self.update(rating_avg=rating_average(models.F('rating_count'), models.F('rating_sum')))
+        return updated
+
+
+INVENTORY_FIELDS = ('copies', 'available_count')
+
+
+def rating_average(count, total) -> models.Case:
+    """SQL expression for the average rating, 0 for books without reviews."""
+    return models.Case(
+        models.When(
+            GreaterThan(count, 0),
+            then=Cast(total, models.FloatField()) / Cast(count, models.FloatField())
+        ),
+        default=models.Value(0.0),
+        output_field=models.FloatField(),
+    )
 
 
 class Book(models.Model):
@@ -7,8 +139,52 @@ class Book(models.Model):
     ISBN = models.CharField(max_length=17, unique=True, null=True, blank=True)
     description = models.CharField(max_length=500, null=True, blank=True)
     year = models.PositiveIntegerField()
-    availability = models.BooleanField(default=True)
     categories = models.ManyToManyField('category.Category', related_name='books')
 
+    # Inventory: copies owned and copies on the shelf. Both only change
+    # through the conditional UPDATEs of ``BookQuerySet``; ``save()`` leaves
+    # them alone so it never overwrites a concurrent checkout.
+    copies = models.PositiveIntegerField(default=1)
+    available_count = models.PositiveIntegerField(default=1)
+
+    # Denormalized from reviews, maintained by apps.review.signals
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0.0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+            models.Index(fields=['author', 'title'], name='book_author_title_idx'),
+            models.Index(fields=['year', 'title'], name='book_year_title_idx'),
+            models.Index(fields=['title', 'id'], name='book_available_title_idx',
+                         condition=models.Q(available_count__gt=0)),
+            models.Index(fields=['-rating_avg', 'id'], name='book_rating_avg_idx'),
+            models.Index(fields=['updated_at', 'id'], name='book_updated_id_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(available_count__lte=models.F('copies')),
+                                   name='book_available_lte_copies'),
+        ]
+
     def __str__(self) -> models.CharField:
         return self.title
+
+    @property
+    def availability(self) -> bool:
+        return self.available_count > 0
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # New books start with every copy on the shelf
+            self.available_count = self.copies
+        elif kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in INVENTORY_FIELDS
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,174 @@
+"""
+Full-text search index for books.
+
+SQLite uses an FTS5 virtual table keyed by the book id, PostgreSQL uses a
+side table with a weighted ``tsvector`` column and a GIN index. Both hold
+title, author, description, ISBN and category names, and are kept in sync
+by the signal handlers in ``apps.books.signals``. Other backends have no
+index and fall back to DRF's ``icontains`` search.
+"""
+import re
+
+from django.db import connection as default_connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+SQLITE_TABLE = 'books_book_fts'
+POSTGRES_TABLE = 'books_book_search'
+
+# Column weights: title, author, description, ISBN, categories
+SQLITE_WEIGHTS = '10.0, 5.0, 1.0, 2.0, 3.0'
+
+CATEGORY_NAMES_SQL = {
+    'sqlite': (
+        "SELECT group_concat(c.name, ' ') FROM books_book_categories bc "
+        "JOIN category_category c ON c.id = bc.category_id WHERE bc.book_id = b.id"
+    ),
+    'postgresql': (
+        "SELECT string_agg(c.name, ' ') FROM books_book_categories bc "
+        "JOIN category_category c ON c.id = bc.category_id WHERE bc.book_id = b.id"
+    ),
+}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported(connection=default_connection):
+    return connection.vendor in CATEGORY_NAMES_SQL
+
+
+def create_index(connection=default_connection):
+    """Create the search table for the current backend."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+                "title, author, description, isbn, categories, "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+                "book_id bigint PRIMARY KEY REFERENCES books_book (id) "
+                "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_idx "
+                f"ON {POSTGRES_TABLE} USING GIN (document)"
+            )
+
+
+def drop_index(connection=default_connection):
+    if not is_supported(connection):
+        return
+    table = SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def index_books(book_ids=None, connection=default_connection):
+    """
+    (Re)index the given books, or every book when ``book_ids`` is None.
+    Runs as one DELETE plus one INSERT ... SELECT regardless of batch size.
+    """
+    if not is_supported(connection):
+        return
+    if book_ids is not None:
+        book_ids = list(book_ids)
+        if not book_ids:
+            return
+
+    categories = CATEGORY_NAMES_SQL[connection.vendor]
+    where, params = _id_condition(book_ids, connection)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE {where % 'rowid'}", params)
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, title, author, description, isbn, categories) "
+                "SELECT b.id, b.title, b.author, COALESCE(b.description, ''), "
+                f"COALESCE(b.\"ISBN\", ''), COALESCE(({categories}), '') "
+                f"FROM books_book b WHERE {where % 'b.id'}",
+                params
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {POSTGRES_TABLE} (book_id, document) "
+                "SELECT b.id, "
+                "setweight(to_tsvector('simple', b.title), 'A') || "
+                "setweight(to_tsvector('simple', b.author), 'B') || "
+                f"setweight(to_tsvector('simple', COALESCE(({categories}), '')), 'B') || "
+                "setweight(to_tsvector('simple', COALESCE(b.\"ISBN\", '')), 'C') || "
+                "setweight(to_tsvector('simple', COALESCE(b.description, '')), 'D') "
+                f"FROM books_book b WHERE {where % 'b.id'} "
+                "ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document",
+                params
+            )
+
+
+def unindex_books(book_ids, connection=default_connection):
+    """Remove deleted books from the index."""
+    book_ids = list(book_ids)
+    if not book_ids or not is_supported(connection):
+        return
+    where, params = _id_condition(book_ids, connection)
+    column = 'rowid' if connection.vendor == 'sqlite' else 'book_id'
+    table = SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {where % column}", params)
+
+
+def build_query(term, vendor):
+    """
+    Turn free text into a prefix-matching query: every word must match,
+    and the last characters typed may be the start of a longer word.
+    """
+    tokens = TOKEN_RE.findall(term)
+    if not tokens:
+        return None
+    if vendor == 'sqlite':
+        return ' AND '.join(f'"{token}"*' for token in tokens)
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def search(queryset, term, connection=default_connection):
+    """
+    Restrict ``queryset`` to books matching ``term`` and annotate
+    ``search_rank`` (lower is better). Returns None when the backend has
+    no full-text index.
+    """
+    if not is_supported(connection):
+        return None
+    query = build_query(term, connection.vendor)
+    if query is None:
+        return queryset
+
+    book_id = f'{queryset.model._meta.db_table}.id'
+    if connection.vendor == 'sqlite':
+        matches = RawSQL(f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", [query])
+        rank = RawSQL(
+            f"SELECT bm25({SQLITE_TABLE}, {SQLITE_WEIGHTS}) FROM {SQLITE_TABLE} "
+            f"WHERE {SQLITE_TABLE} MATCH %s AND rowid = {book_id}",
+            [query], output_field=FloatField()
+        )
+    else:
+        matches = RawSQL(
+            f"SELECT book_id FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('simple', %s)", [query]
+        )
+        rank = RawSQL(
+            f"SELECT -ts_rank(document, to_tsquery('simple', %s)) FROM {POSTGRES_TABLE} "
+            f"WHERE book_id = {book_id}",
+            [query], output_field=FloatField()
+        )
+    return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+
+def _id_condition(book_ids, connection):
+    """Return a ``WHERE`` fragment (with a ``%s`` slot for the column) and its params."""
+    if book_ids is None:
+        return '%s IS NOT NULL', []
+    if connection.vendor == 'postgresql':
+        return '%s = ANY(%%s)', [book_ids]
+    placeholders = ', '.join(['%%s'] * len(book_ids))
+    return f'%s IN ({placeholders})', book_ids
@@ -0,0 +1,59 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from LMS_DRF import cache as response_cache
+from apps.books import search
+from apps.books.models import Book
+from apps.category.models import Category
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, **kwargs):
+    search.index_books([instance.pk])
+    response_cache.bump('books')
+
+
+@receiver(post_delete, sender=Book)
+def unindex_deleted_book(sender, instance, **kwargs):
+    search.unindex_books([instance.pk])
+    response_cache.bump('books')
+
+
+@receiver(m2m_changed, sender=Book.categories.through)
+def reindex_book_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('post_'):
+        response_cache.bump('books')
+    if reverse:
+        # ``instance`` is a Category and ``pk_set`` holds book ids
+        if action == 'pre_clear':
+            instance._search_book_ids = list(instance.books.values_list('pk', flat=True))
+        elif action == 'post_clear':
+            book_ids = getattr(instance, '_search_book_ids', [])
+            search.index_books(book_ids)
+            Book.objects.filter(pk__in=book_ids).touch()
+        elif action in ('post_add', 'post_remove'):
+            search.index_books(pk_set)
+            Book.objects.filter(pk__in=pk_set).touch()
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        search.index_books([instance.pk])
+        Book.objects.filter(pk=instance.pk).touch()
+
+
+@receiver(post_save, sender=Category)
+def reindex_renamed_category(sender, instance, created, **kwargs):
+    response_cache.bump('categories')
+    if not created:
+        search.index_books(instance.books.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_books(sender, instance, **kwargs):
+    instance._search_book_ids = list(instance.books.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def reindex_category_books(sender, instance, **kwargs):
+    book_ids = getattr(instance, '_search_book_ids', [])
+    response_cache.bump('books', 'categories')
+    search.index_books(book_ids)
+    Book.objects.filter(pk__in=book_ids).touch()
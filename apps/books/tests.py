@@ -1,3 +1,597 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from LMS_DRF import cache as response_cache
+from apps.books.importer import BookImporter
+from apps.books.models import Book
+from apps.category.models import Category
+
+
+class BookQueryCountTests(TestCase):
+    """Book endpoints must cost a fixed number of queries regardless of row count."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.categories = [Category.objects.create(name=f'Category {i}') for i in range(3)]
+
+    def create_books(self, count, offset=0):
+        for i in range(offset, offset + count):
+            book = Book.objects.create(
+                title=f'Book {i:04d}', author='Test Author', year=2000,
+                ISBN=f'978-0-00-{i:06d}-0'
+            )
+            book.categories.set(self.categories)
+
+    def assert_constant_queries(self, url, expected):
+        self.create_books(2)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.create_books(8, offset=2)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list(self):
+        # COUNT, page rows, categories prefetch
+        self.assert_constant_queries('/api/books/', 3)
+
+    def test_retrieve(self):
+        self.create_books(1)
+        book = Book.objects.get()
+        # updated_at for the ETag, book row, categories
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/books/{book.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['categories']), 3)
+
+    def test_available(self):
+        self.assert_constant_queries('/api/books/available/', 3)
+
+    def test_by_category(self):
+        self.assert_constant_queries(f'/api/books/category/{self.categories[0].pk}/', 3)
+
+    def test_by_author(self):
+        self.assert_constant_queries('/api/books/author/Test/', 3)
+
+    def test_by_title(self):
+        self.assert_constant_queries('/api/books/title/Book/', 3)
+
+    def test_by_year(self):
+        self.assert_constant_queries('/api/books/year/2000/', 3)
+
+
+class BookActionPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(15):
+            Book.objects.create(title=f'Book {i:04d}', author='Test Author', year=2000)
+
+    def test_actions_are_paginated(self):
+        response = self.client.get('/api/books/available/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 15)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_stream_returns_every_row_as_ndjson(self):
+        response = self.client.get('/api/books/year/2000/?stream=true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 15)
+        self.assertEqual(rows[0]['title'], 'Book 0000')
+        self.assertEqual(rows[0]['categories'], [])
+
+
+class BookCategoryActionTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        self.book = Book.objects.create(title='Dune', author='Frank Herbert', year=1965)
+        self.category = Category.objects.create(name='Science Fiction')
+
+    def test_add_and_remove_share_the_route(self):
+        url = f'/api/books/{self.book.pk}/categories/Science Fiction/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(list(self.book.categories.all()), [self.category])
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(self.book.categories.exists())
+        self.assertEqual(self.client.delete(url).status_code, 400)
+
+
+class BookInventoryTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        self.book = Book.objects.create(title='Dune', author='Frank Herbert', year=1965, copies=3)
+        self.url = f'/api/books/{self.book.pk}/'
+
+    def test_new_books_shelve_every_copy(self):
+        response = self.client.get(self.url).json()
+        self.assertEqual((response['copies'], response['available_count'], response['availability']), (3, 3, True))
+
+    def test_saving_a_stale_book_keeps_checkouts(self):
+        Book.objects.filter(pk=self.book.pk).check_out()
+        self.book.title = 'Dune Messiah'
+        self.book.save()
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.title, self.book.available_count), ('Dune Messiah', 2))
+
+    def test_changing_copies_keeps_checkouts(self):
+        Book.objects.filter(pk=self.book.pk).check_out()
+        Book.objects.filter(pk=self.book.pk).check_out()
+
+        response = self.client.patch(self.url, {'copies': 5}, format='json')
+        self.assertEqual((response.data['copies'], response.data['available_count']), (5, 3))
+        response = self.client.patch(self.url, {'copies': 2}, format='json')
+        self.assertEqual((response.data['copies'], response.data['available_count']), (2, 0))
+        response = self.client.patch(self.url, {'copies': 1, 'title': 'Dune Messiah'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('copies', response.data)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.title, self.book.copies), ('Dune', 2))
+
+    def test_availability_filter(self):
+        Book.objects.create(title='Emma', author='Jane Austen', year=1815, copies=0)
+        self.assertEqual([book['title'] for book in self.client.get('/api/books/?availability=true').json()['results']],
+                         ['Dune'])
+        self.assertEqual([book['title'] for book in self.client.get('/api/books/?availability=false').json()['results']],
+                         ['Emma'])
+        self.assertEqual(self.client.get('/api/books/available/').json()['count'], 1)
+
+
+class BookKeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        # Duplicate titles exercise the ``id`` tie-breaker
+        for i in range(25):
+            Book.objects.create(title=f'Book {i % 7:02d}', author='Test Author', year=2000)
+
+    def test_walks_every_row_once_in_order(self):
+        url = '/api/books/?pagination=cursor'
+        seen = []
+        while url:
+            # page rows and their category ids
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend((row['title'], row['id']) for row in response.data['results'])
+            url = response.data['next']
+
+        expected = list(Book.objects.order_by('title', 'id').values_list('title', 'id'))
+        self.assertEqual(seen, expected)
+
+    def test_cursor_pages_skip_collection_aggregates(self):
+        url = self.client.get('/api/books/?pagination=cursor').data['next']
+        for shared in (False, True):
+            with self.subTest(shared=shared), override_settings(API_CACHE_ENABLED=False, API_CACHE_SHARED=shared):
+                # page rows and their category ids, never a scan of the whole collection
+                with self.assertNumQueries(2):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual('ETag' in response, shared)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/books/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_ordering_must_match_the_keyset(self):
+        for ordering in ('rating_avg', '-title', 'title,year'):
+            with self.subTest(ordering=ordering):
+                response = self.client.get('/api/books/', {'pagination': 'cursor', 'ordering': ordering})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ordering', response.data)
+        for ordering in ('title', 'title,id'):
+            with self.subTest(ordering=ordering):
+                response = self.client.get('/api/books/', {'pagination': 'cursor', 'ordering': ordering})
+                self.assertEqual(response.status_code, 200)
+        # Page numbers keep every ordering
+        self.assertEqual(self.client.get('/api/books/', {'ordering': 'rating_avg'}).status_code, 200)
+
+    def test_page_number_is_default(self):
+        response = self.client.get('/api/books/')
+        self.assertEqual(response.data['count'], 25)
+
+
+class BookFullTextSearchTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.fantasy = Category.objects.create(name='Fantasy')
+        self.hobbit = Book.objects.create(
+            title='The Hobbit', author='J. R. R. Tolkien', year=1937,
+            description='A hobbit goes on an unexpected journey.'
+        )
+        self.dune = Book.objects.create(
+            title='Dune', author='Frank Herbert', year=1965,
+            description='Spice, sand and a hobbit-free desert.'
+        )
+        self.rings = Book.objects.create(
+            title='The Fellowship of the Ring', author='J. R. R. Tolkien', year=1954
+        )
+
+    def search_ids(self, term, **params):
+        response = self.client.get('/api/books/', {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self.search_ids('hobbit'), [self.hobbit.pk, self.dune.pk])
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search_ids('tolk'), [self.rings.pk, self.hobbit.pk])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search_ids('tolkien ring'), [self.rings.pk])
+
+    def test_explicit_ordering_wins(self):
+        self.assertEqual(self.search_ids('hobbit', ordering='year'), [self.hobbit.pk, self.dune.pk])
+        self.assertEqual(self.search_ids('hobbit', ordering='-year'), [self.dune.pk, self.hobbit.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.dune.title = 'Dune Messiah'
+        self.dune.save()
+        self.assertEqual(self.search_ids('messiah'), [self.dune.pk])
+
+        self.dune.delete()
+        self.assertEqual(self.search_ids('messiah'), [])
+
+    def test_index_follows_category_changes(self):
+        self.assertEqual(self.search_ids('fantasy'), [])
+
+        self.hobbit.categories.add(self.fantasy)
+        self.fantasy.books.add(self.rings)
+        self.assertEqual(sorted(self.search_ids('fantasy')), sorted([self.hobbit.pk, self.rings.pk]))
+
+        self.fantasy.name = 'High Fantasy'
+        self.fantasy.save()
+        self.assertEqual(len(self.search_ids('high')), 2)
+
+        self.fantasy.books.clear()
+        self.assertEqual(self.search_ids('high'), [])
+
+    def test_punctuation_only_term_is_ignored(self):
+        self.assertEqual(len(self.search_ids('"*')), 3)
+
+
+class BookImportTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        Category.objects.create(name='Fantasy')
+
+    def rows(self, count, **extra):
+        return [
+            {'title': f'Book {i}', 'author': 'Test Author', 'year': 2000,
+             'ISBN': f'978-0-00-{i:06d}-0', 'categories': ['Fantasy', 'Classics'], **extra}
+            for i in range(count)
+        ]
+
+    def test_bulk_endpoint_upserts_by_isbn(self):
+        response = self.client.post('/api/books/bulk/', self.rows(5), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 5)
+        self.assertEqual(Book.objects.count(), 5)
+        self.assertTrue(Category.objects.filter(name='Classics').exists())
+        self.assertEqual(Book.categories.through.objects.count(), 10)
+
+        Book.objects.filter(ISBN='978-0-00-000000-0').update(available_count=0)
+        rows = self.rows(5, author='Another Author')
+        rows[0]['categories'] = ['Fantasy']
+        response = self.client.post('/api/books/bulk/', {'books': rows}, format='json')
+        self.assertEqual(response.data['imported'], 5)
+        self.assertEqual(Book.objects.count(), 5)
+        self.assertEqual(Book.objects.filter(author='Another Author').count(), 5)
+        self.assertEqual(Book.categories.through.objects.count(), 9)
+        # Circulation state is not overwritten by the feed
+        self.assertFalse(Book.objects.get(ISBN='978-0-00-000000-0').availability)
+
+        search = self.client.get('/api/books/', {'search': 'another'})
+        self.assertEqual(search.data['count'], 5)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        rows = self.rows(3)
+        rows[1]['year'] = 1200
+        response = self.client.post('/api/books/bulk/', rows, format='json')
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(response.data['invalid'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertIn('year', response.data['errors'][0]['errors'])
+
+    def test_bulk_requires_staff(self):
+        self.client.force_authenticate(User.objects.create(username='reader'))
+        response = self.client.post('/api/books/bulk/', self.rows(1), format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_batch_costs_fixed_queries(self):
+        Category.objects.create(name='Classics')
+        for count in (5, 50):
+            with self.assertNumQueries(8):
+                BookImporter(batch_size=100).run(self.rows(count))
+
+    def test_import_command_reads_csv(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write('title,author,year,ISBN,categories\n')
+            handle.write('Dune,Frank Herbert,1965,978-0-44-117271-9,Science Fiction;Classics\n')
+            handle.write('Emma,Jane Austen,1815,,\n')
+        try:
+            out = StringIO()
+            call_command('import_books', handle.name, stdout=out)
+        finally:
+            os.unlink(handle.name)
+        self.assertIn('Imported 2 of 2 rows', out.getvalue())
+        self.assertEqual(
+            sorted(Book.objects.get(title='Dune').categories.values_list('name', flat=True)),
+            ['Classics', 'Science Fiction']
+        )
+        self.assertIsNone(Book.objects.get(title='Emma').ISBN)
+
+
+class BookResponseCacheTests(TestCase):
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        self.client = APIClient()
+        self.book = Book.objects.create(title='Dune', author='Frank Herbert', year=1965)
+
+    def test_query_params_are_normalized(self):
+        self.assertEqual(self.client.get('/api/books/?year=1965&author=Frank Herbert')['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/books/?author=Frank Herbert&year=1965')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['count'], 1)
+
+    @override_settings(API_CACHE_SHARED=True)
+    def test_conditional_hits_use_stored_validators(self):
+        etag = self.client.get('/api/books/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/books/', headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_streaming_responses_are_not_cached(self):
+        self.client.get('/api/books/available/?stream=true')
+        response = self.client.get('/api/books/available/?stream=true')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_book_and_category_changes_invalidate(self):
+        self.client.get(f'/api/books/{self.book.pk}/')
+        category = Category.objects.create(name='Classics')
+        self.book.categories.add(category)
+        response = self.client.get(f'/api/books/{self.book.pk}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['categories'], [category.pk])
+
+        category.delete()
+        response = self.client.get(f'/api/books/{self.book.pk}/')
+        self.assertEqual(response.json()['categories'], [])
+
+    def test_reservation_availability_flip_invalidates(self):
+        self.assertEqual(self.client.get('/api/books/available/').json()['count'], 1)
+
+        user = User.objects.create(username='reader')
+        self.client.force_authenticate(user)
+        self.client.post('/api/reservations/', {
+            'book': self.book.pk,
+            'due_time': (timezone.now() + timedelta(days=14)).isoformat(),
+        })
+        self.assertEqual(self.client.get('/api/books/available/').json()['count'], 0)
+
+
+@override_settings(API_CACHE_ENABLED=False, API_CACHE_SHARED=True)
+class BookConditionalGetTests(TestCase):
+    epoch = 'Thu, 01 Jan 1970 00:00:00 GMT'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.book = Book.objects.create(title='Dune', author='Frank Herbert', year=1965)
+        self.category = Category.objects.create(name='Classics')
+
+    def assert_not_modified(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        return response
+
+    def test_list_revalidates_without_loading_rows(self):
+        response = self.client.get('/api/books/')
+        etag = response['ETag']
+        # the version stamps of books and categories
+        with self.assertNumQueries(0):
+            not_modified = self.assert_not_modified('/api/books/', if_none_match=etag)
+        self.assertEqual(not_modified['ETag'], etag)
+
+        self.assertNotEqual(self.client.get('/api/books/?year=1965')['ETag'], etag)
+        self.assertNotEqual(self.client.get('/api/books/', headers={'accept': 'text/html'})['ETag'], etag)
+
+    def test_list_if_modified_since(self):
+        last_modified = self.client.get('/api/books/')['Last-Modified']
+        self.assert_not_modified('/api/books/', if_modified_since=last_modified)
+
+        Book.objects.filter(pk=self.book.pk).update(available_count=0)
+        response = self.client.get('/api/books/', headers={'if-modified-since': 'Thu, 01 Jan 2015 00:00:00 GMT'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_change_list_etag(self):
+        etag = self.client.get('/api/books/available/')['ETag']
+        Book.objects.filter(pk=self.book.pk).update(available_count=0)
+        response = self.client.get('/api/books/available/', headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 0)
+
+    @override_settings(API_CACHE_SHARED=False)
+    def test_validators_come_from_the_database(self):
+        # Only requests with preconditions pay for the aggregates
+        self.assertNotIn('ETag', self.client.get('/api/books/'))
+        with self.assertNumQueries(5):
+            etag = self.client.get('/api/books/', headers={'if-modified-since': self.epoch})['ETag']
+        # Stamps lost or never bumped here, as for a write in another process
+        response_cache.get_cache().clear()
+        self.assert_not_modified('/api/books/', if_none_match=etag)
+        with mock.patch.object(response_cache, 'bump'):
+            Book.objects.filter(pk=self.book.pk).update(available_count=0)
+        self.assertEqual(self.client.get('/api/books/', headers={'if-none-match': etag}).status_code, 200)
+
+    @override_settings(API_CACHE_SHARED=False)
+    def test_deletes_move_list_validators(self):
+        Book.objects.filter(pk=self.book.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        response = self.client.get('/api/books/', headers={'if-modified-since': self.epoch})
+        Book.objects.create(title='Emma', author='Jane Austen', year=1815).delete()
+
+        self.assertEqual(self.client.get('/api/books/', headers={'if-none-match': response['ETag']}).status_code,
+                         200)
+        response = self.client.get('/api/books/', headers={'if-modified-since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve_uses_updated_at(self):
+        url = f'/api/books/{self.book.pk}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            self.assert_not_modified(url, if_none_match=etag)
+        self.assert_not_modified(url, if_modified_since=response['Last-Modified'])
+
+        # Unrelated books leave the validator alone
+        Book.objects.create(title='Emma', author='Jane Austen', year=1815)
+        self.assert_not_modified(url, if_none_match=etag)
+
+        self.book.categories.add(self.category)
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['categories'], [self.category.pk])
+
+        etag = response['ETag']
+        self.category.delete()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_set_based_updates_touch_updated_at(self):
+        before = self.book.updated_at
+        Book.objects.filter(pk=self.book.pk).update(available_count=0)
+        self.book.refresh_from_db()
+        self.assertGreater(self.book.updated_at, before)
+
+    def test_missing_book_is_404(self):
+        self.assertEqual(self.client.get('/api/books/999/', headers={'if-none-match': '*'}).status_code, 404)
+        self.assertEqual(self.client.get('/api/books/abc/').status_code, 404)
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class BookFieldsetTests(TestCase):
+    """``?fields=`` and ``?expand=`` on both serialization paths."""
+
+    def setUp(self):
+        self.client = APIClient()
+        categories = [Category.objects.create(name=name) for name in ('Fantasy', 'Classics', 'Drama')]
+        for i in range(12):
+            book = Book.objects.create(title=f'Book {i:02}', author=f'Author {i % 3}', year=1990 + i,
+                                       description='A long description' * 10)
+            book.categories.set(categories[i % 3:])
+
+    def get(self, url, values=True):
+        with override_settings(API_VALUES_SERIALIZERS=values), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_fields_narrow_output_and_query(self):
+        for values in (True, False):
+            with self.subTest(values=values):
+                response, queries = self.get('/api/books/?fields=title,availability', values)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'][0], {'title': 'Book 00', 'availability': True})
+                self.assertNotIn('description', queries[-1])
+                # count and page; category ids are not needed
+                self.assertEqual(len(queries), 2)
+
+    def test_expand_categories(self):
+        book = Book.objects.get(title='Book 01')
+        for values in (True, False):
+            with self.subTest(values=values):
+                response, queries = self.get('/api/books/?expand=categories', values)
+                # count, page, categories
+                self.assertEqual(len(queries), 3)
+                results = {item['id']: item for item in response.json()['results']}
+                self.assertEqual(results[book.pk]['categories'], [
+                    {'id': category.pk, 'name': category.name} for category in book.categories.order_by('id')
+                ])
+
+    def test_paths_render_the_same_json(self):
+        book = Book.objects.first()
+        for url in ('/api/books/?fields=id,title,categories&expand=categories', '/api/books/?fields=ISBN, year,',
+                    f'/api/books/{book.pk}/?fields=id,categories', f'/api/books/{book.pk}/?expand=categories',
+                    '/api/books/?fields=title&expand=categories'):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url)[0].content, self.get(url, values=False)[0].content)
+
+    def test_actions_and_writes(self):
+        response = self.client.get('/api/books/available/?fields=id')
+        self.assertEqual(set(response.json()['results'][0]), {'id'})
+
+        admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.post('/api/books/?fields=id', {'title': 'New book', 'author': 'Test Author',
+                                                              'year': 2000}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('title', response.json())
+
+    def test_invalid_parameters(self):
+        for url in ('/api/books/?fields=id,nope', '/api/books/?fields=,', '/api/books/?expand=author'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 400)
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class BookValuesSerializerTests(TestCase):
+    """The values() fast path must render byte-identical JSON to BookSerializer."""
+
+    def setUp(self):
+        self.client = APIClient()
+        categories = [Category.objects.create(name=name) for name in ('Fantasy', 'Classics', 'Drama')]
+        for i in range(15):
+            book = Book.objects.create(
+                title=f'Book {i % 4} ünïcode', author=f'Author {i % 3}', year=1990 + i,
+                ISBN=f'978-0-00-{i:06d}-0' if i % 2 else None,
+                description='A "quoted" description' if i % 3 else None,
+                copies=i % 3,
+            )
+            book.categories.set(categories[i % 3:])
+        Book.objects.filter(year__lt=1995).check_out()
+        Book.objects.filter(year__gt=2000).update(rating_count=3, rating_sum=10, rating_avg=10 / 3)
+
+    def assert_same_json(self, url):
+        fast = self.client.get(url)
+        with override_settings(API_VALUES_SERIALIZERS=False):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, slow.status_code)
+        self.assertEqual(fast.content, slow.content, url)
+
+    def test_list_and_retrieve(self):
+        book = Book.objects.order_by('id').first()
+        for url in (
+            '/api/books/', '/api/books/?page=2', '/api/books/?author=Author 1',
+            '/api/books/?ordering=-rating_avg', '/api/books/?search=book ünï',
+            '/api/books/?pagination=cursor', '/api/books/?year_min=1995&availability=true',
+            f'/api/books/{book.pk}/', '/api/books/999999/',
+        ):
+            self.assert_same_json(url)
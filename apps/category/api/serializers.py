@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from apps.category.models import Category
+from LMS_DRF.values import ValuesSerializer, format_str
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -14,3 +15,14 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name']
         read_only_fields = ['id']
+
+
+class CategoryValuesSerializer(ValuesSerializer):
+    """Read-only twin of CategorySerializer built from ``values()`` rows."""
+    values_fields = ('id', 'name')
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'name': format_str(row['name']),
+        }
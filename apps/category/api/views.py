@@ -1,12 +1,22 @@
 from rest_framework import viewsets
 from drf_yasg.utils import swagger_auto_schema
+from LMS_DRF.async_views import AsyncReadMixin
+from LMS_DRF.cache import ResponseCacheMixin
+from LMS_DRF.conditional import ConditionalGetMixin
+from LMS_DRF.sync import SyncMixin
+from LMS_DRF.values import ValuesReadMixin
 from apps.category.models import Category
-from apps.category.api.serializers import CategorySerializer
+from apps.category.api.serializers import CategorySerializer, CategoryValuesSerializer
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(SyncMixin, AsyncReadMixin, ConditionalGetMixin, ResponseCacheMixin, ValuesReadMixin,
+                      viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    values_serializer_class = CategoryValuesSerializer
+    cache_namespaces = ('categories',)
+    sync_topic = 'category'
+    replica_reads = True
 
     @swagger_auto_schema(
         operation_description="Get a list of all available books"
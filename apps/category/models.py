@@ -3,10 +3,14 @@ from django.db import models
 
 class Category(models.Model):
     name = models.CharField(max_length=50, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name: str = 'Category'
         verbose_name_plural: str = 'Categories'
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='category_updated_id_idx'),
+        ]
 
     def __str__(self) -> models.CharField:
         return self.name
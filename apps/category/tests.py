@@ -1,3 +1,67 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.test import APIClient
+
+from LMS_DRF import cache as response_cache
+from apps.category.api.views import CategoryViewSet
+from apps.category.models import Category
+
+
+class CategoryResponseCacheTests(TestCase):
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Fantasy')
+
+    def test_second_get_is_served_from_cache(self):
+        self.assertEqual(self.client.get('/api/categories/')['X-Cache'], 'MISS')
+        hits = response_cache.stats['hits']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/categories/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['results'], [{'id': self.category.pk, 'name': 'Fantasy'}])
+        self.assertEqual(response_cache.stats['hits'], hits + 1)
+
+    def test_rename_invalidates(self):
+        self.client.get('/api/categories/')
+        self.category.name = 'Science Fiction'
+        self.category.save()
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['name'], 'Science Fiction')
+
+    def test_users_never_share_entries(self):
+        alice, bob = (User.objects.create_user(name, password='secret') for name in ('alice', 'bob'))
+        clients = {}
+        for user in (alice, bob, None):
+            clients[user] = APIClient()
+            clients[user].force_authenticate(user)
+            response = clients[user].get('/api/categories/')
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertIn('Cookie', response['Vary'])
+            self.assertIn('Authorization', response['Vary'])
+        for client in clients.values():
+            self.assertEqual(client.get('/api/categories/')['X-Cache'], 'HIT')
+
+    def test_browsable_api_is_not_cached(self):
+        User.objects.create_user('alice_secret', password='secret')
+        client = APIClient()
+        client.login(username='alice_secret', password='secret')
+        page = client.get('/api/categories/', HTTP_ACCEPT='text/html')
+        self.assertContains(page, 'alice_secret')
+        self.assertNotIn('X-Cache', page)
+
+        response = APIClient().get('/api/categories/', HTTP_ACCEPT='text/html')
+        self.assertNotIn('X-Cache', response)
+        self.assertNotContains(response, 'alice_secret')
 
-# Create your tests here.
+    def test_cached_responses_are_authorized(self):
+        self.client.get('/api/categories/')
+        with mock.patch.object(CategoryViewSet, 'permission_classes', [IsAuthenticated]):
+            response = self.client.get('/api/categories/')
+        self.assertIn(response.status_code, (401, 403))
+        self.assertNotIn('X-Cache', response)
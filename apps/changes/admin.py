@@ -0,0 +1,7 @@
+from django.contrib import admin
+
+from apps.changes.models import Change, Tombstone
+
+
+admin.site.register(Change)
+admin.site.register(Tombstone)
@@ -0,0 +1,19 @@
+from django.conf import settings
+from rest_framework import serializers
+
+
+class ChangeFeedParamsSerializer(serializers.Serializer):
+    """Query parameters of ``/api/changes/``."""
+    since = serializers.IntegerField(
+        min_value=0,
+        required=False,
+        help_text="Sequence number of the last change seen; defaults to the latest change"
+    )
+    timeout = serializers.FloatField(
+        min_value=0,
+        required=False,
+        help_text="Seconds to wait for a change when there is none yet"
+    )
+
+    def validate_timeout(self, value):
+        return min(value, settings.CHANGES_MAX_LONG_POLL_SECONDS)
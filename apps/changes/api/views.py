@@ -0,0 +1,153 @@
+import time
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.decorators import classonlymethod
+from django.views.decorators.csrf import csrf_exempt
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import permissions, renderers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from LMS_DRF.async_views import plain_response, run_isolated
+from LMS_DRF.renderers import JSONRenderer
+from apps.changes import feed
+from apps.changes.api.serializers import ChangeFeedParamsSerializer
+
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    """Accepts ``text/event-stream`` in content negotiation; errors still render as JSON."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
+
+
+class ChangeFeedView(APIView):
+    """
+    The changes after ``?since=``, oldest first, waiting up to
+    ``?timeout=`` seconds for one when there are none yet (long polling).
+    Pass the returned ``last_seq`` as the next ``since``.
+
+    Under WSGI a waiting request holds its worker thread. Under ASGI
+    ``as_async_view`` waits on the event loop instead and also serves
+    ``/api/changes/stream/``, the same feed as server-sent events.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get_params(self, request, stream=False):
+        params = ChangeFeedParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        since = params.validated_data.get('since')
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        if stream and last_event_id.isdigit():
+            # An EventSource reconnecting after the last event it received
+            since = int(last_event_id)
+        if since is None:
+            since = feed.head()
+        return since, params.validated_data.get('timeout', settings.CHANGES_LONG_POLL_SECONDS)
+
+    @staticmethod
+    def get_user_id(request):
+        return request.user.pk if request.user.is_authenticated else None
+
+    @staticmethod
+    def page(since, changes):
+        return {
+            'changes': changes,
+            'last_seq': changes[-1]['seq'] if changes else since,
+            'more': len(changes) == feed.BATCH_SIZE,
+        }
+
+    @swagger_auto_schema(
+        query_serializer=ChangeFeedParamsSerializer,
+        responses={200: "Changes after `since` and the `last_seq` to continue from"},
+        operation_description="Long-poll the change feed of book availability, reservations and reviews"
+    )
+    def get(self, request):
+        since, timeout = self.get_params(request)
+        user_id = self.get_user_id(request)
+        deadline = time.monotonic() + timeout
+        changes = feed.fetch(since, user_id)
+        while not changes and (remaining := deadline - time.monotonic()) > 0:
+            feed.notifier.wait(feed.poll_interval(remaining))
+            changes = feed.fetch(since, user_id)
+        return Response(self.page(since, changes))
+
+    # Under ASGI
+
+    @classonlymethod
+    def as_async_view(cls, stream=False, **initkwargs):
+        if stream:
+            initkwargs.setdefault('renderer_classes', [EventStreamRenderer, JSONRenderer])
+
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            self.args = args
+            self.kwargs = kwargs
+            request, response = await sync_to_async(self.prepare_async)(request, stream)
+            if response is None:
+                if stream:
+                    return self.event_stream()
+                try:
+                    response = Response(await self.async_poll())
+                except Exception as exc:
+                    response = self.handle_exception(exc)
+            response = self.finalize_response(request, response, *args, **kwargs)
+            response.render()
+            return plain_response(response)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        return csrf_exempt(view)
+
+    def prepare_async(self, request, stream):
+        """Authenticate, check permissions and read the parameters in one thread hop."""
+        request = self.initialize_request(request, *self.args, **self.kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            self.initial(request, *self.args, **self.kwargs)
+            self.since, self.timeout = self.get_params(request, stream)
+            self.user_id = self.get_user_id(request)
+        except Exception as exc:
+            return request, self.handle_exception(exc)
+        return request, None
+
+    async def async_poll(self):
+        deadline = time.monotonic() + self.timeout
+        changes = await run_isolated(partial(feed.fetch, self.since, self.user_id))
+        while not changes and (remaining := deadline - time.monotonic()) > 0:
+            await feed.notifier.await_change(feed.poll_interval(remaining))
+            changes = await run_isolated(partial(feed.fetch, self.since, self.user_id))
+        return self.page(self.since, changes)
+
+    def event_stream(self):
+        renderer = JSONRenderer()
+
+        async def events():
+            since = self.since
+            sent = time.monotonic()
+            while True:
+                changes = await run_isolated(partial(feed.fetch, since, self.user_id))
+                for change in changes:
+                    since = change['seq']
+                    yield (f"id: {since}\nevent: {change['topic']}\n"
+                           f"data: {renderer.render(change).decode()}\n\n").encode()
+                if changes:
+                    sent = time.monotonic()
+                    if len(changes) == feed.BATCH_SIZE:
+                        continue
+                elif time.monotonic() - sent >= settings.CHANGES_HEARTBEAT_SECONDS:
+                    # A comment line keeps proxies from closing an idle stream
+                    yield b': keep-alive\n\n'
+                    sent = time.monotonic()
+                await feed.notifier.await_change(settings.CHANGES_POLL_SECONDS)
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,75 @@
+"""
+Reading the change log: batches after a sequence number, and waiting
+for new ones.
+
+``notifier`` wakes the readers of this process as soon as a change
+commits. Other processes' changes are picked up by polling every
+``CHANGES_POLL_SECONDS``, which bounds the delay without a broker.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+
+from apps.changes.models import Change
+
+BATCH_SIZE = 100
+
+
+class ChangeNotifier:
+    """Wakes sync and async readers waiting for changes."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.waiters = set()
+
+    def notify(self):
+        with self.condition:
+            self.condition.notify_all()
+            waiters = list(self.waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def wait(self, timeout):
+        """Block until the next notification or ``timeout`` seconds."""
+        with self.condition:
+            self.condition.wait(timeout)
+
+    async def await_change(self, timeout):
+        """Wait on the event loop until the next notification or ``timeout`` seconds."""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self.condition:
+            self.waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self.condition:
+                self.waiters.discard(waiter)
+
+
+notifier = ChangeNotifier()
+
+
+def head():
+    """The sequence number of the latest change, 0 before the first one."""
+    return Change.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def fetch(since, user_id, limit=BATCH_SIZE):
+    """Up to ``limit`` changes after ``since`` visible to ``user_id``, oldest first."""
+    rows = (
+        Change.objects.visible_to(user_id).filter(pk__gt=since).order_by('pk')
+        .values('pk', 'topic', 'object_id', 'action', 'data', 'created_at')[:limit]
+    )
+    return [
+        {'seq': row['pk'], 'topic': row['topic'], 'id': row['object_id'], 'action': row['action'],
+         'data': row['data'], 'at': row['created_at']}
+        for row in rows
+    ]
+
+
+def poll_interval(remaining):
+    return max(0.0, min(remaining, settings.CHANGES_POLL_SECONDS))
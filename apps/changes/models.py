@@ -0,0 +1,120 @@
+"""
+The change log behind ``/api/changes/``, and the tombstones of deleted
+catalogue rows behind the ``sync/`` endpoints (see ``LMS_DRF.sync``).
+
+Book availability flips, reservation status changes and review writes
+append a row; its id is the change's sequence number. A row carries the
+state after the change rather than a diff, so seeing one twice is
+harmless and the writers may log a change that turns out not to flip
+anything. Reservation changes are only visible to their user.
+
+SQLite commits in id order. On PostgreSQL concurrent transactions can
+commit out of order, so a reader may briefly see a later sequence number
+before an earlier one.
+"""
+from django.contrib.auth.models import User
+from django.db import models, transaction
+
+
+class ChangeQuerySet(models.QuerySet):
+
+    def visible_to(self, user_id) -> 'ChangeQuerySet':
+        """Public changes, plus the private ones of ``user_id`` (None for anonymous)."""
+        if user_id is None:
+            return self.filter(user__isnull=True)
+        return self.filter(models.Q(user__isnull=True) | models.Q(user_id=user_id))
+
+    def record(self, changes) -> list:
+        """Append unsaved ``Change`` rows and wake feed readers when they commit."""
+        from apps.changes.feed import notifier
+
+        changes = self.bulk_create(changes)
+        if changes:
+            transaction.on_commit(notifier.notify)
+        return changes
+
+
+class Change(models.Model):
+
+    TOPIC_BOOK = 'book'
+    TOPIC_RESERVATION = 'reservation'
+    TOPIC_REVIEW = 'review'
+
+    TOPIC_CHOICES = [
+        (TOPIC_BOOK, 'Book'),
+        (TOPIC_RESERVATION, 'Reservation'),
+        (TOPIC_REVIEW, 'Review'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=20, choices=TOPIC_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    # "available"/"unavailable" for books, the new status for reservations,
+    # "created"/"updated"/"deleted" for reviews
+    action = models.CharField(max_length=20)
+    data = models.JSONField(default=dict)
+    # Set for changes only this user may see
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ChangeQuerySet.as_manager()
+
+    def __str__(self):
+        return f"#{self.pk} {self.topic} {self.object_id} {self.action}"
+
+
+class Tombstone(models.Model):
+    """A deleted book, category or review, recorded by ``apps.changes.signals``."""
+
+    TOPIC_BOOK = 'book'
+    TOPIC_CATEGORY = 'category'
+    TOPIC_REVIEW = 'review'
+
+    TOPIC_CHOICES = [
+        (TOPIC_BOOK, 'Book'),
+        (TOPIC_CATEGORY, 'Category'),
+        (TOPIC_REVIEW, 'Review'),
+    ]
+
+    topic = models.CharField(max_length=20, choices=TOPIC_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['topic', 'deleted_at', 'id'], name='tombstone_topic_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} {self.object_id} deleted"
+
+
+def record_availability(books):
+    """
+    Log the availability of books whose availability may just have
+    flipped, given as ``(pk, available_count)`` pairs.
+    """
+    return Change.objects.record([
+        Change(topic=Change.TOPIC_BOOK, object_id=pk, action='available' if available_count else 'unavailable',
+               data={'available_count': available_count})
+        for pk, available_count in books
+    ])
+
+
+def record_reservations(reservations):
+    """
+    Log the status of reservations, given as model instances or dicts
+    with ``pk``, ``status``, ``book_id`` and ``user_id``.
+    """
+    rows = [
+        reservation if isinstance(reservation, dict) else {
+            'pk': reservation.pk, 'status': reservation.status,
+            'book_id': reservation.book_id, 'user_id': reservation.user_id,
+        }
+        for reservation in reservations
+    ]
+    return Change.objects.record([
+        Change(topic=Change.TOPIC_RESERVATION, object_id=row['pk'], action=row['status'],
+               data={'book': row['book_id']}, user_id=row['user_id'])
+        for row in rows
+    ])
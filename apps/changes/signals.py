@@ -0,0 +1,43 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.books.models import Book
+from apps.category.models import Category
+from apps.changes.models import Change, Tombstone, record_reservations
+from apps.reservation.models import Reservation
+from apps.review.models import Review
+
+
+@receiver(post_save, sender=Reservation)
+def log_reservation_status(sender, instance, created, **kwargs):
+    """Log new reservations and status changes; set-based writers log their own."""
+    if created or getattr(instance, '_logged_status', None) != instance.status:
+        record_reservations([instance])
+    instance._logged_status = instance.status
+
+
+@receiver(post_delete, sender=Reservation)
+def log_deleted_reservation(sender, instance, **kwargs):
+    record_reservations([{'pk': instance.pk, 'status': 'deleted', 'book_id': instance.book_id,
+                          'user_id': instance.user_id}])
+
+
+@receiver(post_save, sender=Review)
+def log_saved_review(sender, instance, created, **kwargs):
+    Change.objects.record([Change(topic=Change.TOPIC_REVIEW, object_id=instance.pk,
+                                  action='created' if created else 'updated',
+                                  data={'book': instance.book_id, 'rating': instance.rating})])
+
+
+@receiver(post_delete, sender=Review)
+def log_deleted_review(sender, instance, **kwargs):
+    Change.objects.record([Change(topic=Change.TOPIC_REVIEW, object_id=instance.pk, action='deleted',
+                                  data={'book': instance.book_id})])
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Review)
+def record_tombstone(sender, instance, **kwargs):
+    """Remember deleted catalogue rows for mirrors syncing deltas."""
+    Tombstone.objects.create(topic=sender._meta.model_name, object_id=instance.pk)
@@ -0,0 +1,195 @@
+import asyncio
+import json
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from LMS_DRF.async_views import AsyncReadASGIHandler
+from apps.books.models import Book
+from apps.changes.models import Change
+from apps.reservation.models import Reservation
+from apps.review.models import Review
+
+
+class ChangeLogTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader')
+        self.book = Book.objects.create(title='Book', author='Test Author', year=2000)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def logged(self, topic):
+        return list(Change.objects.filter(topic=topic).order_by('pk').values_list('object_id', 'action'))
+
+    def feed(self, since=0, client=None):
+        response = (client or self.client).get('/api/changes/', {'since': since, 'timeout': 0})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_availability_flips_are_logged(self):
+        other = Book.objects.create(title='Other', author='Test Author', year=2000, copies=2)
+        Book.objects.filter(pk__in=[self.book.pk, other.pk]).check_out()
+        self.assertEqual(self.logged('book'), [(self.book.pk, 'unavailable')])
+
+        Book.objects.filter(pk__in=[self.book.pk, other.pk]).check_in()
+        self.assertEqual(self.logged('book'), [(self.book.pk, 'unavailable'), (self.book.pk, 'available')])
+
+    def test_reservation_statuses_are_logged(self):
+        response = self.client.post('/api/reservations/', {
+            'book': self.book.pk,
+            'due_time': (timezone.now() + timedelta(days=14)).isoformat(),
+        })
+        reservation_id = response.data['id']
+        self.client.post(f'/api/reservations/{reservation_id}/return_book/')
+
+        self.assertEqual(self.logged('reservation'), [(reservation_id, Reservation.STATUS_ACTIVE),
+                                                      (reservation_id, Reservation.STATUS_COMPLETED)])
+        self.assertEqual(self.logged('book'), [(self.book.pk, 'unavailable'), (self.book.pk, 'available')])
+
+    def test_overdue_sweep_is_logged(self):
+        reservation = Reservation.objects.create(book=self.book, user=self.user,
+                                                 due_time=timezone.now() - timedelta(days=1))
+        Reservation.objects.mark_overdue()
+        self.assertEqual(self.logged('reservation')[-1], (reservation.pk, Reservation.STATUS_OVERDUE))
+
+    def test_review_writes_are_logged(self):
+        review = Review.objects.create(book=self.book, user=self.user, rating=4, content='Good')
+        review.rating = 5
+        review.save()
+        review_id = review.pk
+        review.delete()
+        self.assertEqual(self.logged('review'), [(review_id, 'created'), (review_id, 'updated'),
+                                                 (review_id, 'deleted')])
+
+    def test_feed_returns_changes_after_since(self):
+        Review.objects.create(book=self.book, user=self.user, rating=4, content='Good')
+        Book.objects.filter(pk=self.book.pk).check_out()
+        data = self.feed()
+        self.assertEqual([(change['topic'], change['action']) for change in data['changes']],
+                         [('review', 'created'), ('book', 'unavailable')])
+        self.assertEqual(data['changes'][1]['data'], {'available_count': 0})
+        self.assertEqual(data['last_seq'], data['changes'][-1]['seq'])
+        self.assertFalse(data['more'])
+
+        self.assertEqual(self.feed(since=data['changes'][0]['seq'])['changes'], data['changes'][1:])
+        self.assertEqual(self.feed(since=data['last_seq']), {'changes': [], 'last_seq': data['last_seq'],
+                                                             'more': False})
+
+    def test_feed_starts_at_latest_change_without_since(self):
+        Book.objects.filter(pk=self.book.pk).check_out()
+        data = self.client.get('/api/changes/', {'timeout': 0}).json()
+        self.assertEqual(data['changes'], [])
+        self.assertEqual(data['last_seq'], Change.objects.get().pk)
+
+    def test_reservation_changes_are_private(self):
+        Reservation.objects.create(book=self.book, user=self.user, due_time=timezone.now() + timedelta(days=14))
+        other = APIClient()
+        other.force_authenticate(User.objects.create(username='other'))
+
+        self.assertEqual([change['topic'] for change in self.feed()['changes']], ['reservation'])
+        self.assertEqual(self.feed(client=other)['changes'], [])
+        self.assertEqual(self.feed(client=APIClient())['changes'], [])
+
+    def test_invalid_parameters(self):
+        for params in [{'since': -1}, {'since': 'abc'}, {'timeout': 'abc'}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/changes/', params).status_code, 400)
+
+
+@override_settings(CHANGES_POLL_SECONDS=30)
+class ChangeFeedASGITests(TransactionTestCase):
+    """The feed under the in-process ASGI handler; polling is slowed down so only notifications wake readers."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader')
+        self.book = Book.objects.create(title='Book', author='Test Author', year=2000)
+
+    async def request(self, path, query_string='', headers=(), until=None):
+        """
+        GET ``path`` through ``AsyncReadASGIHandler``. A streamed body is
+        read until ``until(body)`` holds, then the client disconnects.
+        """
+        messages = []
+        requested = False
+        done = asyncio.Event()
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            body = b''.join(message.get('body', b'') for message in messages)
+            if message['type'] == 'http.response.body' and (not message.get('more_body') or until(body)):
+                done.set()
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query_string.encode(),
+            'root_path': '', 'headers': [(b'host', b'testserver'), *headers],
+            'client': ('127.0.0.1', 1234), 'server': ('testserver', 80),
+        }
+        await AsyncReadASGIHandler()(scope, receive, send)
+        start = messages[0]
+        return start['status'], dict(start['headers']), b''.join(message.get('body', b'') for message in messages)
+
+    def check_out(self):
+        Book.objects.filter(pk=self.book.pk).check_out()
+
+    def test_long_poll_wakes_on_commit(self):
+        async def scenario():
+            poll = asyncio.create_task(self.request('/api/changes/', 'timeout=20'))
+            await asyncio.sleep(0.3)
+            self.assertFalse(poll.done())
+            await sync_to_async(self.check_out)()
+            return await asyncio.wait_for(poll, 5)
+
+        status, headers, body = async_to_sync(scenario)()
+        self.assertEqual(status, 200)
+        data = json.loads(body)
+        self.assertEqual([(change['topic'], change['id'], change['action']) for change in data['changes']],
+                         [('book', self.book.pk, 'unavailable')])
+
+    def test_long_poll_times_out(self):
+        status, headers, body = async_to_sync(self.request)('/api/changes/', 'since=0&timeout=0')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {'changes': [], 'last_seq': 0, 'more': False})
+
+    def test_long_poll_errors(self):
+        status, headers, body = async_to_sync(self.request)('/api/changes/', 'since=abc')
+        self.assertEqual(status, 400)
+        self.assertIn('since', json.loads(body))
+
+    @override_settings(CHANGES_HEARTBEAT_SECONDS=0)
+    def test_event_stream(self):
+        self.check_out()
+        seen = Change.objects.get().pk
+
+        async def scenario():
+            stream = asyncio.create_task(self.request(
+                '/api/changes/stream/', headers=[(b'accept', b'text/event-stream'),
+                                                 (b'last-event-id', str(seen).encode())],
+                until=lambda body: b'event: review' in body,
+            ))
+            await asyncio.sleep(0.3)
+            await sync_to_async(Review.objects.create)(book=self.book, user=self.user, rating=4, content='Good')
+            return await asyncio.wait_for(stream, 5)
+
+        status, headers, body = async_to_sync(scenario)()
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'Content-Type'], b'text/event-stream')
+        self.assertEqual(headers[b'Cache-Control'], b'no-cache')
+        self.assertTrue(body.startswith(b': keep-alive\n\n'))
+        event = body.split(b'\n\n')[-2].split(b'\n')
+        self.assertEqual(event[0], f'id: {seen + 1}'.encode())
+        self.assertEqual(event[1], b'event: review')
+        self.assertEqual(json.loads(event[2].removeprefix(b'data: '))['action'], 'created')
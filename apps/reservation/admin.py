@@ -1,7 +1,8 @@
 from django.contrib import admin
 
 # Register your models here.
-from apps.reservation.models import Reservation
+from apps.reservation.models import Hold, Reservation
 
 
 admin.site.register(Reservation)
+admin.site.register(Hold)
@@ -1,9 +1,26 @@
+from collections import Counter
+
 from rest_framework import serializers
+from django.contrib.auth.models import User
+from django.db import models, transaction
 from django.utils import timezone
-from apps.reservation.models import Reservation
+from apps.books.api.serializers import BookSerializer, BookValuesSerializer
+from apps.books.models import Book
+from apps.changes.models import record_reservations
+from apps.reservation.models import Hold, Reservation
+from LMS_DRF.fieldsets import FieldsetSerializerMixin
+from LMS_DRF.values import ValuesSerializer, format_datetime
+
+
+class ReservationUserSerializer(serializers.ModelSerializer):
+    """The user embedded by ``?expand=user``."""
+
+    class Meta:
+        model = User
+        fields = ['id', 'username']
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
 
     is_overdue = serializers.SerializerMethodField()
 
@@ -16,9 +33,17 @@ class ReservationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'is_overdue', 'return_time']
 
+    expandable_fields = {
+        'book': (BookSerializer, {}),
+        'user': (ReservationUserSerializer, {}),
+    }
+
     def get_is_overdue(self, obj):
-        """Calculate if the reservation is overdue."""
-        return obj.is_overdue if hasattr(obj, 'is_overdue') else False
+        """Read the SQL annotation when present, compute it otherwise."""
+        flag = getattr(obj, 'overdue_flag', None)
+        if flag is not None:
+            return flag
+        return bool(obj.is_overdue) if hasattr(obj, 'is_overdue') else False
 
     def validate_due_time(self, value):
         """
@@ -55,15 +80,25 @@ class ReservationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """
-        Override create method to update book availability.
+        Check out a copy and insert the reservation in one transaction.
+        The conditional UPDATE only decrements ``available_count`` while it
+        is positive, so concurrent requests can never take more copies than
+        the library owns.
         """
-        # Set the book as unavailable when reserved
         book = validated_data['book']
-        if book.availability:
-            book.availability = False
-            book.save()
+        with transaction.atomic():
+            if not Book.objects.filter(pk=book.pk).check_out():
+                raise serializers.ValidationError({
+                    "book": "This book is not available for reservation."
+                })
+            book.available_count -= 1
+            return super().create(validated_data)
 
-        return super().create(validated_data)
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        # The SQL annotation describes the row as it was before this update
+        instance.__dict__.pop('overdue_flag', None)
+        return instance
 
 
 class ReservationReturnSerializer(serializers.Serializer):
@@ -77,14 +112,199 @@ class ReservationReturnSerializer(serializers.Serializer):
     )
 
     def update(self, instance, validated_data):
-        """Handle the return process."""
-        instance.status = Reservation.STATUS_COMPLETED
-        instance.return_time = validated_data.get('return_time', timezone.now())
-        instance.save()
+        """Complete the reservation and pass its copy to the next hold, or shelve it, in one transaction."""
+        if not instance.mark_as_returned(validated_data.get('return_time')):
+            # Returned or cancelled since it was read
+            raise serializers.ValidationError("This reservation is no longer out on loan.")
+        instance.__dict__.pop('overdue_flag', None)
+        return instance
 
-        # Update book availability
-        book = instance.book
-        book.availability = True
-        book.save()
 
-        return instance
+class BulkReservationResultMixin:
+    """Shared helpers for per-item results of bulk operations."""
+
+    @staticmethod
+    def unique_ids(ids):
+        return list(dict.fromkeys(ids))
+
+    @staticmethod
+    def summarize(results):
+        succeeded = sum(1 for item in results if item['status'] != 'error')
+        return {
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': results,
+        }
+
+
+class BulkReservationCreateSerializer(BulkReservationResultMixin, serializers.Serializer):
+    """
+    Reserve many books for the current user in one transaction.
+    """
+    books = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=1000,
+        help_text="IDs of the books to reserve"
+    )
+    due_time = serializers.DateTimeField(help_text="Due time shared by all reservations")
+
+    def validate_due_time(self, value):
+        if value <= timezone.now():
+            raise serializers.ValidationError("Due time must be in the future.")
+        return value
+
+    def create(self, validated_data):
+        book_ids = self.unique_ids(validated_data['books'])
+        user = validated_data['user']
+
+        with transaction.atomic():
+            available = dict(
+                Book.objects.select_for_update()
+                .filter(pk__in=book_ids)
+                .values_list('pk', 'available_count')
+            )
+            claimable = [pk for pk in book_ids if available.get(pk)]
+            claimed = Book.objects.filter(pk__in=claimable).check_out()
+            if claimed != len(claimable):
+                raise serializers.ValidationError(
+                    {"books": "Availability changed during the request, please retry."}
+                )
+            reservations = Reservation.objects.bulk_create([
+                Reservation(book_id=pk, user=user, due_time=validated_data['due_time'])
+                for pk in claimable
+            ])
+            record_reservations(reservations)
+
+        reservation_ids = {reservation.book_id: reservation.pk for reservation in reservations}
+        results = []
+        for pk in book_ids:
+            if pk in reservation_ids:
+                results.append({'book': pk, 'status': 'reserved', 'reservation': reservation_ids[pk]})
+            elif pk in available:
+                results.append({'book': pk, 'status': 'error',
+                                'detail': "This book is not available for reservation."})
+            else:
+                results.append({'book': pk, 'status': 'error', 'detail': "Book not found."})
+        return self.summarize(results)
+
+
+class BulkReservationReturnSerializer(BulkReservationResultMixin, serializers.Serializer):
+    """
+    Return many reservations with set-based UPDATEs in one transaction.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=1000,
+        help_text="IDs of the reservations to return"
+    )
+    return_time = serializers.DateTimeField(
+        required=False,
+        default=timezone.now,
+        help_text="When the books were returned (defaults to now)"
+    )
+
+    def create(self, validated_data):
+        ids = self.unique_ids(validated_data['ids'])
+
+        with transaction.atomic():
+            rows = {
+                row['pk']: row
+                for row in Reservation.objects.select_for_update()
+                .filter(pk__in=ids)
+                .values('pk', 'status', 'book_id', 'user_id')
+            }
+            returnable = [
+                pk for pk in ids
+                if pk in rows and rows[pk]['status'] in Reservation.RETURNABLE_STATUSES
+            ]
+
+            Reservation.objects.filter(pk__in=returnable).update(
+                status=Reservation.STATUS_COMPLETED,
+                return_time=validated_data['return_time'],
+                updated_at=timezone.now()
+            )
+            record_reservations({**rows[pk], 'status': Reservation.STATUS_COMPLETED} for pk in returnable)
+            Hold.objects.hand_over(Counter(rows[pk]['book_id'] for pk in returnable))
+
+        results = []
+        for pk in ids:
+            if pk not in rows:
+                results.append({'id': pk, 'status': 'error', 'detail': "Reservation not found."})
+            elif rows[pk]['status'] == Reservation.STATUS_COMPLETED:
+                results.append({'id': pk, 'status': 'error', 'detail': "This book has already been returned."})
+            elif rows[pk]['status'] not in Reservation.RETURNABLE_STATUSES:
+                results.append({'id': pk, 'status': 'error', 'detail': "This reservation has been cancelled."})
+            else:
+                results.append({'id': pk, 'status': 'returned', 'book': rows[pk]['book_id']})
+        return self.summarize(results)
+
+
+class HoldSerializer(serializers.ModelSerializer):
+    """
+    Join a book's waiting list. ``queue_position`` is 1 for the next hold
+    in line; a promoted hold links the reservation it became.
+    """
+    queue_position = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Hold
+        fields = ['id', 'book', 'status', 'queue_position', 'reservation', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'status', 'queue_position', 'reservation', 'created_at', 'updated_at']
+
+    def validate_book(self, value):
+        if value.availability:
+            raise serializers.ValidationError("This book is available, reserve it instead.")
+        if Hold.objects.waiting().filter(book=value, user=self.context['request'].user).exists():
+            raise serializers.ValidationError("You are already waiting for this book.")
+        return value
+
+    def create(self, validated_data):
+        """
+        Append the hold to the queue. The book row is locked, and
+        availability checked again, so a copy returned meanwhile is not
+        shelved while a new hold waits for it.
+        """
+        book = validated_data['book']
+        with transaction.atomic():
+            available_count = Book.objects.select_for_update().filter(pk=book.pk).values_list(
+                'available_count', flat=True).get()
+            if available_count:
+                raise serializers.ValidationError({"book": "This book is available, reserve it instead."})
+            last = Hold.objects.filter(book=book).aggregate(last=models.Max('position'))['last'] or 0
+            hold = super().create({**validated_data, 'position': last + 1})
+        return Hold.objects.with_queue_position().get(pk=hold.pk)
+
+
+class ReservationValuesSerializer(ValuesSerializer):
+    """
+    Read-only twin of ReservationSerializer built from ``values()`` rows.
+    Expects the queryset to carry the ``overdue_flag`` annotation.
+    """
+    values_fields = ('id', 'status', 'reservation_time', 'due_time', 'user',
+                     'book', 'overdue_flag', 'created_at', 'updated_at')
+    field_sources = {'is_overdue': ('overdue_flag',)}
+
+    def prepare(self, rows):
+        """Fetch the expanded books and users of the whole page, a query or two per relation."""
+        self.books = self.users = {}
+        if 'book' in self.expand:
+            books = BookValuesSerializer.get_values(Book.objects.filter(pk__in={row['book'] for row in rows}))
+            self.books = {book['id']: book for book in BookValuesSerializer(books, many=True).data}
+        if 'user' in self.expand:
+            users = User.objects.filter(pk__in={row['user'] for row in rows}).values('id', 'username')
+            self.users = {user['id']: user for user in users}
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'reservation_time': format_datetime(row['reservation_time']),
+            'due_time': format_datetime(row['due_time']),
+            'user': self.users[row['user']] if 'user' in self.expand else row['user'],
+            'book': self.books[row['book']] if 'book' in self.expand else row['book'],
+            'is_overdue': bool(row['overdue_flag']),
+            'created_at': format_datetime(row['created_at']),
+            'updated_at': format_datetime(row['updated_at']),
+        }
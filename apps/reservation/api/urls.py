@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from apps.reservation.api.views import ReservationViewSet
+from apps.reservation.api.views import HoldViewSet, ReservationViewSet
 
 router = DefaultRouter()
 router.register('reservations', ReservationViewSet, basename='reservation')
+router.register('holds', HoldViewSet, basename='hold')
 
 
 urlpatterns = [
@@ -1,28 +1,58 @@
+from django.db.models import Prefetch
 from django.utils import timezone
-from rest_framework import viewsets, filters, status, permissions
+from rest_framework import mixins, viewsets, filters, status, permissions, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
 
-from apps.reservation.models import Reservation
-from apps.reservation.api.serializers import ReservationSerializer, ReservationReturnSerializer
+from apps.category.models import Category
+from apps.reservation.models import Hold, Reservation
+from apps.reservation.api.serializers import (
+    ReservationSerializer, ReservationReturnSerializer, HoldSerializer,
+    BulkReservationCreateSerializer, BulkReservationReturnSerializer, ReservationValuesSerializer
+)
+from LMS_DRF.fieldsets import FieldsetMixin, expand_parameter, fields_parameter
+from LMS_DRF.renderers import StreamingRenderMixin
+from LMS_DRF.values import ValuesReadMixin
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+fieldset_parameters = [fields_parameter('id,status,due_time'), expand_parameter('book', 'user')]
+
+
+class ReservationViewSet(FieldsetMixin, StreamingRenderMixin, ValuesReadMixin, viewsets.ModelViewSet):
     serializer_class = ReservationSerializer
+    values_serializer_class = ReservationValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('id',)
+    # Safe requests only; see LMS_DRF/routers.py
+    replica_reads = True
 
     # Optimize query performance with select_related
     queryset = Reservation.objects.select_related('book').all()
 
+    def parse_fieldset(self):
+        fields, expand = super().parse_fieldset()
+        # Users are embedded for staff only; an expansion never changes which rows come back
+        if 'user' in expand and not self.request.user.is_staff:
+            raise serializers.ValidationError({self.expand_param: "Only staff can expand user."})
+        return fields, expand
+
     def get_queryset(self):
         """
         Customize queryset based on request parameters.
         Allows filtering for overdue reservations and by user.
         """
-        queryset = super().get_queryset()
+        # One "now" for the whole request instead of one per serialized row
+        queryset = super().get_queryset().with_overdue_flag(timezone.now())
+
+        _, expand = self.get_fieldset()
+        if 'book' in expand:
+            queryset = queryset.select_related('book').prefetch_related(
+                Prefetch('book__categories', queryset=Category.objects.only('id').order_by('id'))
+            )
+        if 'user' in expand:
+            queryset = queryset.select_related('user')
 
         # Filter by current user (when user system is implemented)
         # queryset = queryset.filter(user=self.request.user)
@@ -30,10 +60,8 @@ class ReservationViewSet(viewsets.ModelViewSet):
         # Filter by overdue status if requested
         overdue = self.request.query_params.get('overdue')
         if overdue and overdue.lower() == 'true':
-            queryset = queryset.filter(
-                status=Reservation.STATUS_ACTIVE,
-                due_time__lt=timezone.now()
-            )
+            # Materialized by the sweep_overdue command
+            queryset = queryset.filter(status=Reservation.STATUS_OVERDUE)
 
         return queryset
 
@@ -41,21 +69,19 @@ class ReservationViewSet(viewsets.ModelViewSet):
         """
         Set additional fields when creating a reservation.
         """
-        # Will associate current user when user system is implemented
-        # serializer.save(user=self.request.user)
-        serializer.save()
+        serializer.save(user=self.request.user)
 
     @swagger_auto_schema(
         method='post',
         request_body=ReservationReturnSerializer,
         responses={
             status.HTTP_200_OK: ReservationSerializer,
-            status.HTTP_400_BAD_REQUEST: "Bad request if reservation is already completed"
+            status.HTTP_400_BAD_REQUEST: "Bad request if reservation is already completed or cancelled"
         },
         operation_description="Return a book and mark the reservation as completed."
     )
     @action(detail=True, methods=['post'], serializer_class=ReservationReturnSerializer)
-    def return_book(self, request):
+    def return_book(self, request, pk=None):
         """
         Special action to handle book returns.
         Updates reservation status and makes the book available again.
@@ -68,8 +94,13 @@ class ReservationViewSet(viewsets.ModelViewSet):
                 {"detail": "This book has already been returned."},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if reservation.status not in Reservation.RETURNABLE_STATUSES:
+            return Response(
+                {"detail": "This reservation has been cancelled."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Process the return
+        # Process the return; a concurrent return makes the serializer fail
         serializer = ReservationReturnSerializer(
             reservation,
             data=request.data or {}
@@ -81,7 +112,42 @@ class ReservationViewSet(viewsets.ModelViewSet):
         return Response(ReservationSerializer(reservation).data)
 
     @swagger_auto_schema(
-        operation_description="Get a list of all reservations"
+        method='post',
+        request_body=BulkReservationCreateSerializer,
+        responses={status.HTTP_200_OK: "Per-book results of the bulk reservation"},
+        operation_description="Reserve many books for the current user in one request."
+    )
+    @action(detail=False, methods=['post'], url_path='bulk-create',
+            serializer_class=BulkReservationCreateSerializer)
+    def bulk_create(self, request):
+        """
+        Reserve a list of books in one transaction.
+        Returns a result per book; unavailable or unknown books are reported, not fatal.
+        """
+        serializer = BulkReservationCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save(user=request.user))
+
+    @swagger_auto_schema(
+        method='post',
+        request_body=BulkReservationReturnSerializer,
+        responses={status.HTTP_200_OK: "Per-reservation results of the bulk return"},
+        operation_description="Return many reservations in one request."
+    )
+    @action(detail=False, methods=['post'], url_path='bulk-return',
+            serializer_class=BulkReservationReturnSerializer)
+    def bulk_return(self, request):
+        """
+        Mark a list of reservations as completed and make their books available,
+        using a fixed number of queries regardless of the batch size.
+        """
+        serializer = BulkReservationReturnSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
+
+    @swagger_auto_schema(
+        operation_description="Get a list of all reservations",
+        manual_parameters=fieldset_parameters
     )
     def list(self, request, *args, **kwargs):
         """Get a list of all reservations."""
@@ -95,7 +161,8 @@ class ReservationViewSet(viewsets.ModelViewSet):
         return super().create(request, *args, **kwargs)
 
     @swagger_auto_schema(
-        operation_description="Get detailed information about a reservation"
+        operation_description="Get detailed information about a reservation",
+        manual_parameters=fieldset_parameters
     )
     def retrieve(self, request, *args, **kwargs):
         """Get details of a specific reservation."""
@@ -121,3 +188,56 @@ class ReservationViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         """Delete a reservation."""
         return super().destroy(request, *args, **kwargs)
+
+
+class HoldViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                  mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    The current user's places in book waiting lists. Returning a copy
+    promotes the first waiting hold to a reservation, so clients check
+    their hold instead of polling for available books.
+    """
+    serializer_class = HoldSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('id',)
+
+    def get_queryset(self):
+        return Hold.objects.filter(user_id=self.request.user.pk).with_queue_position().order_by('id')
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        """Leave the queue; promoted holds keep their reservation, even when promoted meanwhile."""
+        Hold.objects.filter(pk=instance.pk, status=Hold.STATUS_WAITING).update(
+            status=Hold.STATUS_CANCELLED,
+            updated_at=timezone.now()
+        )
+
+    @swagger_auto_schema(
+        operation_description="Get the current user's holds with their queue positions"
+    )
+    def list(self, request, *args, **kwargs):
+        """Get the current user's holds."""
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Join the waiting list of a book that has no copy available"
+    )
+    def create(self, request, *args, **kwargs):
+        """Join the waiting list of a book."""
+        return super().create(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Get a hold and its position in the queue (1 is next in line)"
+    )
+    def retrieve(self, request, *args, **kwargs):
+        """Get a hold and its queue position."""
+        return super().retrieve(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Leave the waiting list"
+    )
+    def destroy(self, request, *args, **kwargs):
+        """Cancel a hold."""
+        return super().destroy(request, *args, **kwargs)
@@ -0,0 +1,60 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.reservation.models import Reservation
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Transition expired active reservations to overdue in set-based batches. "
+        "Runs once by default, or repeatedly with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping every --interval seconds.")
+        parser.add_argument('--interval', type=float, default=60.0, help="Seconds between sweeps in loop mode.")
+        parser.add_argument(
+            '--iterations', type=int, default=0,
+            help="Stop after this many sweeps in loop mode (0 runs until interrupted)."
+        )
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self.sweep(options['batch_size'])
+            return
+
+        iteration = 0
+        try:
+            while True:
+                close_old_connections()
+                self.sweep(options['batch_size'])
+                iteration += 1
+                if options['iterations'] and iteration >= options['iterations']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Sweeper stopped.")
+
+    def sweep(self, batch_size):
+        """Run batches against a single "now" until no expired reservation is left."""
+        now = timezone.now()
+        started = time.perf_counter()
+        changed = batches = 0
+        while True:
+            updated = Reservation.objects.mark_overdue(now=now, batch_size=batch_size)
+            changed += updated
+            batches += 1
+            if updated < batch_size:
+                break
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        logger.info("Marked %d reservations overdue in %d batches, %.1f ms", changed, batches, elapsed_ms)
+        self.stdout.write(f"Marked {changed} reservations overdue in {batches} batches, {elapsed_ms:.1f} ms")
+        return changed
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0003_reservation_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservation',
+            name='return_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
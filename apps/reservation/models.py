@@ -1,8 +1,54 @@
-from django.db import models
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 from apps.books.models import Book
 from django.contrib.auth.models import User
 
+
+class ReservationQuerySet(models.QuerySet):
+
+    def with_overdue_flag(self, now=None) -> 'ReservationQuerySet':
+        """
+        Annotate ``overdue_flag`` in SQL against a single "now", so listing
+        many reservations doesn't call ``timezone.now()`` once per row.
+        """
+        now = now or timezone.now()
+        return self.annotate(overdue_flag=models.Case(
+            models.When(
+                models.Q(status=Reservation.STATUS_OVERDUE) |
+                models.Q(status=Reservation.STATUS_ACTIVE, due_time__lt=now),
+                then=models.Value(True)
+            ),
+            default=models.Value(False),
+            output_field=models.BooleanField(),
+        ))
+
+    def mark_overdue(self, now=None, batch_size=1000) -> int:
+        """
+        Move at most ``batch_size`` expired active reservations to overdue
+        with one set-based UPDATE. Returns the number of rows changed.
+        """
+        from apps.changes.models import record_reservations
+
+        now = now or timezone.now()
+        with transaction.atomic():
+            expired = list(
+                self.filter(status=Reservation.STATUS_ACTIVE, due_time__lt=now)
+                .values('pk', 'book_id', 'user_id')[:batch_size]
+            )
+            if not expired:
+                return 0
+            updated = self.filter(pk__in=[row['pk'] for row in expired], status=Reservation.STATUS_ACTIVE).update(
+                status=Reservation.STATUS_OVERDUE,
+                updated_at=now
+            )
+            record_reservations({**row, 'status': Reservation.STATUS_OVERDUE} for row in expired)
+            return updated
+
+
 class Reservation(models.Model):
 
     STATUS_ACTIVE = 'active'
@@ -16,11 +62,13 @@ class Reservation(models.Model):
         (STATUS_CANCELLED, 'Cancelled'),
         (STATUS_OVERDUE, 'Overdue'),
     ]
+    # Statuses of a book still out on loan
+    RETURNABLE_STATUSES = (STATUS_ACTIVE, STATUS_OVERDUE)
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
     reservation_time = models.DateTimeField(null=True, blank=True,auto_now_add=True)
     due_time = models.DateTimeField()
-    return_time = models.DateTimeField()
+    return_time = models.DateTimeField(null=True, blank=True)
 
     book: Book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='reservations')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservations')
@@ -28,27 +76,194 @@ class Reservation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ReservationQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Reservation"
         verbose_name_plural = "Reservations"
+        indexes = [
+            models.Index(fields=['status', 'due_time'], name='reservation_status_due_idx'),
+            models.Index(fields=['due_time'], name='reservation_active_due_idx',
+                         condition=models.Q(status='active')),
+        ]
 
     def __str__(self):
         return f"Reservation of '{self.book.title}' ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the status the change log has seen, see apps.changes.signals
+        instance._logged_status = instance.__dict__.get('status')
+        return instance
+
     @property
     def is_overdue(self):
-        """Check if the reservation is overdue."""
-        return (
+        """Check if the reservation is overdue, including ones not swept yet."""
+        return self.status == self.STATUS_OVERDUE or (
                 self.status == self.STATUS_ACTIVE and
                 self.due_time and
                 timezone.now() > self.due_time
         )
 
-    def mark_as_returned(self):
-        """Mark the reservation as completed and set return time."""
-        self.status = self.STATUS_COMPLETED
-        self.return_time = timezone.now()
-        self.save()
+    def mark_as_returned(self, return_time=None) -> bool:
+        """
+        Mark the reservation as completed and hand its copy to the next hold
+        in line. The status is changed with a conditional UPDATE, so of two
+        concurrent returns only one shelves the copy; the other changes
+        nothing and returns False.
+        """
+        from apps.changes.models import record_reservations
+
+        now = timezone.now()
+        return_time = return_time or now
+        with transaction.atomic():
+            returned = Reservation.objects.filter(pk=self.pk, status__in=self.RETURNABLE_STATUSES).update(
+                status=self.STATUS_COMPLETED,
+                return_time=return_time,
+                updated_at=now
+            )
+            if not returned:
+                return False
+            self.status = self._logged_status = self.STATUS_COMPLETED
+            self.return_time = return_time
+            self.updated_at = now
+            record_reservations([self])
+            Hold.objects.hand_over({self.book_id: 1}, return_time)
+        return True
+
+
+class HoldQuerySet(models.QuerySet):
+
+    def waiting(self) -> 'HoldQuerySet':
+        return self.filter(status=Hold.STATUS_WAITING)
+
+    def with_queue_position(self) -> 'HoldQuerySet':
+        """
+        Annotate ``queue_position``, 1 for the next hold in line and None
+        for holds no longer waiting, counted on the waiting-queue index.
+        """
+        ahead = (
+            Hold.objects.waiting()
+            .filter(book=models.OuterRef('book'), position__lte=models.OuterRef('position'))
+            .order_by().values('book').annotate(n=models.Count('id')).values('n')
+        )
+        return self.annotate(queue_position=models.Case(
+            models.When(status=Hold.STATUS_WAITING, then=models.Subquery(ahead)),
+            default=None,
+            output_field=models.IntegerField(),
+        ))
+
+    def hand_over(self, returned, now=None) -> int:
+        """
+        Give returned copies to the first holds in line and shelve the rest.
+        ``returned`` maps book ids to the number of copies returned. Each
+        promoted hold becomes an active reservation of its user. Call it in
+        the transaction that completes the returned reservations; the
+        number of queries depends on the distinct copy counts, not on the
+        number of books. Returns how many holds were promoted.
+
+        The holds picked are locked and checked to be still waiting, so a
+        concurrent return or cancellation cannot have a hold promoted
+        twice; the copy of a hold lost that way goes to the next in line.
+        """
+        from apps.changes.models import record_reservations
+
+        now = now or timezone.now()
+        promoted = []
+        wanted = returned
+        while wanted:
+            by_copies = defaultdict(list)
+            for book_id, copies in wanted.items():
+                by_copies[copies].append(book_id)
+            candidates = []
+            for copies, book_ids in by_copies.items():
+                # The first ``copies`` waiting holds of each book, read off the queue index
+                first_in_line = self.waiting().filter(book_id__in=book_ids).exclude(
+                    pk__in=[hold.pk for hold in promoted]
+                ).annotate(
+                    rank=models.Window(RowNumber(), partition_by='book_id', order_by='position')
+                ).filter(rank__lte=copies)
+                candidates.extend(first_in_line)
+            # Row locks cannot be taken with a window function; lock the picks by key
+            locked = set(
+                self.select_for_update().waiting()
+                .filter(pk__in=[hold.pk for hold in candidates]).values_list('pk', flat=True)
+            ) if candidates else set()
+            wanted = defaultdict(int)
+            for hold in candidates:
+                if hold.pk in locked:
+                    promoted.append(hold)
+                else:
+                    wanted[hold.book_id] += 1
+
+        shelved = dict(returned)
+        for hold in promoted:
+            shelved[hold.book_id] -= 1
+        by_copies = defaultdict(list)
+        for book_id, copies in shelved.items():
+            if copies:
+                by_copies[copies].append(book_id)
+        for copies, book_ids in by_copies.items():
+            Book.objects.filter(pk__in=book_ids).check_in(copies)
 
-        self.book.availability = True
-        self.book.save()
+        if promoted:
+            reservations = Reservation.objects.bulk_create([
+                Reservation(book_id=hold.book_id, user_id=hold.user_id, due_time=now + Hold.LOAN_PERIOD)
+                for hold in promoted
+            ])
+            record_reservations(reservations)
+            for hold, reservation in zip(promoted, reservations):
+                hold.status = Hold.STATUS_FULFILLED
+                hold.reservation = reservation
+                hold.updated_at = now
+            Hold.objects.bulk_update(promoted, ['status', 'reservation', 'updated_at'])
+        return len(promoted)
+
+
+class Hold(models.Model):
+    """
+    A place in a book's FIFO waiting list. When a copy comes back the
+    first waiting hold is promoted to a reservation in the same
+    transaction, so clients never race for the returned copy.
+    """
+
+    STATUS_WAITING = 'waiting'
+    STATUS_FULFILLED = 'fulfilled'
+    STATUS_CANCELLED = 'cancelled'
+
+    STATUS_CHOICES = [
+        (STATUS_WAITING, 'Waiting'),
+        (STATUS_FULFILLED, 'Fulfilled'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    ]
+
+    # Loan period of the reservation a promoted hold turns into
+    LOAN_PERIOD = timedelta(days=14)
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='holds')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='holds')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_WAITING)
+    # Increases per book in joining order; gaps from cancelled holds are fine
+    position = models.PositiveBigIntegerField()
+    reservation = models.OneToOneField(Reservation, on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='hold')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = HoldQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'position'], name='hold_book_position_uniq'),
+            models.UniqueConstraint(fields=['book', 'user'], name='hold_waiting_book_user_uniq',
+                                    condition=models.Q(status='waiting')),
+        ]
+        indexes = [
+            models.Index(fields=['book', 'position'], name='hold_waiting_queue_idx',
+                         condition=models.Q(status='waiting')),
+        ]
+
+    def __str__(self):
+        return f"Hold on '{self.book.title}' ({self.status})"
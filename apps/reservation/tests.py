@@ -1,3 +1,521 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from apps.books.models import Book
+from apps.category.models import Category
+from apps.reservation.api.serializers import ReservationReturnSerializer, ReservationSerializer
+from apps.reservation.models import Hold, HoldQuerySet, Reservation
+
+
+class ReservationCreateTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader')
+        self.book = Book.objects.create(title='Book', author='Test Author', year=2000)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def reserve(self):
+        return self.client.post('/api/reservations/', {
+            'book': self.book.pk,
+            'due_time': (timezone.now() + timedelta(days=14)).isoformat(),
+        })
+
+    def test_reserve_available_book(self):
+        response = self.reserve()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user'], self.user.pk)
+        self.book.refresh_from_db()
+        self.assertFalse(self.book.availability)
+
+    def test_copies_are_checked_out_and_returned(self):
+        Book.objects.filter(pk=self.book.pk).set_copies(2)
+        first = self.reserve()
+        self.assertEqual(self.reserve().status_code, 201)
+        self.assertEqual(self.reserve().status_code, 400)
+
+        self.client.post(f"/api/reservations/{first.data['id']}/return_book/", {}, format='json')
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.copies, self.book.available_count), (2, 1))
+
+    def test_reserve_unavailable_book(self):
+        self.assertEqual(self.reserve().status_code, 201)
+        response = self.reserve()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('book', response.data)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+
+class ReservationConcurrencyTests(TransactionTestCase):
+    workers = 12
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'reader{i}') for i in range(self.workers)]
+        self.book = Book.objects.create(title='Book', author='Test Author', year=2000)
+
+    def race(self):
+        """Reserve the book from every worker at once; returns the outcomes."""
+        # Every request passes validation on a stale copy of the book, as
+        # concurrent requests would, before racing for the row.
+        stale_books = [Book.objects.get(pk=self.book.pk) for _ in self.users]
+        due_time = timezone.now() + timedelta(days=14)
+        barrier = threading.Barrier(self.workers)
+        outcomes = []
+
+        def reserve(user, stale_book):
+            serializer = ReservationSerializer()
+            barrier.wait()
+            try:
+                # SQLite reports lock contention instead of waiting; retry
+                # like a client would until the request is decided.
+                for _ in range(500):
+                    try:
+                        serializer.create({'book': stale_book, 'user': user, 'due_time': due_time})
+                        outcomes.append('reserved')
+                        return
+                    except serializers.ValidationError:
+                        outcomes.append('rejected')
+                        return
+                    except OperationalError as exc:
+                        if 'locked' not in str(exc):
+                            raise
+                        time.sleep(0.005)
+                outcomes.append('gave up')
+            except Exception as exc:
+                outcomes.append(repr(exc))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserve, args=pair) for pair in zip(self.users, stale_books)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_exactly_one_parallel_reservation_succeeds(self):
+        outcomes = self.race()
+        self.assertEqual(outcomes.count('reserved'), 1, outcomes)
+        self.assertEqual(outcomes.count('rejected'), self.workers - 1, outcomes)
+        self.assertEqual(Reservation.objects.filter(book=self.book).count(), 1)
+        self.book.refresh_from_db()
+        self.assertFalse(self.book.availability)
+
+    def test_parallel_reservations_take_each_copy_once(self):
+        Book.objects.filter(pk=self.book.pk).set_copies(5)
+        outcomes = self.race()
+        self.assertEqual(outcomes.count('reserved'), 5, outcomes)
+        self.assertEqual(outcomes.count('rejected'), self.workers - 5, outcomes)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_count, 0)
+
+
+class ReservationBulkTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='librarian')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.due_time = (timezone.now() + timedelta(days=14)).isoformat()
+
+    def create_books(self, count):
+        return [
+            Book.objects.create(title=f'Book {i}', author='Test Author', year=2000)
+            for i in range(count)
+        ]
+
+    def bulk_create(self, book_ids):
+        return self.client.post('/api/reservations/bulk-create/', {
+            'books': book_ids, 'due_time': self.due_time
+        }, format='json')
+
+    def bulk_return(self, ids):
+        return self.client.post('/api/reservations/bulk-return/', {'ids': ids}, format='json')
+
+    def test_bulk_create_reports_per_item_results(self):
+        books = self.create_books(3)
+        Book.objects.filter(pk=books[1].pk).update(available_count=0)
+
+        response = self.bulk_create([books[0].pk, books[1].pk, books[2].pk, 999999])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['succeeded'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            ['reserved', 'error', 'reserved', 'error']
+        )
+        self.assertEqual(Reservation.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(Book.objects.available().exists())
+
+    def test_bulk_return_reports_per_item_results(self):
+        books = self.create_books(3)
+        created = self.bulk_create([book.pk for book in books]).data['results']
+        ids = [item['reservation'] for item in created]
+
+        self.assertEqual(self.bulk_return(ids[:1]).data['succeeded'], 1)
+        response = self.bulk_return(ids + [999999])
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            ['error', 'returned', 'returned', 'error']
+        )
+        self.assertEqual(Book.objects.available().count(), 3)
+        self.assertEqual(
+            Reservation.objects.filter(status=Reservation.STATUS_COMPLETED, return_time__isnull=False).count(), 3
+        )
+
+    def test_bulk_return_skips_cancelled_reservations(self):
+        books = self.create_books(2)
+        created = self.bulk_create([book.pk for book in books]).data['results']
+        ids = [item['reservation'] for item in created]
+        Reservation.objects.filter(pk=ids[0]).update(status=Reservation.STATUS_CANCELLED)
+
+        response = self.bulk_return(ids)
+        self.assertEqual([item['status'] for item in response.data['results']], ['error', 'returned'])
+        self.assertEqual(response.data['results'][0]['detail'], "This reservation has been cancelled.")
+        self.assertEqual(Reservation.objects.get(pk=ids[0]).status, Reservation.STATUS_CANCELLED)
+        self.assertEqual(Book.objects.available().count(), 1)
+
+    def test_bulk_queries_do_not_grow_with_batch_size(self):
+        for size in (3, 30):
+            books = self.create_books(size)
+            # savepoint, select + update books, select emptied books, log them,
+            # insert reservations, log them, release
+            with self.assertNumQueries(8):
+                created = self.bulk_create([book.pk for book in books]).data['results']
+            # savepoint, select + update reservations, log them, select holds,
+            # update books, select shelved books, log them, release
+            with self.assertNumQueries(9):
+                response = self.bulk_return([item['reservation'] for item in created])
+            self.assertEqual(response.data['succeeded'], size)
+
+    def test_single_return(self):
+        book = self.create_books(1)[0]
+        reservation_id = self.bulk_create([book.pk]).data['results'][0]['reservation']
+        response = self.client.post(f'/api/reservations/{reservation_id}/return_book/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], Reservation.STATUS_COMPLETED)
+
+
+class HoldQueueTests(TestCase):
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Book', author='Test Author', year=2000)
+        self.borrower = User.objects.create(username='borrower')
+        self.reservation = Reservation.objects.create(book=self.book, user=self.borrower,
+                                                      due_time=timezone.now() + timedelta(days=14))
+        Book.objects.filter(pk=self.book.pk).check_out()
+        self.users = [User.objects.create(username=f'reader{i}') for i in range(3)]
+        self.clients = []
+        for user in self.users:
+            client = APIClient()
+            client.force_authenticate(user)
+            self.clients.append(client)
+
+    def join(self, client):
+        return client.post('/api/holds/', {'book': self.book.pk}, format='json')
+
+    def positions(self):
+        return [client.get('/api/holds/').data['results'][0]['queue_position'] for client in self.clients]
+
+    def test_queue_positions(self):
+        for client in self.clients:
+            self.assertEqual(self.join(client).status_code, 201)
+        self.assertEqual(self.positions(), [1, 2, 3])
+        self.assertEqual(self.join(self.clients[0]).status_code, 400)
+
+        hold = Hold.objects.get(user=self.users[0])
+        self.assertEqual(self.clients[0].delete(f'/api/holds/{hold.pk}/').status_code, 204)
+        self.assertEqual(self.positions(), [None, 1, 2])
+
+    def test_cannot_hold_an_available_book(self):
+        Book.objects.filter(pk=self.book.pk).check_in()
+        response = self.join(self.clients[0])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('book', response.data)
+
+    def test_return_promotes_next_in_line(self):
+        for client in self.clients:
+            self.join(client)
+        client = APIClient()
+        client.force_authenticate(self.borrower)
+        response = client.post(f'/api/reservations/{self.reservation.pk}/return_book/')
+        self.assertEqual(response.status_code, 200)
+
+        hold = Hold.objects.get(user=self.users[0])
+        self.assertEqual(hold.status, Hold.STATUS_FULFILLED)
+        self.assertEqual(hold.reservation.user, self.users[0])
+        self.assertEqual(hold.reservation.status, Reservation.STATUS_ACTIVE)
+        self.assertEqual(self.clients[0].get(f'/api/holds/{hold.pk}/').data['reservation'], hold.reservation.pk)
+        # The copy went to the hold, not back on the shelf
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_count, 0)
+        self.assertEqual(self.positions(), [None, 1, 2])
+
+        self.reservation = hold.reservation
+        self.reservation.mark_as_returned()
+        self.assertEqual(self.positions(), [None, None, 1])
+
+    def test_bulk_return_promotes_per_copy(self):
+        second = Reservation.objects.create(book=self.book, user=self.borrower,
+                                            due_time=timezone.now() + timedelta(days=14))
+        Book.objects.filter(pk=self.book.pk).update(copies=2, available_count=0)
+        for client in self.clients[:1]:
+            self.join(client)
+        client = APIClient()
+        client.force_authenticate(self.borrower)
+        response = client.post('/api/reservations/bulk-return/', {'ids': [self.reservation.pk, second.pk]},
+                               format='json')
+        self.assertEqual(response.data['succeeded'], 2)
+        self.assertEqual(Hold.objects.get(user=self.users[0]).status, Hold.STATUS_FULFILLED)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_count, 1)
+
+    def test_return_without_holds_shelves_the_copy(self):
+        self.reservation.mark_as_returned()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_count, 1)
+
+    def test_added_copies_go_to_holds_first(self):
+        for client in self.clients[:2]:
+            self.join(client)
+        self.assertEqual(Book.objects.filter(pk=self.book.pk).set_copies(4), 1)
+
+        self.assertEqual(Hold.objects.filter(status=Hold.STATUS_FULFILLED).count(), 2)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.copies, self.book.available_count), (4, 1))
+
+    def test_copies_added_through_the_api_go_to_holds(self):
+        self.join(self.clients[0])
+        staff = APIClient()
+        staff.force_authenticate(User.objects.create(username='librarian', is_staff=True))
+        response = staff.patch(f'/api/books/{self.book.pk}/', {'copies': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['available_count'], 0)
+        self.assertEqual(Hold.objects.get().status, Hold.STATUS_FULFILLED)
+
+    def test_hand_over_skips_holds_left_meanwhile(self):
+        for client in self.clients[:2]:
+            self.join(client)
+        first, second = Hold.objects.order_by('position')
+        select_for_update = HoldQuerySet.select_for_update
+
+        def cancel_first(queryset, *args, **kwargs):
+            # The first hold in line leaves between being picked and being locked
+            Hold.objects.filter(pk=first.pk).update(status=Hold.STATUS_CANCELLED)
+            return select_for_update(queryset, *args, **kwargs)
+
+        with mock.patch.object(HoldQuerySet, 'select_for_update', cancel_first):
+            self.assertTrue(self.reservation.mark_as_returned())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, Hold.STATUS_CANCELLED)
+        self.assertIsNone(first.reservation)
+        self.assertEqual(second.status, Hold.STATUS_FULFILLED)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_count, 0)
+
+    def test_leaving_after_promotion_keeps_the_reservation(self):
+        self.join(self.clients[0])
+        hold = Hold.objects.get()
+        self.reservation.mark_as_returned()
+        self.assertEqual(self.clients[0].delete(f'/api/holds/{hold.pk}/').status_code, 204)
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, Hold.STATUS_FULFILLED)
+        self.assertEqual(hold.reservation.status, Reservation.STATUS_ACTIVE)
+
+    def test_concurrent_returns_shelve_one_copy(self):
+        self.join(self.clients[0])
+        # Both requests read the reservation while it was still active
+        stale = Reservation.objects.get(pk=self.reservation.pk)
+        self.assertTrue(self.reservation.mark_as_returned())
+        self.assertFalse(stale.mark_as_returned())
+        with self.assertRaises(serializers.ValidationError):
+            serializer = ReservationReturnSerializer(stale, data={})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        self.assertEqual(Hold.objects.get().status, Hold.STATUS_FULFILLED)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_count, 0)
+        self.assertEqual(Reservation.objects.filter(status=Reservation.STATUS_ACTIVE).count(), 1)
+
+    def test_cancelled_reservations_cannot_be_returned(self):
+        Reservation.objects.filter(pk=self.reservation.pk).update(status=Reservation.STATUS_CANCELLED)
+        client = APIClient()
+        client.force_authenticate(self.borrower)
+        response = client.post(f'/api/reservations/{self.reservation.pk}/return_book/')
+        self.assertEqual(response.status_code, 400)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_count, 0)
+
+
+class OverdueSweepTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        for i in range(7):
+            book = Book.objects.create(title=f'Book {i}', author='Test Author', year=2000)
+            Reservation.objects.create(
+                book=book, user=self.user,
+                due_time=now - timedelta(days=1) if i < 5 else now + timedelta(days=1)
+            )
+
+    def test_sweep_marks_expired_reservations_in_batches(self):
+        out = StringIO()
+        call_command('sweep_overdue', batch_size=2, stdout=out)
+        self.assertIn('Marked 5 reservations overdue in 3 batches', out.getvalue())
+        self.assertEqual(Reservation.objects.filter(status=Reservation.STATUS_OVERDUE).count(), 5)
+        self.assertEqual(Reservation.objects.filter(status=Reservation.STATUS_ACTIVE).count(), 2)
+
+    def test_loop_mode(self):
+        out = StringIO()
+        call_command('sweep_overdue', loop=True, interval=0, iterations=2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('Marked 5 reservations overdue'))
+        self.assertTrue(lines[1].startswith('Marked 0 reservations overdue'))
+
+    def test_overdue_listing_uses_status(self):
+        self.assertEqual(self.client.get('/api/reservations/?overdue=true').data['count'], 0)
+        call_command('sweep_overdue', stdout=StringIO())
+        response = self.client.get('/api/reservations/?overdue=true')
+        self.assertEqual(response.data['count'], 5)
+        self.assertTrue(all(row['is_overdue'] for row in response.data['results']))
+
+
+class OverdueAnnotationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        book = Book.objects.create(title='Book', author='Test Author', year=2000)
+        for status in (Reservation.STATUS_ACTIVE, Reservation.STATUS_OVERDUE, Reservation.STATUS_COMPLETED):
+            for days in (-1, 1):
+                Reservation.objects.create(book=book, user=self.user, status=status,
+                                           due_time=now + timedelta(days=days))
+
+    def test_annotation_matches_property(self):
+        for reservation in Reservation.objects.with_overdue_flag():
+            self.assertEqual(reservation.overdue_flag, bool(reservation.is_overdue))
+
+    def test_list_reads_annotation(self):
+        response = self.client.get('/api/reservations/?pagination=cursor')
+        expected = {r.pk: bool(r.is_overdue) for r in Reservation.objects.all()}
+        self.assertEqual({row['id']: row['is_overdue'] for row in response.data['results']}, expected)
+
+    def test_returned_reservation_is_not_overdue(self):
+        reservation = Reservation.objects.filter(status=Reservation.STATUS_OVERDUE).first()
+        response = self.client.post(f'/api/reservations/{reservation.pk}/return_book/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['is_overdue'])
+
+
+class ReservationValuesSerializerTests(TestCase):
+    """The values() fast path must render byte-identical JSON to ReservationSerializer."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        book = Book.objects.create(title='Book', author='Test Author', year=2000)
+        for i, status in enumerate(dict(Reservation.STATUS_CHOICES)):
+            Reservation.objects.create(book=book, user=self.user, status=status,
+                                       due_time=now + timedelta(days=i - 2),
+                                       return_time=now if status == Reservation.STATUS_COMPLETED else None)
+
+    def test_list_and_retrieve(self):
+        reservation = Reservation.objects.order_by('id').first()
+        for url in ('/api/reservations/?pagination=cursor', '/api/reservations/?overdue=true',
+                    f'/api/reservations/{reservation.pk}/'):
+            fast = self.client.get(url)
+            with override_settings(API_VALUES_SERIALIZERS=False):
+                slow = self.client.get(url)
+            self.assertEqual(fast.content, slow.content, url)
+
+
+class ReservationFieldsetTests(TestCase):
+    """``?fields=`` and ``?expand=`` on both serialization paths."""
+
+    def setUp(self):
+        # Staff, who may expand users
+        self.user = User.objects.create(username='reader', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Fantasy')
+        for i in range(3):
+            book = Book.objects.create(title=f'Book {i}', author='Test Author', year=2000)
+            book.categories.set([category])
+            Reservation.objects.create(book=book, user=self.user, due_time=timezone.now() + timedelta(days=2 * i - 1))
+
+    def get(self, url, values=True):
+        with override_settings(API_VALUES_SERIALIZERS=values):
+            return self.client.get(url)
+
+    def test_paths_render_the_same_json(self):
+        reservation = Reservation.objects.first()
+        for url in ('/api/reservations/?expand=book,user', '/api/reservations/?fields=id,is_overdue',
+                    '/api/reservations/?fields=id,book&expand=book,user',
+                    f'/api/reservations/{reservation.pk}/?fields=status,user&expand=user'):
+            with self.subTest(url=url):
+                fast, slow = self.get(url), self.get(url, values=False)
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(fast.content, slow.content)
+
+    def test_expanded_objects(self):
+        data = self.client.get('/api/reservations/?expand=book,user&pagination=cursor').json()['results']
+        book = Book.objects.get(pk=data[0]['book']['id'])
+        self.assertEqual(data[0]['book'], self.client.get(f'/api/books/{book.pk}/').json())
+        self.assertEqual(data[0]['user'], {'id': self.user.pk, 'username': 'reader'})
+        self.assertEqual([item['is_overdue'] for item in data], [True, False, False])
+
+    def test_only_staff_expand_users(self):
+        Reservation.objects.create(book=Book.objects.first(), user=User.objects.create(username='other'),
+                                   due_time=timezone.now() + timedelta(days=14))
+        reader = APIClient()
+        reader.force_authenticate(User.objects.create(username='member'))
+        for values in (True, False):
+            with self.subTest(values=values), override_settings(API_VALUES_SERIALIZERS=values):
+                for url in ('/api/reservations/?expand=user', '/api/reservations/?expand=book,user',
+                            f'/api/reservations/{Reservation.objects.first().pk}/?expand=user'):
+                    response = reader.get(url)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('expand', response.json())
+                # Staff get every row, expanded or not
+                expanded = self.get('/api/reservations/?expand=user', values).json()['results']
+                plain = self.get('/api/reservations/', values).json()['results']
+                self.assertEqual([item['id'] for item in expanded], [item['id'] for item in plain])
+                self.assertEqual({item['user']['username'] for item in expanded}, {'reader', 'other'})
+
+    def test_expand_costs_fixed_queries(self):
+        # The page, its books, their category ids and users; or the page joined
+        # with books and users, and the category ids
+        for values, expected in ((True, 4), (False, 2)):
+            with self.subTest(values=values), override_settings(API_VALUES_SERIALIZERS=values):
+                with self.assertNumQueries(expected):
+                    self.client.get('/api/reservations/?expand=book,user&pagination=cursor')
+                for i in range(3, 8):
+                    book = Book.objects.create(title=f'Book {i}-{values}', author='Test Author', year=2000)
+                    Reservation.objects.create(book=book, user=self.user, due_time=timezone.now())
+                with self.assertNumQueries(expected):
+                    self.client.get('/api/reservations/?expand=book,user&pagination=cursor')
+
+    def test_invalid_parameters(self):
+        for url in ('/api/reservations/?fields=return_time', '/api/reservations/?expand=categories'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 400)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from apps.review.models import Review
 from apps.books.models import Book
+from LMS_DRF.values import ValuesSerializer, format_datetime, format_str
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -23,3 +24,19 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
         fields = ['id', 'rating', 'content', 'book', 'user', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'user']
+
+
+class ReviewValuesSerializer(ValuesSerializer):
+    """Read-only twin of ReviewSerializer built from ``values()`` rows."""
+    values_fields = ('id', 'rating', 'content', 'book', 'user__username', 'created_at', 'updated_at')
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'rating': row['rating'],
+            'content': format_str(row['content']),
+            'book': row['book'],
+            'user': row['user__username'],
+            'created_at': format_datetime(row['created_at']),
+            'updated_at': format_datetime(row['updated_at']),
+        }
@@ -1,12 +1,28 @@
-from rest_framework import viewsets
+from rest_framework import permissions, viewsets
 from drf_yasg.utils import swagger_auto_schema
 from apps.review.models import Review
-from apps.review.api.serializers import ReviewSerializer
+from apps.review.api.serializers import ReviewSerializer, ReviewValuesSerializer
+from LMS_DRF.async_views import AsyncReadMixin
+from LMS_DRF.conditional import ConditionalGetMixin
+from LMS_DRF.renderers import StreamingRenderMixin
+from LMS_DRF.sync import SyncMixin
+from LMS_DRF.values import ValuesReadMixin
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(SyncMixin, AsyncReadMixin, ConditionalGetMixin, StreamingRenderMixin, ValuesReadMixin,
+                    viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    values_serializer_class = ReviewValuesSerializer
+    keyset_ordering = ('-created_at', 'id')
+    cache_namespaces = ('reviews',)
+    sync_topic = 'review'
+    replica_reads = True
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def perform_create(self, serializer):
+        """The author of a review is the user posting it."""
+        serializer.save(user=self.request.user)
 
     @swagger_auto_schema(
         operation_description="Get a list of all available reviews"
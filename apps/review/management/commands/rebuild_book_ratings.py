@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.books.models import Book
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized rating aggregates of every book from its reviews."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated = Book.objects.rebuild_ratings()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt ratings for {updated} books in {time.perf_counter() - started:.2f}s"
+        ))
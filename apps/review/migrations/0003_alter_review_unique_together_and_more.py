@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_book_book_title_id_idx'),
+        ('review', '0002_review_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='review',
+            unique_together={('user', 'book')},
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-created_at', 'id'], name='review_created_id_idx'),
+        ),
+    ]
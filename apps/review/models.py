@@ -20,6 +20,17 @@ class Review(models.Model):
         verbose_name_plural = "Reviews"
         ordering = ['-created_at']  # - descending
         unique_together = ['user', 'book']  # user can add only one review to each book
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='review_created_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='review_updated_id_idx'),
+        ]
 
     def __str__(self):
         return f"Review for {self.book.title} - {self.rating}/5"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the book aggregates currently count for this review
+        instance._counted = (instance.__dict__.get('book_id'), instance.__dict__.get('rating'))
+        return instance
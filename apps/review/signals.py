@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from LMS_DRF import cache as response_cache
+from apps.books.models import Book
+from apps.review.models import Review
+
+
+@receiver(post_save, sender=Review)
+def count_saved_review(sender, instance, created, **kwargs):
+    """Apply the difference between the stored and the saved rating to the book aggregates."""
+    counted_book, counted_rating = (None, None) if created else getattr(instance, '_counted', (None, None))
+
+    if counted_book == instance.book_id:
+        if counted_rating != instance.rating:
+            Book.objects.filter(pk=instance.book_id).add_ratings(0, instance.rating - counted_rating)
+    else:
+        if counted_book is not None:
+            Book.objects.filter(pk=counted_book).add_ratings(-1, -counted_rating)
+        Book.objects.filter(pk=instance.book_id).add_ratings(1, instance.rating)
+
+    instance._counted = (instance.book_id, instance.rating)
+    response_cache.bump('reviews')
+
+
+@receiver(post_delete, sender=Review)
+def uncount_deleted_review(sender, instance, **kwargs):
+    book_id, rating = getattr(instance, '_counted', (instance.book_id, instance.rating))
+    Book.objects.filter(pk=book_id).add_ratings(-1, -rating)
+    response_cache.bump('reviews')
@@ -1,3 +1,162 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.books.models import Book
+from apps.review.models import Review
+
+
+class ReviewKeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        book = Book.objects.create(title='Book', author='Test Author', year=2000)
+        now = timezone.now()
+        for i in range(15):
+            user = User.objects.create(username=f'user{i}')
+            review = Review.objects.create(book=book, user=user, rating=5, content='Great book, really.')
+            # Pairs of reviews share a timestamp to exercise the ``id`` tie-breaker
+            Review.objects.filter(pk=review.pk).update(created_at=now - timedelta(minutes=i // 2))
+
+    def test_walks_newest_first(self):
+        url = '/api/reviews/?pagination=cursor'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        expected = list(Review.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+
+class BookRatingAggregateTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.book = Book.objects.create(title='Book', author='Test Author', year=2000)
+        self.other = Book.objects.create(title='Other', author='Test Author', year=2000)
+        self.users = [User.objects.create(username=f'user{i}') for i in range(3)]
+
+    def assert_ratings(self, book, count, average):
+        book.refresh_from_db()
+        self.assertEqual(book.rating_count, count)
+        self.assertAlmostEqual(book.rating_avg, average)
+
+    def review(self, user, rating, book=None):
+        return Review.objects.create(book=book or self.book, user=user, rating=rating,
+                                     content='Great book, really.')
+
+    def test_create_update_delete(self):
+        first = self.review(self.users[0], 5)
+        self.review(self.users[1], 2)
+        self.assert_ratings(self.book, 2, 3.5)
+
+        first = Review.objects.get(pk=first.pk)
+        first.rating = 3
+        first.save()
+        self.assert_ratings(self.book, 2, 2.5)
+
+        first.book = self.other
+        first.save()
+        self.assert_ratings(self.book, 1, 2.0)
+        self.assert_ratings(self.other, 1, 3.0)
+
+        Review.objects.filter(book=self.book).delete()
+        self.assert_ratings(self.book, 0, 0.0)
+
+    def test_exposed_and_sortable(self):
+        self.review(self.users[0], 2)
+        self.review(self.users[1], 5, book=self.other)
+        response = self.client.get('/api/books/', {'ordering': '-rating_avg'})
+        self.assertEqual(
+            [(row['title'], row['rating_count'], row['rating_avg']) for row in response.data['results']],
+            [('Other', 1, 5.0), ('Book', 1, 2.0)]
+        )
+
+    def test_rebuild_command_repairs_drift(self):
+        self.review(self.users[0], 4)
+        self.review(self.users[1], 1)
+        Book.objects.update(rating_count=7, rating_sum=3, rating_avg=9.0)
+
+        call_command('rebuild_book_ratings', stdout=StringIO())
+        self.assert_ratings(self.book, 2, 2.5)
+        self.assert_ratings(self.other, 0, 0.0)
+
+
+class ReviewValuesSerializerTests(TestCase):
+    """The values() fast path must render byte-identical JSON to ReviewSerializer."""
+
+    def setUp(self):
+        self.client = APIClient()
+        book = Book.objects.create(title='Book', author='Test Author', year=2000)
+        for i in range(12):
+            Review.objects.create(book=book, user=User.objects.create(username=f'user{i}'),
+                                  rating=i % 5 + 1, content=f'Review number {i} with "quotes" ✓')
+
+    def test_list_and_retrieve(self):
+        review = Review.objects.first()
+        for url in ('/api/reviews/', '/api/reviews/?page=2', '/api/reviews/?pagination=cursor',
+                    f'/api/reviews/{review.pk}/'):
+            fast = self.client.get(url)
+            with override_settings(API_VALUES_SERIALIZERS=False):
+                slow = self.client.get(url)
+            self.assertEqual(fast.content, slow.content, url)
+
+
+@override_settings(API_CACHE_SHARED=True)
+class ReviewConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.book = Book.objects.create(title='Book', author='Test Author', year=2000)
+        self.user = User.objects.create(username='reader')
+        self.review = Review.objects.create(book=self.book, user=self.user, rating=4, content='Good read overall.')
+
+    def test_review_writes_change_list_etag(self):
+        etag = self.client.get('/api/reviews/')['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/reviews/', headers={'if-none-match': etag}).status_code, 304)
+
+        self.review.rating = 2
+        self.review.save()
+        response = self.client.get('/api/reviews/', headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        self.review.delete()
+        self.assertEqual(self.client.get('/api/reviews/', headers={'if-none-match': etag}).status_code, 200)
+
+    def test_retrieve(self):
+        url = f'/api/reviews/{self.review.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 304)
+        self.review.content = 'Changed my mind about it.'
+        self.review.save()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+
+class ReviewCreateTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.book = Book.objects.create(title='Book', author='Test Author', year=2000)
+        self.user = User.objects.create(username='reader')
+        self.payload = {'book': self.book.pk, 'rating': 5, 'content': 'Could not put it down.'}
+
+    def test_review_belongs_to_the_poster(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/reviews/', self.payload)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user'], 'reader')
+        self.assertEqual(Review.objects.get().user, self.user)
+
+    def test_anonymous_users_cannot_post(self):
+        self.assertEqual(self.client.post('/api/reviews/', self.payload).status_code, 403)
+        self.assertEqual(self.client.get('/api/reviews/').status_code, 200)
@@ -0,0 +1,556 @@
+"""
+Hit every route of ``apps/*/api/urls.py`` and report p50/p95/p99 latency,
+throughput and SQL queries per endpoint, as a table and as JSON.
+
+    python -m benchmarks.seed --database bench.sqlite3
+    python -m benchmarks.api --database bench.sqlite3 --server client --output client.json
+    python -m benchmarks.api --database bench.sqlite3 --server wsgi --concurrency 8 --output wsgi.json
+    python -m benchmarks.api --database bench.sqlite3 --server asgi --concurrency 8   # needs uvicorn
+
+``client`` goes through Django's test client in-process, ``wsgi`` through
+a threaded ``wsgiref`` server and ``asgi`` through uvicorn, both on
+127.0.0.1 and driven over HTTP by ``--concurrency`` threads. Reads run
+before writes; write routes work on rows created for them up front. The
+run uses a copy of the database unless ``--in-place`` is given, so writes
+never leak into the next run. Query counts come from the Server-Timing
+header of the profiling middleware, which is switched on for the run.
+Diff two result files with ``python -m benchmarks.compare``.
+"""
+import argparse
+import base64
+import http.client
+import importlib
+import json
+import math
+import platform
+import random
+import re
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import count
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from urllib.parse import quote, urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from benchmarks.common import ROOT, setup_django, use_database
+
+API_PREFIX = '/api/'
+USERNAME = 'benchmark'
+PASSWORD = 'benchmark'
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+GROUP_RE = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+
+# Route discovery
+
+def discover_routes():
+    """Yield ``(method, name, template)`` for every route of the API urlconfs."""
+    from django.urls import URLPattern, URLResolver
+
+    def walk(patterns, prefix=''):
+        for pattern in patterns:
+            regex = pattern.pattern.regex.pattern.lstrip('^').rstrip('$').replace('\\Z', '')
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns, prefix + regex)
+            elif isinstance(pattern, URLPattern) and 'format' not in pattern.pattern.regex.groupindex:
+                yield pattern, prefix + regex
+
+    seen = set()
+    for path in sorted(ROOT.glob('apps/*/api/urls.py')):
+        module = importlib.import_module('.'.join(path.relative_to(ROOT).with_suffix('').parts))
+        for pattern, regex in walk(module.urlpatterns):
+            actions = getattr(pattern.callback, 'actions', None) or {'get': 'get'}
+            template = API_PREFIX + GROUP_RE.sub(r'{\1}', regex)
+            for method in actions:
+                key = (method.upper(), pattern.name, template)
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+
+# Fixtures
+
+class Fixtures:
+    """Sample ids of the seeded data plus rows created for write routes."""
+
+    def __init__(self, rng, samples=500):
+        from django.contrib.auth.models import User
+
+        from apps.books.models import Book
+        from apps.category.models import Category
+        from apps.changes.models import Change
+        from apps.reservation.models import Reservation
+        from apps.review.models import Review
+
+        self.rng = rng
+        self.sequence = count()
+        self.user, _ = User.objects.update_or_create(
+            username=USERNAME, defaults={'is_staff': True, 'is_superuser': True}
+        )
+        self.user.set_password(PASSWORD)
+        self.user.save()
+
+        self.book_ids = self.sample(Book, samples)
+        self.category_ids = self.sample(Category, samples)
+        self.review_ids = self.sample(Review, samples)
+        self.reservation_ids = self.sample(Reservation, samples)
+        books = Book.objects.filter(pk__in=self.book_ids)
+        self.authors = sorted(set(books.values_list('author', flat=True)))
+        self.titles = sorted(set(books.values_list('title', flat=True)))
+        self.years = sorted(set(books.values_list('year', flat=True)))
+        self.category_names = list(Category.objects.filter(pk__in=self.category_ids).values_list('name', flat=True))
+        # Read the change feed from a little before its end, so responses carry a page of changes
+        last_change = Change.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        self.change_since = max(last_change - 100, 0)
+        if not (self.book_ids and self.category_ids):
+            raise SystemExit('The database holds no books or categories; run benchmarks.seed first.')
+
+    def sample(self, model, size):
+        ids = list(model.objects.values_list('pk', flat=True).order_by('?')[:size])
+        self.rng.shuffle(ids)
+        return ids
+
+    def pick(self, values, index):
+        return values[index % len(values)] if values else 0
+
+    def unique(self):
+        return next(self.sequence)
+
+    def books(self, size, available=True):
+        from apps.books.models import Book
+
+        created = Book.objects.bulk_create(
+            Book(title=f'Benchmark book {self.unique()}', author='Benchmark', year=2000,
+                 available_count=int(available))
+            for _ in range(size)
+        )
+        return [book.pk for book in created]
+
+    def categories(self, size):
+        from apps.category.models import Category
+
+        created = Category.objects.bulk_create(Category(name=f'Benchmark {self.unique()}') for _ in range(size))
+        return [category.pk for category in created]
+
+    def reviews(self, size):
+        from apps.books.models import Book
+        from apps.review.models import Review
+
+        books = self.books(size)
+        created = Review.objects.bulk_create(
+            Review(book_id=book, user=self.user, rating=3, content='Benchmark review text') for book in books
+        )
+        # bulk_create skips the signals that keep the rating aggregates
+        Book.objects.filter(pk__in=books).add_ratings(1, 3)
+        return [review.pk for review in created]
+
+    def reservations(self, size, with_books=False):
+        from django.utils import timezone
+
+        from apps.reservation.models import Reservation
+
+        due_time = timezone.now() + timedelta(days=14)
+        created = Reservation.objects.bulk_create(
+            Reservation(book_id=book, user=self.user, due_time=due_time)
+            for book in self.books(size, available=False)
+        )
+        if with_books:
+            return [(reservation.pk, reservation.book_id) for reservation in created]
+        return [reservation.pk for reservation in created]
+
+    def holds(self, size):
+        from apps.reservation.models import Hold
+
+        created = Hold.objects.bulk_create(
+            Hold(book_id=book, user=self.user, position=1) for book in self.books(size, available=False)
+        )
+        return [hold.pk for hold in created]
+
+    def due_time(self):
+        from django.utils import timezone
+
+        return (timezone.now() + timedelta(days=14)).isoformat()
+
+
+# Request builders: (method, route name) -> function(fixtures, size) -> [(url kwargs, body)]
+# A ``query`` entry of the url kwargs becomes the query string.
+
+def repeat(size, build):
+    return [build(index) for index in range(size)]
+
+
+def book_body(fixtures, index):
+    return {'title': f'Benchmark title {fixtures.unique()}', 'author': 'Benchmark Author',
+            'year': 1990 + index % 30, 'description': 'Created by the API benchmark'}
+
+
+def review_body(book):
+    return {'book': book, 'rating': 4, 'content': 'Benchmark review content'}
+
+
+def with_category(fixtures, size):
+    from apps.books.models import Book
+    from apps.category.models import Category
+
+    books = fixtures.books(size)
+    category = Category.objects.get(pk=fixtures.category_ids[0])
+    Through = Book.categories.through
+    Through.objects.bulk_create(Through(book_id=book, category_id=category.pk) for book in books)
+    return [({'pk': book, 'category_name': category.name}, None) for book in books]
+
+
+def hold_details(fixtures, size):
+    holds = fixtures.holds(10)
+    return [({'pk': fixtures.pick(holds, index)}, None) for index in range(size)]
+
+
+BUILDERS = {
+    ('GET', 'api-root'): lambda f, n: repeat(n, lambda i: ({}, None)),
+    ('GET', 'book-list'): lambda f, n: repeat(n, lambda i: ({}, None)),
+    ('GET', 'book-available'): lambda f, n: repeat(n, lambda i: ({}, None)),
+    ('GET', 'book-by-author'): lambda f, n: repeat(n, lambda i: ({'author_name': f.pick(f.authors, i)}, None)),
+    ('GET', 'book-by-category'): lambda f, n: repeat(n, lambda i: ({'category_id': f.pick(f.category_ids, i)}, None)),
+    ('GET', 'book-by-title'): lambda f, n: repeat(n, lambda i: ({'title': f.pick(f.titles, i)}, None)),
+    ('GET', 'book-by-year'): lambda f, n: repeat(n, lambda i: ({'year': f.pick(f.years, i)}, None)),
+    ('GET', 'book-detail'): lambda f, n: repeat(n, lambda i: ({'pk': f.pick(f.book_ids, i)}, None)),
+    ('GET', 'category-list'): lambda f, n: repeat(n, lambda i: ({}, None)),
+    ('GET', 'category-detail'): lambda f, n: repeat(n, lambda i: ({'pk': f.pick(f.category_ids, i)}, None)),
+    ('GET', 'review-list'): lambda f, n: repeat(n, lambda i: ({}, None)),
+    ('GET', 'review-detail'): lambda f, n: repeat(n, lambda i: ({'pk': f.pick(f.review_ids, i)}, None)),
+    ('GET', 'reservation-list'): lambda f, n: repeat(n, lambda i: ({}, None)),
+    ('GET', 'reservation-detail'): lambda f, n: repeat(n, lambda i: ({'pk': f.pick(f.reservation_ids, i)}, None)),
+    ('GET', 'book-sync'): lambda f, n: repeat(n, lambda i: ({}, None)),
+    ('GET', 'category-sync'): lambda f, n: repeat(n, lambda i: ({}, None)),
+    ('GET', 'review-sync'): lambda f, n: repeat(n, lambda i: ({}, None)),
+    ('GET', 'hold-list'): lambda f, n: repeat(n, lambda i: ({}, None)),
+    ('GET', 'hold-detail'): hold_details,
+    # timeout=0 answers at once instead of long-polling for new changes
+    ('GET', 'changes'): lambda f, n: repeat(n, lambda i: ({'query': {'since': f.change_since, 'timeout': 0}},
+                                                           None)),
+
+    ('POST', 'book-list'): lambda f, n: repeat(n, lambda i: ({}, book_body(f, i))),
+    ('PUT', 'book-detail'): lambda f, n: [({'pk': pk}, book_body(f, i)) for i, pk in enumerate(f.books(n))],
+    ('PATCH', 'book-detail'): lambda f, n: [({'pk': pk}, {'description': 'Patched'}) for pk in f.books(n)],
+    ('DELETE', 'book-detail'): lambda f, n: [({'pk': pk}, None) for pk in f.books(n)],
+    ('POST', 'book-bulk'): lambda f, n: repeat(n, lambda i: ({}, [
+        {**book_body(f, k), 'ISBN': f'979-1-{f.unique():09d}-0', 'categories': ['Benchmark import']}
+        for k in range(10)
+    ])),
+    ('POST', 'book-add-category'): lambda f, n: [
+        ({'pk': pk, 'category_name': f.pick(f.category_names, i)}, None) for i, pk in enumerate(f.books(n))
+    ],
+    ('DELETE', 'book-add-category'): with_category,
+    ('POST', 'category-list'): lambda f, n: repeat(n, lambda i: ({}, {'name': f'Benchmark new {f.unique()}'})),
+    ('PUT', 'category-detail'): lambda f, n: [({'pk': pk}, {'name': f'Benchmark put {f.unique()}'})
+                                              for pk in f.categories(n)],
+    ('PATCH', 'category-detail'): lambda f, n: [({'pk': pk}, {'name': f'Benchmark patch {f.unique()}'})
+                                                for pk in f.categories(n)],
+    ('DELETE', 'category-detail'): lambda f, n: [({'pk': pk}, None) for pk in f.categories(n)],
+    ('POST', 'review-list'): lambda f, n: [({}, review_body(book)) for book in f.books(n)],
+    ('PUT', 'review-detail'): lambda f, n: [({'pk': pk}, review_body(book))
+                                            for pk, book in zip(f.reviews(n), f.books(n))],
+    ('PATCH', 'review-detail'): lambda f, n: [({'pk': pk}, {'rating': 5}) for pk in f.reviews(n)],
+    ('DELETE', 'review-detail'): lambda f, n: [({'pk': pk}, None) for pk in f.reviews(n)],
+    ('POST', 'reservation-list'): lambda f, n: [({}, {'book': book, 'due_time': f.due_time()})
+                                                for book in f.books(n)],
+    ('POST', 'reservation-bulk-create'): lambda f, n: repeat(n, lambda i: ({}, {
+        'books': f.books(5), 'due_time': f.due_time()
+    })),
+    ('POST', 'reservation-bulk-return'): lambda f, n: repeat(n, lambda i: ({}, {'ids': f.reservations(5)})),
+    ('PUT', 'reservation-detail'): lambda f, n: [({'pk': pk}, {'book': book, 'due_time': f.due_time()})
+                                                 for pk, book in f.reservations(n, with_books=True)],
+    ('PATCH', 'reservation-detail'): lambda f, n: [({'pk': pk}, {'due_time': f.due_time()})
+                                                   for pk in f.reservations(n)],
+    ('DELETE', 'reservation-detail'): lambda f, n: [({'pk': pk}, None) for pk in f.reservations(n)],
+    ('POST', 'reservation-return-book'): lambda f, n: [({'pk': pk}, {}) for pk in f.reservations(n)],
+    ('POST', 'hold-list'): lambda f, n: [({}, {'book': book}) for book in f.books(n, available=False)],
+    ('DELETE', 'hold-detail'): lambda f, n: [({'pk': pk}, None) for pk in f.holds(n)],
+}
+
+
+# Transports
+
+class TestClientTransport:
+    """Django's test client, in-process and sequential."""
+    concurrent = False
+
+    def __init__(self, headers):
+        from django.test import Client
+
+        self.client = Client(headers=headers, raise_request_exception=False)
+
+    def request(self, method, path, body):
+        kwargs = {}
+        if body is not None:
+            kwargs = {'data': json.dumps(body), 'content_type': 'application/json'}
+        response = getattr(self.client, method.lower())(path, **kwargs)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code, response.headers
+
+
+class HTTPTransport:
+    """Keep-alive HTTP connections to a server on 127.0.0.1, one per thread."""
+    concurrent = True
+
+    def __init__(self, port, headers):
+        self.port = port
+        self.headers = headers
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        headers = dict(self.headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        try:
+            connection.request(method, path, payload, headers)
+            response = connection.getresponse()
+        except (ConnectionError, http.client.HTTPException):
+            # The server may close idle keep-alive connections; retry once on a fresh one
+            connection.close()
+            connection.request(method, path, payload, headers)
+            response = connection.getresponse()
+        response.read()
+        return response.status, response.headers
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_wsgi():
+    from django.core.wsgi import get_wsgi_application
+
+    server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                         server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_port, server.shutdown
+
+
+def start_asgi():
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit('The ASGI server needs uvicorn: pip install uvicorn')
+    from LMS_DRF.asgi import application
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(application, host='127.0.0.1', port=port,
+                                           log_level='warning', lifespan='off'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return port, stop
+
+
+# Measurement
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)]
+
+
+def summarize(samples, wall_seconds):
+    latencies = sorted(sample['seconds'] * 1000 for sample in samples)
+    queries = [sample['queries'] for sample in samples if sample['queries'] is not None]
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample['status'])] = statuses.get(str(sample['status']), 0) + 1
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample['status'] >= 400),
+        'status': statuses,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'throughput_rps': round(len(samples) / wall_seconds, 1) if wall_seconds else None,
+        'queries': {
+            'min': min(queries), 'max': max(queries), 'mean': round(sum(queries) / len(queries), 2),
+        } if queries else None,
+        'cache_hits': sum(1 for sample in samples if sample['cache'] == 'HIT'),
+    }
+
+
+def timed(transport, method, path, body):
+    started = time.perf_counter()
+    status, headers = transport.request(method, path, body)
+    seconds = time.perf_counter() - started
+    match = QUERIES_RE.search(headers.get('Server-Timing', ''))
+    return {
+        'seconds': seconds,
+        'status': status,
+        'queries': int(match.group(1)) if match else None,
+        'cache': headers.get('X-Cache'),
+    }
+
+
+def run_endpoint(transport, requests, warmup, concurrency):
+    for method, path, body in requests[:warmup]:
+        transport.request(method, path, body)
+    measured = requests[warmup:]
+    started = time.perf_counter()
+    if transport.concurrent and concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(lambda request: timed(transport, *request), measured))
+    else:
+        samples = [timed(transport, *request) for request in measured]
+    return summarize(samples, time.perf_counter() - started)
+
+
+def build_requests(fixtures, method, name, template, size):
+    requests = []
+    for kwargs, body in BUILDERS[(method, name)](fixtures, size):
+        query = kwargs.pop('query', None)
+        path = template.format(**{key: quote(str(value)) for key, value in kwargs.items()})
+        if query:
+            path += '?' + urlencode(query)
+        requests.append((method, path, body))
+    return requests
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def volumes():
+    from django.contrib.auth.models import User
+
+    from apps.books.models import Book
+    from apps.category.models import Category
+    from apps.reservation.models import Reservation
+    from apps.review.models import Review
+
+    return {
+        'books': Book.objects.count(), 'categories': Category.objects.count(), 'users': User.objects.count(),
+        'reviews': Review.objects.count(), 'reservations': Reservation.objects.count(),
+    }
+
+
+def run(args):
+    import django
+    from django.test.utils import override_settings
+
+    # Basic auth checks the password on every request; keep hashing out of the numbers
+    with override_settings(API_PROFILING=True, API_CACHE_ENABLED=not args.no_cache, ALLOWED_HOSTS=['*'],
+                           PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+        fixtures = Fixtures(random.Random(args.seed))
+        token = base64.b64encode(f'{USERNAME}:{PASSWORD}'.encode()).decode()
+        headers = {'Authorization': f'Basic {token}', 'Accept': 'application/json'}
+
+        routes = list(discover_routes())
+        if args.only:
+            routes = [route for route in routes if re.search(args.only, f'{route[0]} {route[2]}')]
+        # Reads first so the writes don't change what they measure
+        routes.sort(key=lambda route: route[0] != 'GET')
+
+        stop = None
+        if args.server == 'client':
+            transport = TestClientTransport(headers)
+        else:
+            port, stop = start_wsgi() if args.server == 'wsgi' else start_asgi()
+            transport = HTTPTransport(port, headers)
+
+        result = {
+            'meta': {
+                'commit': git_commit(),
+                'server': args.server,
+                'concurrency': args.concurrency if transport.concurrent else 1,
+                'requests_per_endpoint': args.requests,
+                'warmup': args.warmup,
+                'response_cache': not args.no_cache,
+                'volumes': volumes(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            },
+            'endpoints': {},
+            'skipped': [],
+        }
+        try:
+            print(f"{'endpoint':<58} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>9} {'queries':>8} errors")
+            for method, name, template in routes:
+                key = f'{method} {template}'
+                if (method, name) not in BUILDERS:
+                    result['skipped'].append(key)
+                    continue
+                requests = build_requests(fixtures, method, name, template, args.warmup + args.requests)
+                stats = result['endpoints'][key] = run_endpoint(transport, requests, args.warmup, args.concurrency)
+                queries = stats['queries']['mean'] if stats['queries'] else '-'
+                print(f"{key:<58} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} "
+                      f"{stats['throughput_rps']:>9.1f} {queries:>8} {stats['errors']}")
+        finally:
+            if stop is not None:
+                stop()
+    for key in result['skipped']:
+        print(f"{key:<58} skipped: no request builder")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite file seeded by benchmarks.seed.')
+    parser.add_argument('--server', choices=['client', 'wsgi', 'asgi'], default='client')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint.')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--only', help='Regular expression selecting endpoints, e.g. "GET /api/books".')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the response cache.')
+    parser.add_argument('--in-place', action='store_true', help='Run against --database itself, not a copy.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+
+    if not Path(args.database).exists():
+        parser.error(f'{args.database} does not exist; create it with benchmarks.seed.')
+
+    setup_django()
+    with tempfile.TemporaryDirectory() as workdir:
+        database = args.database
+        if not args.in_place:
+            database = shutil.copyfile(args.database, Path(workdir) / 'benchmark.sqlite3')
+        use_database(database)
+        result = run(args)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2) + '\n')
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
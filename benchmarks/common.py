@@ -0,0 +1,66 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Benchmarks run against a throwaway test database created the same way
+``manage.py test`` does, or against a separate seeded SQLite file (see
+``benchmarks.seed``), so the development ``db.sqlite3`` is never touched.
+"""
+import gc
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LMS_DRF.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(verbosity=0):
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def use_database(path):
+    """Point the default connection at another SQLite file and migrate it."""
+    from django.core.management import call_command
+    from django.db import connection
+
+    connection.close()
+    connection.settings_dict['NAME'] = str(Path(path).resolve())
+    call_command('migrate', verbosity=0)
+    return connection
+
+
+def best_of(repeat, func):
+    """
+    Run ``func`` ``repeat`` times and return the fastest wall time in
+    seconds. Like ``timeit``, the garbage collector is off while timing.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return min(timings)
@@ -0,0 +1,72 @@
+"""
+Diff two result files of ``benchmarks.api`` and flag regressions.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+An endpoint regresses when its p95 latency grows by more than
+``--threshold`` percent, when it issues more queries on average or when
+it starts failing. Exits with status 1 if any endpoint regressed.
+"""
+import argparse
+import json
+import sys
+
+
+def change(before, after):
+    return (after - before) / before * 100 if before else 0.0
+
+
+def compare(before, after, threshold):
+    regressions = []
+    print(f"{'endpoint':<58} {'p95 before':>11} {'p95 after':>10} {'change':>8} {'queries':>11}")
+    for key, new in after['endpoints'].items():
+        old = before['endpoints'].get(key)
+        if old is None:
+            print(f"{key:<58} {'new':>11} {new['p95_ms']:>10.2f}")
+            continue
+
+        delta = change(old['p95_ms'], new['p95_ms'])
+        old_queries = old['queries']['mean'] if old['queries'] else 0
+        new_queries = new['queries']['mean'] if new['queries'] else 0
+        reasons = []
+        if delta > threshold:
+            reasons.append(f'p95 +{delta:.0f}%')
+        if new_queries > old_queries:
+            reasons.append(f'queries {old_queries} -> {new_queries}')
+        if new['errors'] > old['errors']:
+            reasons.append(f"errors {old['errors']} -> {new['errors']}")
+        if reasons:
+            regressions.append((key, reasons))
+
+        marker = '  REGRESSION' if reasons else ''
+        print(f"{key:<58} {old['p95_ms']:>11.2f} {new['p95_ms']:>10.2f} {delta:>+7.0f}% "
+              f"{old_queries:>5}->{new_queries:<5}{marker}")
+
+    for key in before['endpoints'].keys() - after['endpoints'].keys():
+        print(f"{key:<58} missing from the new run")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Allowed p95 growth in percent.')
+    args = parser.parse_args()
+
+    with open(args.before) as before, open(args.after) as after:
+        before, after = json.load(before), json.load(after)
+    for label, run in (('before', before), ('after', after)):
+        meta = run['meta']
+        print(f"{label:<7} {meta['commit'] or '?':.12} {meta['server']} x{meta['concurrency']} {meta['volumes']}")
+
+    regressions = compare(before, after, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} endpoint(s) regressed:")
+        for key, reasons in regressions:
+            print(f"  {key}: {', '.join(reasons)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
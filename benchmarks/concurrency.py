@@ -0,0 +1,263 @@
+"""
+Compare read throughput of the sync WSGI and the async ASGI stack under
+high concurrency.
+
+    python -m benchmarks.seed --database bench.sqlite3
+    python -m benchmarks.concurrency --database bench.sqlite3 --concurrency 64
+    python -m benchmarks.concurrency --database bench.sqlite3 --transport http   # needs uvicorn
+
+Each GET list and retrieve route of ``AsyncReadMixin`` viewsets is hit
+``--requests`` times with ``--concurrency`` requests in flight through
+``LMS_DRF.wsgi`` (sync views, a thread per request in flight), through
+``LMS_DRF.asgi`` with the sync URLconf (``asgi-sync``) and through
+``LMS_DRF.asgi`` as deployed (async views on one event loop). The
+``inprocess`` transport calls the applications directly, so the numbers
+exclude the HTTP server; ``http`` runs them behind the threaded
+``wsgiref`` server and uvicorn instead. The response cache is off unless
+``--cache`` is given, so every request reaches the database. Profiling
+stays off: its async hooks would add a thread hop to every ASGI request.
+"""
+import argparse
+import asyncio
+import io
+import json
+import platform
+import random
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks.api import (HTTPTransport, Fixtures, build_requests, discover_routes, git_commit, start_asgi,
+                            start_wsgi, summarize, volumes)
+from benchmarks.common import setup_django, use_database
+
+HEADERS = {'Accept': 'application/json'}
+
+
+def sample(started, status, headers):
+    return {
+        'seconds': time.perf_counter() - started,
+        'status': status,
+        'queries': None,
+        'cache': headers.get('X-Cache'),
+    }
+
+
+# In-process drivers
+
+class WSGIDriver:
+    """``--concurrency`` threads calling the WSGI application."""
+
+    def __init__(self, concurrency):
+        from LMS_DRF.wsgi import application
+
+        self.application = application
+        self.concurrency = concurrency
+
+    def call(self, path):
+        url = urlsplit(path)
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+                   'wsgi.input': io.BytesIO(), 'HTTP_ACCEPT': HEADERS['Accept']}
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            response['headers'] = dict(headers)
+
+        started = time.perf_counter()
+        body = self.application(environ, start_response)
+        try:
+            b''.join(body)
+        finally:
+            body.close()
+        return sample(started, response['status'], response['headers'])
+
+    def run(self, paths):
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            return list(pool.map(self.call, paths))
+
+
+class ASGIDriver:
+    """``--concurrency`` tasks on one event loop calling the ASGI application."""
+
+    def __init__(self, concurrency):
+        from LMS_DRF.asgi import application
+
+        self.application = application
+        self.concurrency = concurrency
+
+    async def call(self, path):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+            'method': 'GET', 'path': url.path, 'raw_path': url.path.encode(), 'root_path': '',
+            'query_string': url.query.encode(), 'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80),
+            'headers': [(b'host', b'127.0.0.1')] + [(k.lower().encode(), v.encode()) for k, v in HEADERS.items()],
+        }
+        requested = False
+        response = {}
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # The client never disconnects; the handler cancels this wait when done
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = {k.decode().title(): v.decode() for k, v in message['headers']}
+
+        started = time.perf_counter()
+        await self.application(scope, receive, send)
+        return sample(started, response['status'], response['headers'])
+
+    def run(self, paths):
+        async def main():
+            queue = iter(paths)
+            samples = []
+
+            async def worker():
+                for path in queue:
+                    samples.append(await self.call(path))
+
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+            return samples
+
+        return asyncio.run(main())
+
+
+# Over HTTP
+
+class HTTPDriver:
+    """``--concurrency`` client threads with keep-alive connections to a server."""
+
+    def __init__(self, concurrency, start):
+        self.concurrency = concurrency
+        self.port, self.stop = start()
+        self.transport = HTTPTransport(self.port, HEADERS)
+
+    def call(self, path):
+        started = time.perf_counter()
+        status, headers = self.transport.request('GET', path, None)
+        return sample(started, status, headers)
+
+    def run(self, paths):
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            return list(pool.map(self.call, paths))
+
+
+def async_routes():
+    """``(name, template)`` of the GET routes served by async views under ASGI."""
+    from django.urls import get_resolver
+
+    from LMS_DRF.async_views import AsyncReadMixin
+
+    for method, name, template in discover_routes():
+        if method != 'GET':
+            continue
+        callback = get_resolver().resolve(re.sub(r'\{\w+\}', '1', template)).func
+        cls = getattr(callback, 'cls', None)
+        if (isinstance(cls, type) and issubclass(cls, AsyncReadMixin)
+                and callback.actions.get('get') in cls.async_actions):
+            yield name, template
+
+
+def stacks(args):
+    """``(name, driver, ASGI_URLCONF)`` of the stacks to compare."""
+    if args.transport == 'inprocess':
+        wsgi, asgi = WSGIDriver(args.concurrency), ASGIDriver(args.concurrency)
+    else:
+        wsgi, asgi = HTTPDriver(args.concurrency, start_wsgi), HTTPDriver(args.concurrency, start_asgi)
+    return [
+        ('wsgi', wsgi, None),
+        # Sync views behind the ASGI handler, to tell the views from the stack
+        ('asgi-sync', asgi, 'LMS_DRF.urls'),
+        ('asgi', asgi, 'LMS_DRF.urls_asgi'),
+    ]
+
+
+def run(args):
+    import django
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    with override_settings(API_CACHE_ENABLED=args.cache, ALLOWED_HOSTS=['*']):
+        fixtures = Fixtures(random.Random(args.seed))
+        routes = [route for route in async_routes() if not args.only or re.search(args.only, route[1])]
+        compared = stacks(args)
+
+        result = {
+            'meta': {
+                'commit': git_commit(),
+                'transport': args.transport,
+                'concurrency': args.concurrency,
+                'requests_per_endpoint': args.requests,
+                'response_cache': args.cache,
+                'volumes': volumes(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            },
+            'endpoints': {},
+        }
+        print(f"{'endpoint':<18}" + ''.join(f" {name + ' req/s':>15} {'p95':>8}" for name, _, _ in compared)
+              + f" {'asgi/wsgi':>9} errors")
+        try:
+            for name, template in routes:
+                paths = [path for _, path, _ in
+                         build_requests(fixtures, 'GET', name, template, args.warmup + args.requests)]
+                stats = result['endpoints'][f'GET {template}'] = {}
+                for stack, driver, urlconf in compared:
+                    with override_settings(ASGI_URLCONF=urlconf or settings.ASGI_URLCONF):
+                        driver.run(paths[:args.warmup])
+                        started = time.perf_counter()
+                        samples = driver.run(paths[args.warmup:])
+                    stats[stack] = summarize(samples, time.perf_counter() - started)
+
+                speedup = stats['asgi']['throughput_rps'] / stats['wsgi']['throughput_rps']
+                print(f"{name:<18}" + ''.join(f" {stats[stack]['throughput_rps']:>15.1f} {stats[stack]['p95_ms']:>8.2f}"
+                                              for stack, _, _ in compared)
+                      + f" {speedup:>8.2f}x " + '/'.join(str(stats[stack]['errors']) for stack, _, _ in compared))
+        finally:
+            for _, driver, _ in compared:
+                getattr(driver, 'stop', lambda: None)()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite file seeded by benchmarks.seed.')
+    parser.add_argument('--transport', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--requests', type=int, default=1000, help='Measured requests per endpoint and stack.')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--only', help='Regular expression selecting routes by path, e.g. "books".')
+    parser.add_argument('--cache', action='store_true', help='Keep the response cache on.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+
+    if not Path(args.database).exists():
+        parser.error(f'{args.database} does not exist; create it with benchmarks.seed.')
+
+    setup_django()
+    with tempfile.TemporaryDirectory() as workdir:
+        use_database(shutil.copyfile(args.database, Path(workdir) / 'benchmark.sqlite3'))
+        result = run(args)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2) + '\n')
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
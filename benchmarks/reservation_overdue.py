@@ -0,0 +1,72 @@
+"""
+Serialize reservations with ``is_overdue`` computed per row in Python
+versus annotated in SQL, and report rows per second.
+
+    python -m benchmarks.reservation_overdue --rows 100000
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import best_of, setup_django, test_database
+
+
+def seed(rows):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from apps.books.models import Book
+    from apps.reservation.models import Reservation
+
+    user = User.objects.create(username='benchmark')
+    books = Book.objects.bulk_create(
+        Book(title=f'Book {i}', author='Benchmark', year=2000) for i in range(1000)
+    )
+    now = timezone.now()
+    statuses = [Reservation.STATUS_ACTIVE, Reservation.STATUS_COMPLETED, Reservation.STATUS_OVERDUE]
+    Reservation.objects.bulk_create(
+        (
+            Reservation(
+                book=books[i % len(books)], user=user, status=statuses[i % 3],
+                due_time=now + timedelta(days=(i % 30) - 15)
+            )
+            for i in range(rows)
+        ),
+        batch_size=5000
+    )
+
+
+def run(rows, repeat):
+    from django.utils import timezone
+
+    from apps.reservation.api.serializers import ReservationSerializer
+    from apps.reservation.models import Reservation
+
+    seed(rows)
+    queryset = Reservation.objects.select_related('book').order_by('id')
+
+    def per_row():
+        return ReservationSerializer(list(queryset.all()), many=True).data
+
+    def annotated():
+        return ReservationSerializer(list(queryset.with_overdue_flag(timezone.now())), many=True).data
+
+    assert [row['is_overdue'] for row in per_row()] == [row['is_overdue'] for row in annotated()]
+
+    for label, func in (('python is_overdue', per_row), ('sql annotation', annotated)):
+        seconds = best_of(repeat, func)
+        print(f"{label:<20} {seconds:8.3f}s  {rows / seconds:12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        run(args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Seed a SQLite file with a synthetic library for the API benchmarks.
+
+    python -m benchmarks.seed --database bench.sqlite3 --books 1000000 \\
+        --categories 10000 --reviews 5000000 --reservations 2000000
+
+The file is created and migrated when needed and must not hold books yet.
+Rows go in with bulk inserts in batches of ``--batch-size``; rating
+aggregates, availability and the search index are then rebuilt set-wise.
+The same ``--seed`` always produces the same data.
+"""
+import argparse
+import math
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+
+from benchmarks.common import setup_django, use_database
+
+DEFAULTS = {
+    'books': 10_000,
+    'categories': 100,
+    'users': 1_000,
+    'reviews': 50_000,
+    'reservations': 20_000,
+}
+
+ADJECTIVES = ['Silent', 'Crimson', 'Hidden', 'Last', 'Broken', 'Golden', 'Distant', 'Forgotten',
+              'Burning', 'Winter', 'Secret', 'Endless', 'Quiet', 'Wild', 'Iron', 'Glass']
+NOUNS = ['River', 'Kingdom', 'Garden', 'Empire', 'Voyage', 'Orchard', 'Library', 'Harbor',
+         'Mountain', 'Letter', 'Machine', 'Forest', 'Island', 'Shadow', 'Tower', 'Storm']
+WORDS = ['history', 'science', 'fiction', 'poetry', 'travel', 'drama', 'fantasy', 'biography',
+         'mystery', 'romance', 'horror', 'philosophy', 'art', 'music', 'economics', 'politics']
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def insert(model, objects, batch_size, total=None):
+    """Bulk insert ``objects`` one transaction per batch, reporting progress."""
+    from django.db import transaction
+
+    started = time.perf_counter()
+    done = 0
+    for batch in batched(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+        done += len(batch)
+        progress = f"{done:>12,} / {total:,}" if total else f"{done:>12,}"
+        print(f"\r  {model._meta.db_table:<24} {progress}", end='', flush=True)
+    seconds = time.perf_counter() - started
+    print(f"\r  {model._meta.db_table:<24} {done:>12,} rows  {done / seconds if seconds else 0:12,.0f} rows/s")
+
+
+def first_id(model):
+    return model.objects.order_by('id').values_list('id', flat=True).first()
+
+
+def seed(volumes, batch_size=10_000, seed_value=42):
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.utils import timezone
+
+    from apps.books import search
+    from apps.books.models import Book
+    from apps.category.models import Category
+    from apps.reservation.models import Reservation
+    from apps.review.models import Review
+
+    rng = random.Random(seed_value)
+    books, categories = volumes['books'], volumes['categories']
+    # Every (user, book) pair may be reviewed once
+    users = max(volumes['users'], math.ceil(volumes['reviews'] / max(books, 1)))
+    now = timezone.now()
+
+    with connection.cursor() as cursor:
+        # Durability is irrelevant for a generated file
+        cursor.execute('PRAGMA synchronous = OFF')
+
+    insert(Category, (Category(name=f'{rng.choice(WORDS).title()} {i}') for i in range(categories)),
+           batch_size, categories)
+    category_ids = list(Category.objects.order_by('id').values_list('id', flat=True))
+
+    authors = max(books // 20, 1)
+    insert(Book, (
+        Book(
+            title=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}',
+            author=f'Author {rng.randrange(authors)}',
+            ISBN=f'978-0-{i:09d}-0',
+            description=' '.join(rng.choices(WORDS, k=12)),
+            year=rng.randint(1900, 2024),
+        )
+        for i in range(books)
+    ), batch_size, books)
+    book_offset = first_id(Book)
+
+    Through = Book.categories.through
+    if category_ids:
+        links = ((book, category_id) for book in range(books)
+                 for category_id in rng.sample(category_ids, min(len(category_ids), rng.randint(1, 3))))
+        insert(Through, (Through(book_id=book_offset + book, category_id=category_id) for book, category_id in links),
+               batch_size)
+
+    insert(User, (User(username=f'reader{i}', password='!') for i in range(users)), batch_size, users)
+    user_offset = first_id(User)
+
+    def review(i):
+        user = i % users
+        # Distinct books per user, spread over the catalogue
+        book = (i // users + user * 7919) % books
+        return Review(book_id=book_offset + book, user_id=user_offset + user,
+                      rating=rng.randint(1, 5), content=' '.join(rng.choices(WORDS, k=8)))
+
+    insert(Review, (review(i) for i in range(volumes['reviews'])), batch_size, volumes['reviews'])
+    with connection.cursor() as cursor:
+        # created_at is auto_now_add; spread it so keyset pages look realistic
+        cursor.execute("UPDATE review_review SET created_at = datetime(created_at, '-' || (id % 50000) || ' minutes')")
+
+    reservations = volumes['reservations']
+    last_round = reservations - min(reservations, books)
+
+    def reservation(i):
+        due_time = now + timedelta(days=i % 30 - 15)
+        # Only the most recent reservation of a book may still be open
+        if i >= last_round and rng.random() < 0.3:
+            return Reservation(book_id=book_offset + i % books, user_id=user_offset + i % users,
+                               status=Reservation.STATUS_ACTIVE, due_time=due_time)
+        return Reservation(book_id=book_offset + i % books, user_id=user_offset + i % users,
+                           status=Reservation.STATUS_COMPLETED, due_time=due_time,
+                           return_time=due_time - timedelta(days=1))
+
+    insert(Reservation, (reservation(i) for i in range(reservations)), batch_size, reservations)
+
+    started = time.perf_counter()
+    Book.objects.filter(
+        pk__in=Reservation.objects.filter(status=Reservation.STATUS_ACTIVE).values('book_id')
+    ).update(available_count=0)
+    Book.objects.rebuild_ratings()
+    search.index_books()
+    print(f"  availability, ratings and search index rebuilt in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite file to create or fill.')
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f'--{name}', type=int, default=default)
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    setup_django()
+    from apps.books.models import Book
+
+    connection = use_database(args.database)
+    if connection.vendor != 'sqlite':
+        parser.error('The seeder writes SQLite-specific SQL.')
+    if Book.objects.exists():
+        parser.error(f'{args.database} already holds books; seed into a new file.')
+
+    started = time.perf_counter()
+    seed({name: getattr(args, name) for name in DEFAULTS}, args.batch_size, args.seed)
+    print(f"Seeded {args.database} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare the ModelSerializer path with the values() fast path for books,
+reservations and reviews: query + serialize + render, reported in rows/s.
+
+    python -m benchmarks.serializers --rows 20000
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import best_of, setup_django, test_database
+
+
+def seed(rows):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from apps.books.models import Book
+    from apps.category.models import Category
+    from apps.reservation.models import Reservation
+    from apps.review.models import Review
+
+    categories = Category.objects.bulk_create(Category(name=f'Category {i}') for i in range(20))
+    books = Book.objects.bulk_create(
+        Book(title=f'Book {i}', author=f'Author {i % 500}', year=1900 + i % 120,
+             ISBN=f'978-0-{i:09d}-0', description='Benchmark book ' * 10)
+        for i in range(rows)
+    )
+    Through = Book.categories.through
+    Through.objects.bulk_create(
+        (Through(book_id=book.pk, category_id=categories[(book.pk + k) % 20].pk)
+         for book in books for k in range(3)),
+        batch_size=5000
+    )
+    users = User.objects.bulk_create(User(username=f'user{i}') for i in range(rows // 10 or 1))
+    now = timezone.now()
+    Reservation.objects.bulk_create(
+        (Reservation(book=books[i], user=users[i % len(users)], due_time=now + timedelta(days=i % 30 - 15))
+         for i in range(rows)),
+        batch_size=5000
+    )
+    Review.objects.bulk_create(
+        (Review(book=books[i], user=users[i % len(users)], rating=i % 5 + 1, content='Benchmark review text')
+         for i in range(rows)),
+        batch_size=5000
+    )
+
+
+def run(rows, repeat):
+    from django.utils import timezone
+    from rest_framework.renderers import JSONRenderer
+
+    from apps.books.api.serializers import BookSerializer, BookValuesSerializer
+    from apps.books.models import Book
+    from apps.reservation.api.serializers import ReservationSerializer, ReservationValuesSerializer
+    from apps.reservation.models import Reservation
+    from apps.review.api.serializers import ReviewSerializer, ReviewValuesSerializer
+    from apps.review.models import Review
+
+    seed(rows)
+    renderer = JSONRenderer()
+    cases = [
+        ('books', Book.objects.with_category_ids().order_by('title'), BookSerializer, BookValuesSerializer),
+        ('reservations', Reservation.objects.select_related('book').with_overdue_flag(timezone.now()),
+         ReservationSerializer, ReservationValuesSerializer),
+        ('reviews', Review.objects.all(), ReviewSerializer, ReviewValuesSerializer),
+    ]
+
+    for name, queryset, model_serializer, values_serializer in cases:
+        def model_path():
+            return renderer.render(model_serializer(list(queryset.all()), many=True).data)
+
+        def values_path():
+            return renderer.render(values_serializer(values_serializer.get_values(queryset.all()), many=True).data)
+
+        assert model_path() == values_path(), name
+        slow = best_of(repeat, model_path)
+        fast = best_of(repeat, values_path)
+        print(f"{name:<13} model {rows / slow:10,.0f} rows/s   values {rows / fast:10,.0f} rows/s   "
+              f"x{slow / fast:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        run(args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
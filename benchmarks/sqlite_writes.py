@@ -0,0 +1,148 @@
+"""
+Measure concurrent write throughput and "database is locked" errors of
+the SQLite profiles in ``LMS_DRF.database``.
+
+    python -m benchmarks.sqlite_writes --threads 16 --cycles 50
+    python -m benchmarks.sqlite_writes --profiles default tuned --output writes.json
+
+For every profile a fresh database file is migrated and ``--threads``
+readers each run ``--cycles`` rounds over their own three books through
+the API: reserve and return one book, then bulk-reserve and bulk-return
+the other two. Every request is a write competing for the one SQLite
+write lock, and the bulk ones read inside their transaction before they
+write. A request that fails with ``database is locked`` counts as a lock
+error (and may leave a book reserved, failing later requests of its
+thread); throughput counts the requests that succeeded.
+"""
+import argparse
+import json
+import logging
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from benchmarks.common import setup_django
+
+DEFAULT_PROFILES = ('default', 'tuned')
+
+
+def use_profile(path, profile):
+    """Point the default connection at a new file with the given profile and migrate it."""
+    from django.core.management import call_command
+    from django.db import connections
+
+    from LMS_DRF.database import sqlite_database
+
+    connections.close_all()
+    # Every thread's connection shares this dict, so new threads pick it up
+    connections.settings['default'].update(sqlite_database(path, profile))
+    call_command('migrate', verbosity=0)
+
+
+def run_profile(profile, directory, threads, cycles):
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connection
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+
+    from apps.books.models import Book
+
+    use_profile(directory / f'{profile}.sqlite3', profile)
+    users = [User.objects.create(username=f'writer{i}') for i in range(threads)]
+    books = [
+        [Book.objects.create(title=f'Contended book {i}.{k}', author='Benchmark', year=2000).pk for k in range(3)]
+        for i in range(threads)
+    ]
+    due_time = (timezone.now() + timedelta(days=14)).isoformat()
+
+    barrier = threading.Barrier(threads)
+    lock = threading.Lock()
+    counts = {'ok': 0, 'locked': 0, 'failed': 0}
+
+    def count(outcome):
+        with lock:
+            counts[outcome] += 1
+
+    def request(method, *args, **kwargs):
+        try:
+            response = method(*args, **kwargs)
+        except OperationalError as exc:
+            count('locked' if 'locked' in str(exc) else 'failed')
+            return None
+        count('ok' if response.status_code < 400 else 'failed')
+        return response
+
+    def work(user, books):
+        client = APIClient(raise_request_exception=True)
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            for _ in range(cycles):
+                response = request(client.post, '/api/reservations/', {'book': books[0], 'due_time': due_time},
+                                   format='json')
+                if response is not None and response.status_code == 201:
+                    request(client.post, f"/api/reservations/{response.data['id']}/return_book/", {}, format='json')
+
+                response = request(client.post, '/api/reservations/bulk-create/',
+                                   {'books': books[1:], 'due_time': due_time}, format='json')
+                if response is not None and response.status_code == 200:
+                    ids = [item['reservation'] for item in response.data['results'] if 'reservation' in item]
+                    if ids:
+                        request(client.post, '/api/reservations/bulk-return/', {'ids': ids}, format='json')
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=work, args=pair) for pair in zip(users, books)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - started
+    connection.close()
+
+    return {
+        **counts,
+        'seconds': round(seconds, 3),
+        'writes_per_second': round(counts['ok'] / seconds, 1),
+        'lock_error_rate': round(counts['locked'] / max(sum(counts.values()), 1), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=list(DEFAULT_PROFILES))
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--cycles', type=int, default=50, help='Reserve/return cycles per thread.')
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+
+    setup_django()
+    # Refused and failed requests are counted; don't log each one
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    from django.test.utils import override_settings
+
+    from LMS_DRF.database import SQLITE_PROFILES
+
+    unknown = set(args.profiles) - SQLITE_PROFILES.keys()
+    if unknown:
+        parser.error(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+    results = {}
+    print(f"{'profile':<10} {'writes/s':>9} {'ok':>6} {'locked':>7} {'failed':>7} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as directory, override_settings(ALLOWED_HOSTS=['*']):
+        for profile in args.profiles:
+            result = results[profile] = run_profile(profile, Path(directory), args.threads, args.cycles)
+            print(f"{profile:<10} {result['writes_per_second']:>9.1f} {result['ok']:>6} {result['locked']:>7} "
+                  f"{result['failed']:>7} {result['seconds']:>8.2f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({'threads': args.threads, 'cycles': args.cycles,
+                                                 'profiles': results}, indent=2) + '\n')
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()